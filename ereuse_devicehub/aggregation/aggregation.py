@@ -114,7 +114,7 @@ class Aggregation:
     def types(self, groups_id: str = None):
         if groups_id:
             domain = GroupDomain.children_resources[self.resource_name]
-            descendants = domain.get_descendants(DeviceDomain, groups_id)
+            descendants = domain.get_descendants(DeviceDomain, groups_id, projection={'events.@type': True})
             group_and_count = compose(
                 groupby(lambda device: device['events'][0]['@type']),
                 countby(len)
@@ -1,55 +1,97 @@
-import copy
 import inspect
+import time
+from functools import wraps
 
 from bson.objectid import ObjectId
 from eve.io.mongo import Mongo, MongoJSONEncoder
-from flask import current_app
-from pydash import transform
+from flask import Response, current_app, g, request
+from pymongo.collection import Collection
 from pymongo.cursor import Cursor
 
 from ereuse_devicehub.resources.account.role import Role
+from ereuse_devicehub.resources.identity_map import IdentityMap
 
 
 class MongoEncoder:
-    def encode_to_mongo(self, query) -> dict:
+    """
+    Adapts queries, updates and documents to MongoDB, which only accepts dicts and lists as containers,
+    by converting the sets inside them to lists.
+
+    Most documents do not have sets, so we first look for them and return the document as it is when
+    there are none. Otherwise we return a copy that only duplicates the containers in the way to the sets,
+    sharing the rest with the original document, which is never modified.
+    """
+
+    def encode_to_mongo(self, query):
         _type = type(query)
-        if _type is dict or _type is list:
-            return transform(query, self._encode_to_mongo_transform, _type())
+        if (_type is dict or _type is list) and self._has_set(query):
+            return self._sets_to_lists(query)
         else:
             return query
 
-    def _encode_to_mongo_transform(self, acc, value, key, subdict):
-        # Transform the values here
-        if type(value) is set:
-            value = list(value)
-        if issubclass(type(value), list) or issubclass(type(value), dict):
-            value = self.encode_to_mongo(value)
-
-        # Set the values here
-        # Mongo accepts only list or dict as containers
-        if type(acc) is list:
-            acc.append(value)
-        else:
-            acc[key] = value
+    @staticmethod
+    def _has_set(query: dict or list) -> bool:
+        containers = [query]
+        while containers:
+            container = containers.pop()
+            for value in container.values() if type(container) is dict else container:
+                _type = type(value)
+                if _type is set:
+                    return True
+                elif _type is dict or _type is list:
+                    containers.append(value)
+        return False
+
+    @staticmethod
+    def _set_paths(query: dict or list) -> list:
+        """Gets the paths (tuples of keys and indexes) from the query to its sets."""
+        paths = []
+        containers = [((), query)]
+        while containers:
+            path, container = containers.pop()
+            for key, value in container.items() if type(container) is dict else enumerate(container):
+                _type = type(value)
+                if _type is set:
+                    paths.append(path + (key,))
+                elif _type is dict or _type is list:
+                    containers.append((path + (key,), value))
+        return paths
+
+    def _sets_to_lists(self, query: dict or list) -> dict or list:
+        copies = {(): query.copy()}  # path: the copy of the container in that path
+        for path in self._set_paths(query):
+            container = copies[()]
+            for i in range(1, len(path)):
+                subpath = path[:i]
+                if subpath not in copies:
+                    copies[subpath] = container[path[i - 1]] = container[path[i - 1]].copy()
+                container = copies[subpath]
+            container[path[-1]] = list(container[path[-1]])
+        return copies[()]
 
 
 def mongo_encode(*args_to_transform):
-    """Decorator for MongoEncoder.encode_to_mongo"""
+    """
+    Decorator that passes the given arguments of the function through
+    :meth:`MongoEncoder.encode_to_mongo`, whether they are passed by position or by keyword.
+    """
 
     def decorator(function):
-        keys, *_ = inspect.getfullargspec(function)
+        keys = inspect.getfullargspec(function).args
+        positions = tuple(keys.index(key) for key in args_to_transform if key in keys)
 
+        @wraps(function)
         def wrapper(*args, **kwargs):
-            new_args = list(args)
-            new_kwargs = copy.copy(kwargs)
-            for arg in args:
-                i = args.index(arg)
-                if keys[i] in args_to_transform:
-                    new_args[i] = current_app.mongo_encoder.encode_to_mongo(arg)
+            encode = current_app.mongo_encoder.encode_to_mongo
+            positions_in_args = [i for i in positions if i < len(args)]
+            if positions_in_args:
+                args = list(args)
+                for i in positions_in_args:
+                    args[i] = encode(args[i])
             for key in args_to_transform:
                 if key in kwargs:
-                    new_kwargs[key] = current_app.mongo_encoder.encode_to_mongo(kwargs[key])
-            return function(*new_args, **new_kwargs)
+                    kwargs[key] = encode(kwargs[key])
+            return function(*args, **kwargs)
 
         return wrapper
 
@@ -63,9 +105,72 @@ class DhMongoJSONEncoder(MongoJSONEncoder):
         return super().default(obj)
 
 
+class CollectionStats:
+    """How many times a request got a collection through :meth:`DataLayer.collection`, and the time spent on it."""
+
+    def __init__(self):
+        self.resolutions = 0
+        self.seconds = 0.0
+        self.request = request._get_current_object()
+
+    @staticmethod
+    def current() -> 'CollectionStats' or None:
+        return g.get('dh_collection_stats')
+
+
+def start_collection_stats():
+    """Starts counting collections if COLLECTION_STATS is set. This is executed in a before_request."""
+    # Internal requests share 'g' with the request that executes them, and so the stats
+    if current_app.config['COLLECTION_STATS'] and 'dh_collection_stats' not in g:
+        g.dh_collection_stats = CollectionStats()
+
+
+def report_collection_stats(response: Response) -> Response:
+    """Logs the collection stats of the request. This is executed in an after_request."""
+    stats = CollectionStats.current()
+    if stats is not None and stats.request is request._get_current_object():
+        current_app.logger.info('Collections of {} {}: {} got in {:.2f} ms.'.format(request.method, request.endpoint,
+                                                                                   stats.resolutions,
+                                                                                   stats.seconds * 1000))
+        del g.dh_collection_stats
+    return response
+
+
 class DataLayer(Mongo):
     json_encoder_class = DhMongoJSONEncoder
 
+    def init_app(self, app):
+        super().init_app(app)
+        self._collections = {}
+        """A cache of collections by mongo prefix and collection name."""
+        self._collections_version = None
+        """The database_version of the config when we filled the cache."""
+
+    def collection(self, resource: str, source: str = None) -> Collection:
+        """
+        Gets the collection of the resource in the database of the actual request.
+
+        Only the mongo prefix, which selects the database, is computed every time; the collection
+        is cached by prefix and collection name until the database settings change.
+        :param source: The name of the collection, which we get from the resource if not passed-in.
+        """
+        stats = g.get('dh_collection_stats')
+        start = time.perf_counter() if stats is not None else None
+        if self._collections_version != current_app.config.database_version:
+            self._collections.clear()
+            self._collections_version = current_app.config.database_version
+        prefix = self.current_mongo_prefix(resource)
+        if source is None:
+            source = current_app.config['SOURCES'][resource]['source']
+        try:
+            collection = self._collections[prefix, source]
+        except KeyError:
+            collection = self._collections[prefix, source] = self.pymongo(resource, prefix).db[source]
+        if stats is not None:
+            stats.resolutions += 1
+            stats.seconds += time.perf_counter() - start
+        return collection
+
     def current_mongo_prefix(self, resource=None):
         """
         Overrides the default Eve's database selection process, by forcing the resources that use the default database
@@ -82,21 +187,24 @@ class DataLayer(Mongo):
             return 'MONGO'
 
     def aggregate(self, resource, pipeline):
-        datasource, *_ = self.datasource(resource)
-        return list(self.pymongo(resource).db[datasource].aggregate(pipeline))
+        return list(self.collection(resource).aggregate(pipeline))
 
     @mongo_encode('query_filter')
-    def find_raw(self, resource, query_filter) -> Cursor:
-        datasource, *_ = self.datasource(resource)
-        return self.pymongo(resource).db[datasource].find(query_filter)
+    def find_raw(self, resource, query_filter, projection: dict = None) -> Cursor:
+        return self.collection(resource).find(query_filter, projection)
 
     @mongo_encode('id_or_query')
-    def find_one_raw(self, resource, id_or_query: ObjectId or dict or str):
+    def find_one_raw(self, resource, id_or_query: ObjectId or dict or str, projection: dict = None):
         if type(id_or_query) is dict:
-            datasource, *_ = self.datasource(resource)
-            return self.pymongo(resource).db[datasource].find_one(id_or_query)
-        else:
+            return self.collection(resource).find_one(id_or_query, projection)
+        elif projection is None:
             return super(DataLayer, self).find_one_raw(resource, id_or_query)
+        else:
+            # The same as Eve's find_one_raw, which does not accept projections
+            id_field = current_app.config['DOMAIN'][resource]['id_field']
+            lookup = self._mongotize({id_field: id_or_query}, resource)
+            datasource, query, *_ = self._datasource_ex(resource, lookup)
+            return self.collection(resource, datasource).find_one(query, projection)
 
     @mongo_encode('doc_or_docs')
     def insert(self, resource, doc_or_docs):
@@ -104,8 +212,24 @@ class DataLayer(Mongo):
 
     @mongo_encode('updates', 'original')
     def update(self, resource, id_, updates, original):
+        self._invalidate(resource, [id_])
         return super().update(resource, id_, updates, original)
 
     @mongo_encode('document', 'original')
     def replace(self, resource, id_, document, original):
+        self._invalidate(resource, [id_])
         return super().replace(resource, id_, document, original)
+
+    def remove(self, resource, lookup=None):
+        self._invalidate(resource)
+        return super().remove(resource, lookup or {})
+
+    def _invalidate(self, resource, ids: list = None):
+        """Invalidates the written resources from the identity map, if any."""
+        identity_map = IdentityMap.current()
+        if identity_map is not None:
+            collection = self.collection(resource)
+            if ids is None:
+                identity_map.invalidate_collection(collection)
+            else:
+                identity_map.invalidate(collection, ids)
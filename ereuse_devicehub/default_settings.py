@@ -11,8 +11,11 @@ from pymongo.collation import Collation, CollationStrength
 from ereuse_devicehub.resources.account.domain import AccountDomain
 from ereuse_devicehub.resources.account.settings import AccountSettings
 from ereuse_devicehub.resources.device.domain import DeviceDomain
+from ereuse_devicehub.resources.device.score_cache import ScoreCacheDomain, ScoreCacheSettings
 from ereuse_devicehub.resources.device.settings import DeviceSettings
 from ereuse_devicehub.resources.event.device import DeviceEventDomain
+from ereuse_devicehub.resources.event.device.snapshot.domain import SnapshotResponseDomain
+from ereuse_devicehub.resources.event.device.snapshot.settings import SnapshotResponseSettings
 from ereuse_devicehub.resources.event.settings import EventSettings
 from ereuse_devicehub.resources.group.abstract.lot.domain import LotDomain
 from ereuse_devicehub.resources.group.group_log.settings import GroupLogEntrySettings
@@ -20,6 +23,10 @@ from ereuse_devicehub.resources.group.physical.package.domain import PackageDoma
 from ereuse_devicehub.resources.group.physical.pallet.domain import PalletDomain
 from ereuse_devicehub.resources.group.physical.place.domain import PlaceDomain
 from ereuse_devicehub.resources.group.settings import GroupSettings
+from ereuse_devicehub.resources.job.domain import JobDomain
+from ereuse_devicehub.resources.job.settings import JobSettings
+from ereuse_devicehub.resources.job.snapshot_import.domain import SnapshotImportItemDomain
+from ereuse_devicehub.resources.job.snapshot_import.settings import SnapshotImportItemSettings
 from ereuse_devicehub.resources.manufacturers import ManufacturerDomain, ManufacturerSettings
 from ereuse_utils.naming import Naming
 
@@ -57,7 +64,7 @@ MONGO_DBNAME = 'dh__accounts'
 RESOURCES_NOT_USING_DATABASES = ['schema']
 """List of any special resources that do not use any database, for example eve's schema endpoint."""
 RESOURCES_CHANGING_NUMBER = {'device', 'event', 'account', 'place', 'erase', 'project', 'package', 'lot',
-                             'manufacturer', 'pallet'}
+                             'manufacturer', 'pallet', 'job'}
 """
     List of resources that change form singular and plural. Write it in the resource singular form.
     See :class:`app.utils.Naming`
@@ -75,6 +82,70 @@ GRD_ACCOUNT = {
 }
 """The account DeviceHub uses to send data to GRD. eReuse.org provides this account on demand."""
 
+# Jobs
+JOB_WORKERS = 0
+"""
+Number of processes that execute jobs in the background, like moving the children of big groups.
+Set 0 to disable jobs; then everything is executed in the request.
+"""
+JOB_POLL_INTERVAL = 1
+"""Seconds job workers wait before looking for new jobs, when there were none."""
+JOB_LEASE = 60
+"""
+Seconds a worker holds a job without renewing it. Workers renew the jobs they execute every quarter of this,
+so when a worker dies, its jobs are claimed again by other workers once this time passes.
+"""
+JOB_MAX_ATTEMPTS = 3
+"""Times workers can claim a job, which happens again when its worker dies; then the job fails."""
+SNAPSHOT_IMPORT_PARALLELISM = 4
+"""
+Maximum number of snapshots of imports that job workers execute at the same time in each database.
+Snapshots of the same device are always executed one after the other, in the order they were uploaded.
+"""
+SCORE_WORKERS = 0
+"""
+Number of processes that compute the condition (score) and price of snapshots in the background,
+each one with its own R session, which it loads with its first job unless WARM_UP loaded it before forking.
+Set 0 to compute them in the request of the snapshot.
+"""
+WARM_UP = False
+"""
+Initialize R, GeoIP, the GRD submitter and the manufacturers when starting the app, instead of on first use.
+Leave it False to start processes (i.e. gunicorn workers) fast, and warm them up on demand with app.warm_up().
+"""
+SCORE_BACKEND = 'r'
+"""
+Compute the condition (score) and price with the R packages of eReuse.org ('r') or with their port
+to NumPy ('numpy'), which does not load R. See :mod:`ereuse_devicehub.resources.device.score_condition`.
+"""
+SCORE_MODELS = None
+"""
+Path to the JSON with the parameters of the models of the R packages, exported with
+:mod:`ereuse_devicehub.scripts.export_score_models`. The 'numpy' backend needs it and fails without it.
+"""
+SCORE_CACHE_SIZE = 100000
+"""
+Maximum number of conditions and prices that we keep to not compute again devices that have not changed,
+evicting the least recently used ones. Set 0 to always compute them.
+"""
+IDENTITY_MAP = False
+"""
+Cache in each request the resources Domain gets by identifier, logging the hits and misses.
+See :class:`ereuse_devicehub.resources.identity_map.IdentityMap`.
+"""
+COLLECTION_STATS = False
+"""Log for each request how many times Domain and the data layer got a collection and the time they spent on it."""
+AUTH_STATS = False
+"""Log for each request how many accounts it looked up to authenticate, how many came from the cache, and the time."""
+ACCOUNT_CACHE_TTL = 60
+"""
+Seconds the accounts stay in the in-memory cache by token of each process, so authenticating does not read
+the database every time. This is also the most time other processes use an account after it changes.
+Set 0 to disable the cache. See :class:`ereuse_devicehub.resources.account.cache.AccountCache`.
+"""
+ACCOUNT_CACHE_SIZE = 10000
+"""How many accounts the cache of each process holds at most."""
+
 # Other python-eve and flask settings, no need to change them
 X_HEADERS = ['Content-Type', 'Authorization']
 X_EXPOSE_HEADERS = ['Authorization']
@@ -119,7 +190,11 @@ DOMAIN = {
     'accounts': AccountSettings,
     'groups': GroupSettings,
     'manufacturers': ManufacturerSettings,
-    'group-log-entry': GroupLogEntrySettings
+    'group-log-entry': GroupLogEntrySettings,
+    'jobs': JobSettings,
+    'snapshot-import-item': SnapshotImportItemSettings,
+    'snapshot-response': SnapshotResponseSettings,
+    'score-cache': ScoreCacheSettings
 }
 
 # Indexing
@@ -127,10 +202,12 @@ _INSENSITIVE = Collation('en_US', strength=CollationStrength.SECONDARY)
 PERMS_INDEX = ('perms.account', ASCENDING), ('perms.perm', ASCENDING)
 """Insensitive caps and accents collation, suited for searches with $regex of single text fields"""
 _DESCENDING_UPDATE = ('_updated', DESCENDING),
+_ANCESTOR_IDS_INDEX = IndexModel('ancestorIds', name='ancestors')
 _GROUP_INDEXES = [
     IndexModel(_DESCENDING_UPDATE, name='default group view'),
     IndexModel(_DESCENDING_UPDATE + PERMS_INDEX, name='default group view with perms'),
     IndexModel((('ancestors.lots', HASHED),), name='all lots ancestors'),
+    _ANCESTOR_IDS_INDEX,
     IndexModel('label', name='ranged label searches', collation=_INSENSITIVE, background=True)
 ]
 INDEXES = [
@@ -141,7 +218,9 @@ INDEXES = [
         [
             IndexModel((('@type', ASCENDING), ('events.@type', ASCENDING), ('events._updated', DESCENDING),
                         ('condition.general.range', ASCENDING)), name='default device info'),
-            IndexModel(PERMS_INDEX, name='perms')
+            IndexModel(PERMS_INDEX, name='perms'),
+            _ANCESTOR_IDS_INDEX,
+            IndexModel('_etag', name='similar components')
         ]
     ),
     (
@@ -149,7 +228,37 @@ INDEXES = [
         [
             IndexModel((('device', HASHED),), name='device relationship'),
             IndexModel('devices', name='devices relationship'),
-            IndexModel('components', name='components relationship')
+            IndexModel('components', name='components relationship'),
+            IndexModel('_uuid', name='snapshot uuid', unique=True, sparse=True)
+        ]
+    ),
+    (
+        SnapshotResponseDomain,
+        # After a month uploading the snapshot again gets the usual error of duplicated _uuid
+        [IndexModel('_created', name='expire snapshot responses',
+                    expireAfterSeconds=int(timedelta(days=30).total_seconds()))]
+    ),
+    (
+        ScoreCacheDomain,
+        [
+            IndexModel('used', name='least recently used'),
+            IndexModel((('kind', ASCENDING), ('version', ASCENDING)), name='results of a version')
+        ]
+    ),
+    (
+        JobDomain,
+        [
+            IndexModel((('status', ASCENDING), ('_created', ASCENDING)), name='job queue'),
+            IndexModel('affected', name='jobs moving a child', sparse=True),
+            IndexModel('group._id', name='jobs moving a group', sparse=True)
+        ]
+    ),
+    (
+        SnapshotImportItemDomain,
+        [
+            IndexModel((('status', ASCENDING), ('_created', ASCENDING), ('index', ASCENDING)), name='item queue'),
+            IndexModel((('keys', ASCENDING), ('status', ASCENDING)), name='items of a device or component'),
+            IndexModel('job', name='items of a job')
         ]
     ),
     (LotDomain, _GROUP_INDEXES),
@@ -5,7 +5,7 @@ from pydash import identity
 
 from ereuse_devicehub.exceptions import WrongQueryParam
 from ereuse_devicehub.header_cache import header_cache
-from ereuse_devicehub.rest import execute_get
+from ereuse_devicehub.rest import get_resources
 
 """
 The documents blueprint offers several documents (in PDF format for example)
@@ -38,13 +38,9 @@ def delivery_note(db: str) -> Response:
     ids = request.args.getlist('ids')
     if not ids:
         raise WrongQueryParam('ids', 'Send some device ids.')
-    query_params = {
-        'where': {'_id': {'$in': ids}},
-        'embedded': {'tests': 1, 'erasures': 1}
-    }
     template_params = {
         'title': 'Delivery note',
-        'devices': execute_get(db + '/devices', params=query_params)['_items'],
+        'devices': get_resources('devices', {'_id': {'$in': ids}}, {'tests': 1, 'erasures': 1}),
         'fields': (
             {'path': '_id', 'name': 'System ID'},
             {'path': '@type', 'name': 'Type'},
@@ -1,16 +1,26 @@
-import pymongo
-from collections import Iterator, OrderedDict, defaultdict
+import csv
+import io
+import math
+import re
+import tempfile
+from collections import Iterable, Iterator, OrderedDict, defaultdict
 from contextlib import suppress
 from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+from typing import Callable, List
 
 import flask_excel as excel
+import pymongo
 from eve.auth import requires_auth
-from flask import request
+from flask import Response, request, stream_with_context
 from inflection import humanize
+from openpyxl import Workbook
 from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
-from pydash import keys, map_, py_
+from pydash import keys, py_
 from pyexcel_webio import FILE_TYPE_MIME_TABLE as REVERSED_FILE_TYPE_MIME_TABLE
 from werkzeug.exceptions import NotAcceptable
+from werkzeug.wsgi import wrap_file
 
 from ereuse_devicehub.header_cache import header_cache
 from ereuse_devicehub.resources.account.domain import AccountDomain
@@ -20,7 +30,7 @@ from ereuse_devicehub.resources.event.device import DeviceEventDomain
 from ereuse_devicehub.resources.event.domain import EventNotFound
 from ereuse_devicehub.resources.group.domain import GroupDomain
 from ereuse_devicehub.resources.group.settings import Group
-from ereuse_devicehub.resources.submitter.translator import Translator
+from ereuse_devicehub.resources.submitter.translator import Translator, field
 
 FILE_TYPE_MIME_TABLE = dict(zip(REVERSED_FILE_TYPE_MIME_TABLE.values(), REVERSED_FILE_TYPE_MIME_TABLE.keys()))
 
@@ -41,6 +51,8 @@ def export(db, resource):
         request.args.get('type', 'detailed') == 'brief',
         request.args.get('max-of-type', None, type=int)
     )
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        return _stream(resource, ids, translator, file_type)
     spreadsheets = OrderedDict()
     if resource in Group.resource_names:
         domain = GroupDomain.children_resources[resource]
@@ -51,90 +63,229 @@ def export(db, resource):
             group = domain.get_one(_id)
             # Let's get the full devices and their components with embedded stuff
             devices = f(domain.get_descendants(DeviceDomain, _id))
-            devices_with_components = map(_get_device_with_components, devices)
-            spreadsheets[group.get('label', group['_id'])] = translator.translate(devices_with_components)
+            spreadsheets[group.get('label', group['_id'])] = translator.translate(translator.prefetched(devices))
     else:
         # Let's get the full devices and their components with embedded stuff
-        QUERY = {'@type': {'$nin': Component.types}}
-        devices = DeviceDomain.get_in('_id', ids, False) if ids else DeviceDomain.get(QUERY, False)
-        devices_with_components = map(_get_device_with_components, devices)
-        spreadsheets['Devices'] = translator.translate(devices_with_components)
+        devices = DeviceDomain.get_in('_id', ids, False) if ids else DeviceDomain.get(NON_COMPONENTS, False)
+        spreadsheets['Devices'] = translator.translate(translator.prefetched(devices))
     return excel.make_response_from_book_dict(spreadsheets, file_type, file_name=resource)
 
 
-def _get_device_with_components(device):
-    if 'components' in device:
-        device['components'] = DeviceDomain.get_full_components(device['components'])
+NUMBER_TYPES = int, float, Decimal
+NON_COMPONENTS = {'@type': {'$nin': Component.types}}
+CSV_CHUNK_SIZE = 64 * 1024
+"""Bytes of CSV we buffer before sending them to the client."""
+INVALID_SHEET_TITLE = re.compile(r'[\\*?:/\[\]]')
+
+
+def _stream(resource: str, ids: list, translator: 'SpreadsheetTranslator', file_type: str) -> Response:
+    """
+    Exports the devices without holding them in memory, for big exports.
+
+    The header is computed in a first, cheap, pass (see :meth:`SpreadsheetTranslator.field_names`),
+    and then the devices are read from a cursor and translated one by one as they are written.
+    CSV is sent in chunks as it is generated; XLSX is written to a temporary file with a write-only
+    workbook and then sent.
+    """
+    # The query of each spreadsheet
+    sheets = OrderedDict()
+    if resource in Group.resource_names:
+        domain = GroupDomain.children_resources[resource]
+        for _id in ids:
+            group = domain.get_one(_id)
+            query = dict(domain.descendants_query(_id), placeholder={'$ne': True}, **NON_COMPONENTS)
+            sheets[group.get('label', group['_id'])] = query
+    else:
+        sheets['Devices'] = {'_id': {'$in': ids}} if ids else NON_COMPONENTS
+    field_names = translator.field_names(sheets.values())
+    if file_type == 'csv':
+        return _stream_csv(resource, sheets, field_names, translator, resource in Group.resource_names)
+    elif file_type == 'xlsx':
+        return _stream_xlsx(resource, sheets, field_names, translator)
     else:
-        device['components'] = []
-    return device
+        raise NotAcceptable()
+
+
+def _stream_csv(file_name: str, sheets: OrderedDict, field_names: list, translator: 'SpreadsheetTranslator',
+                grouped: bool) -> Response:
+    """Sends the spreadsheets as one CSV. If grouped, the first column is the name of the spreadsheet (the group)."""
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow((['Group'] if grouped else []) + field_names)
+        for name, query in sheets.items():
+            for row in translator.rows(field_names, DeviceDomain.get(query, False)):
+                writer.writerow(([name] if grouped else []) + row)
+                if buffer.tell() >= CSV_CHUNK_SIZE:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+        yield buffer.getvalue()
+
+    headers = {'Content-Disposition': 'attachment; filename={}.csv'.format(file_name)}
+    return Response(stream_with_context(generate()), mimetype=REVERSED_FILE_TYPE_MIME_TABLE['csv'], headers=headers)
+
+
+def _stream_xlsx(file_name: str, sheets: OrderedDict, field_names: list,
+                 translator: 'SpreadsheetTranslator') -> Response:
+    """Sends the spreadsheets as a XLSX book, written row by row to a temporary file."""
+    book = Workbook(write_only=True)
+    for name, query in sheets.items():
+        sheet = book.create_sheet(INVALID_SHEET_TITLE.sub(' ', str(name))[:31])
+        sheet.append(field_names)
+        for row in translator.rows(field_names, DeviceDomain.get(query, False)):
+            sheet.append(row)
+    file = tempfile.TemporaryFile()  # Removed when closed, which happens when the response is sent
+    book.save(file)
+    file.seek(0)
+    headers = {'Content-Disposition': 'attachment; filename={}.xlsx'.format(file_name)}
+    # send_file does not accept TemporaryFile, whose name is a file descriptor
+    return Response(wrap_file(request.environ, file), mimetype=REVERSED_FILE_TYPE_MIME_TABLE['xlsx'],
+                    headers=headers, direct_passthrough=True)
+
+
+def _batches(iterable: Iterable, size: int) -> Iterator:
+    """Yields lists of up to ``size`` elements of the iterable, consuming it lazily."""
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+ILLEGAL_CHARACTERS = {c: None for c in range(32) if ILLEGAL_CHARACTERS_RE.match(chr(c))}
+"""A str.translate table that removes the characters openpyxl does not accept, so a string has them if it shrinks."""
+
+
+def _floor(path: str) -> Callable[[dict], float or None]:
+    """Gets the value of the path rounded down as a float, or None if it is not a number, as pydash's floor."""
+    get = field(path)
+
+    def floor(resource: dict):
+        value = get(resource)
+        return float(math.floor(value)) if isinstance(value, NUMBER_TYPES) and type(value) is not bool else None
+
+    return floor
+
+
+def _join(*names: str) -> Callable[[dict], str]:
+    """
+    Joins with spaces the values of the passed-in fields of a resource, in the order of the resource,
+    like pydash's ``pick(*names).join(' ')``.
+    """
+    names = frozenset(names)
+
+    def join(resource: dict or None) -> str:
+        if not resource:
+            return ''
+        return ' '.join(value if isinstance(value, str) else '' if value is None else str(value)
+                        for key, value in resource.items() if key in names)
+
+    return join
+
+
+_pick_state = _join('@type', 'label')
+
+
+def _state(device: dict) -> str:
+    """The type and label of the first event of the device."""
+    events = device.get('events')
+    return _pick_state(events[0] if events else None)
+
+
+def _inventory(url: str) -> tuple:
+    """The name of the inventory and the identifier of a device in a sameAs url."""
+    components = url.split('/')
+    return components[3], components[-1]
 
 
 class SpreadsheetTranslator(Translator):
     """Translates a set of devices into a dict for flask-excel representing a spreadsheet"""
+    UPDATE_FIELD_NAMES = [
+        'Margin', 'Price Update', 'Partners', 'Origin note', 'Target note',
+        'Guarantee Years', 'Invoice Platform ID', 'Invoice Retailer ID',
+        'Last other inventory ID', 'eTag'
+    ]
+    """The columns that come from the Update events and sameAs, after the ones of the translation dict."""
+    BRIEF_COMPONENT_TYPES = {'Motherboard', 'RamModule', 'Processor'}
+    """The types of components that, in brief, only have their system id, serial number, model and manufacturer."""
+    COMPONENT_FIELD_NAMES = {
+        'HardDrive': ['erasure', 'lifetime (years)', 'test result', 'lifetime (hours)', 'reading speed',
+                      'writing speed'],
+        'Processor': ['number of cores', 'score'],
+        'RamModule': ['size', 'speed']
+    }
+    """The specific columns of each type of component, after its header (i.e. 'HardDrive 1 erasure')."""
+    BATCH_SIZE = 500
+    """How many devices :meth:`field_names` reads at once."""
+    PREFETCH_SIZE = 1000
+    """How many devices :meth:`prefetched` gets the components and Update events of at once."""
 
     def __init__(self, brief: bool, max_components_of_type=None):
         # Definition of the dictionary used to translate
         self.brief = brief
         self.max_components_of_type = max_components_of_type
-        p = py_()
+        # Values are dotted paths of the device or functions, compiled once by Translator
         d = OrderedDict()  # we want ordered dict as in translate we want to preserve this order in the spreadsheet
-        d['Identifier'] = p.get('_id')
-        d['Type'] = p.get('@type')
-        d['Subtype'] = p.get('type')
+        d['Identifier'] = '_id'
+        d['Type'] = '@type'
+        d['Subtype'] = 'type'
         if not brief:
-            d['Label ID'] = p.get('labelId')
-            d['Giver ID'] = p.get('gid')
-            d['Platform ID'] = p.get('pid')
-            d['Refurbisher ID'] = p.get('rid')
-            d['Serial Number'] = p.get('serialNumber')
-        d['Price'] = p.get('pricing.total.standard')
-        d['Price 2 years warranty'] = p.get('pricing.total.warranty2')
-        d['Model'] = p.get('model')
-        d['Manufacturer'] = p.get('manufacturer')
+            d['Label ID'] = 'labelId'
+            d['Giver ID'] = 'gid'
+            d['Platform ID'] = 'pid'
+            d['Refurbisher ID'] = 'rid'
+            d['Serial Number'] = 'serialNumber'
+        d['Price'] = 'pricing.total.standard'
+        d['Price 2 years warranty'] = 'pricing.total.warranty2'
+        d['Model'] = 'model'
+        d['Manufacturer'] = 'manufacturer'
         if not brief:
-            d['State'] = p.get('events').head().pick('@type', 'label').join(' ')
-            d['Registered in'] = p.get('_created')
-        d['Processor'] = p.get('processorModel')
-        d['RAM (GB)'] = p.get('totalRamSize').floor()
-        d['HDD (MB)'] = p.get('totalHardDriveSize').floor()
-        d['Condition Score'] = p.get('condition.general.score')
-        d['Condition'] = p.get('condition.general.range')
+            d['State'] = _state
+            d['Registered in'] = '_created'
+        d['Processor'] = 'processorModel'
+        d['RAM (GB)'] = _floor('totalRamSize')
+        d['HDD (MB)'] = _floor('totalHardDriveSize')
+        d['Condition Score'] = 'condition.general.score'
+        d['Condition'] = 'condition.general.range'
         if not brief:
-            d['Appearance'] = p.get('condition.appearance.general')
-            d['Appearance Score'] = p.get('condition.appearance.score')
-            d['Functionality'] = p.get('condition.functionality.general')
-            d['Functionality Score'] = p.get('condition.functionality.score')
-            d['Labelling'] = p.get('condition.labelling')
-            d['Bios'] = p.get('condition.bios.general')
-            d['Processor Score'] = p.get('condition.components.processors')
-            d['RAM Score'] = p.get('condition.components.ram')
-            d['HDD Score'] = p.get('condition.components.hardDrives')
-            d['Refurbisher percentage'] = p.get('pricing.refurbisher.standard.percentage')
-            d['Refurbisher amount'] = p.get('pricing.refurbisher.standard.amount')
-            d['Retailer percentage'] = p.get('pricing.retailer.standard.percentage')
-            d['Retailer amount'] = p.get('pricing.retailer.standard.amount')
-            d['Platform percentage'] = p.get('pricing.platform.standard.percentage')
-            d['Platform amount'] = p.get('pricing.platform.standard.amount')
-            d['Refurbisher percentage 2 years warranty'] = p.get('pricing.refurbisher.warranty2.percentage')
-            d['Refurbisher amount 2 years warranty'] = p.get('pricing.refurbisher.warranty2.amount')
-            d['Retailer percentage 2 years warranty'] = p.get('pricing.retailer.warranty2.percentage')
-            d['Retailer amount 2 years warranty'] = p.get('pricing.retailer.warranty2.amount')
-            d['Platform percentage 2 years warranty'] = p.get('pricing.platform.warranty2.percentage')
-            d['Platform amount 2 years warranty'] = p.get('pricing.platform.warranty2.amount')
+            d['Appearance'] = 'condition.appearance.general'
+            d['Appearance Score'] = 'condition.appearance.score'
+            d['Functionality'] = 'condition.functionality.general'
+            d['Functionality Score'] = 'condition.functionality.score'
+            d['Labelling'] = 'condition.labelling'
+            d['Bios'] = 'condition.bios.general'
+            d['Processor Score'] = 'condition.components.processors'
+            d['RAM Score'] = 'condition.components.ram'
+            d['HDD Score'] = 'condition.components.hardDrives'
+            d['Refurbisher percentage'] = 'pricing.refurbisher.standard.percentage'
+            d['Refurbisher amount'] = 'pricing.refurbisher.standard.amount'
+            d['Retailer percentage'] = 'pricing.retailer.standard.percentage'
+            d['Retailer amount'] = 'pricing.retailer.standard.amount'
+            d['Platform percentage'] = 'pricing.platform.standard.percentage'
+            d['Platform amount'] = 'pricing.platform.standard.amount'
+            d['Refurbisher percentage 2 years warranty'] = 'pricing.refurbisher.warranty2.percentage'
+            d['Refurbisher amount 2 years warranty'] = 'pricing.refurbisher.warranty2.amount'
+            d['Retailer percentage 2 years warranty'] = 'pricing.retailer.warranty2.percentage'
+            d['Retailer amount 2 years warranty'] = 'pricing.retailer.warranty2.amount'
+            d['Platform percentage 2 years warranty'] = 'pricing.platform.warranty2.percentage'
+            d['Platform amount 2 years warranty'] = 'pricing.platform.warranty2.amount'
         # Note that in translate_one we translate 'components'
         super().__init__(d)
+        self._component_description = _join(*(([] if brief else ['_id', 'serialNumber']) + ['model', 'manufacturer']))
+        self.updates = {}
+        """The Update events of the devices of the last prefetched batch, by device id."""
 
     def translate_one(self, device: dict) -> dict:
         translated = super().translate_one(device)
         # Avoid exception in openpyxl/cell/cell.py line 156 for using illegal characters
         for key, value in translated.items():
-            if type(value) is str:
-                if next(ILLEGAL_CHARACTERS_RE.finditer(value), None):
-                    translated[key] = '**'
+            if type(value) is str and len(value.translate(ILLEGAL_CHARACTERS)) != len(value):
+                translated[key] = '**'
         # Component translation
         # Let's decompose components so we get ComponentTypeA 1: ..., ComponentTypeA 2: ...
-        pick = py_().pick(([] if self.brief else ['_id', 'serialNumber']) + ['model', 'manufacturer']).join(' ')
+        pick = self._component_description
         counter_each_type = defaultdict(int)
         for pos, component in enumerate(device['components']):
             _type = device['components'][pos]['@type']
@@ -146,7 +297,7 @@ class SpreadsheetTranslator(Translator):
             translated[header + ' serial number'] = component.get('serialNumber', '')
             translated[header + ' model'] = component.get('model', '')
             translated[header + ' manufacturer'] = component.get('manufacturer', '')
-            if not self.brief or _type not in {'Motherboard', 'RamModule', 'Processor'}:
+            if not self.brief or _type not in self.BRIEF_COMPONENT_TYPES:
                 translated[header] = pick(component)
                 if _type == 'HardDrive':
                     with suppress(KeyError, TypeError):
@@ -167,9 +318,9 @@ class SpreadsheetTranslator(Translator):
                     with suppress(KeyError):
                         translated[header + ' score'] = next(b['score'] for b in component['benchmarks'] if b['@type'] == 'BenchmarkProcessor')
                 elif _type == 'RamModule':
-                    for field in 'size', 'speed':
+                    for name in 'size', 'speed':
                         with suppress(KeyError):
-                            translated[header + ' ' + field] = component[field]
+                            translated[header + ' ' + name] = component[name]
         if translated.get('Registered in', None):
             # When snapshot executes this method devices don't have this property
             translated['Registered in'] = str(translated['Registered in'])
@@ -177,8 +328,10 @@ class SpreadsheetTranslator(Translator):
         # Update event
         if not self.brief:
             with suppress(EventNotFound):
-                updates = DeviceEventDomain.get({'$query': {'devices': {'$in': [device['_id']]}, '@type': 'devices:Update'},
-                                                        '$orderby': {'_created': pymongo.ASCENDING}})
+                if device['_id'] in self.updates:
+                    updates = self.updates[device['_id']]
+                else:  # Devices that have not been prefetched, like the ones of compute_many in score_condition
+                    updates = self._get_updates([device['_id']])
                 for update in updates:
                     if update.get('margin', None):
                         translated['Margin'] = update['margin']
@@ -202,11 +355,9 @@ class SpreadsheetTranslator(Translator):
             # Same as
             same_as = device.get('sameAs', None)
             if same_as:
-                components = same_as[0].split('/')
-                translated['Last other inventory ID'] = '{} {}'.format(components[3], components[-1])
-                for url in same_as:
-                    components = url.split('/')
-                    translated[components[3]] = components[-1]
+                inventories = [_inventory(url) for url in same_as]
+                translated['Last other inventory ID'] = '{} {}'.format(*inventories[0])
+                translated.update(inventories)
         return translated
 
     def translate(self, devices: Iterator) -> list:
@@ -215,13 +366,97 @@ class SpreadsheetTranslator(Translator):
         # Let's transform the dict to a table-like array
         # Generation of table headers
         # We want first the keys we set in the translation dict
+        field_names = self._fixed_field_names()
+        field_names += py_(translated).map(keys).flatten().uniq().difference(field_names).sort().value()
+        return [field_names] + [self.row(field_names, resource) for resource in translated]
+
+    def field_names(self, queries: Iterable) -> List[str]:
+        """
+        Computes the header of the spreadsheet of the devices matching the queries without translating them,
+        in the same order as :meth:`translate`.
+
+        This only reads the components and sameAs of the devices and the type of their components, in batches,
+        so the memory it uses does not grow with the number of devices. As we do not translate the devices,
+        the header can have columns that are empty in all rows, like the erasure of a hard-drive without erasures.
+        """
+        max_of_type = defaultdict(int)  # The maximum number of components of each type a device has
+        inventories = set()
+        for query in queries:
+            devices = DeviceDomain.get(query, False, {'components': True, 'sameAs': True})
+            for batch in _batches(devices, self.BATCH_SIZE):
+                components_ids = [_id for device in batch for _id in device.get('components', [])]
+                components = DeviceDomain.get_in('_id', components_ids, projection={'@type': True})
+                types = {component['_id']: component['@type'] for component in components}
+                for device in batch:
+                    counter_each_type = defaultdict(int)
+                    for _id in device.get('components', []):
+                        with suppress(KeyError):
+                            counter_each_type[types[_id]] += 1
+                    for _type, count in counter_each_type.items():
+                        max_of_type[_type] = max(max_of_type[_type], count)
+                    if not self.brief:
+                        inventories.update(url.split('/')[3] for url in device.get('sameAs', []))
+        field_names = self._fixed_field_names()
+        others = set(inventories)
+        for _type, count in max_of_type.items():
+            if self.max_components_of_type:
+                count = min(count, self.max_components_of_type - 1)
+            for i in range(1, count + 1):
+                others.update(self._component_field_names('{} {}'.format(_type, i), _type))
+        return field_names + sorted(others.difference(field_names))
+
+    def rows(self, field_names: list, devices: Iterable) -> Iterator:
+        """Lazily translates the devices, with their components, as rows of the passed-in field names."""
+        for device in self.prefetched(devices):
+            yield self.row(field_names, self.translate_one(device))
+
+    def prefetched(self, devices: Iterable) -> Iterator:
+        """
+        Lazily yields the devices with their full components (see :meth:`DeviceDomain.get_full_components`),
+        getting them and, if not brief, the Update events of the devices, for batches of PREFETCH_SIZE devices.
+
+        This performs a few queries for each batch instead of a few for each device; :meth:`translate_one`
+        reads the Update events of the last batch from :attr:`updates`.
+        """
+        for batch in _batches(devices, self.PREFETCH_SIZE):
+            components = DeviceDomain.get_full_components([_id for d in batch for _id in d.get('components', [])])
+            # Each device keeps the order the components had when we got them device by device
+            position = {component['_id']: i for i, component in enumerate(components)}
+            components = {component['_id']: component for component in components}
+            for device in batch:
+                ids = sorted((_id for _id in device.get('components', []) if _id in components), key=position.get)
+                device['components'] = [components[_id] for _id in ids]
+            self.updates = {}
+            if not self.brief:
+                self.updates = {device['_id']: [] for device in batch}
+                for update in self._get_updates(list(self.updates.keys())):
+                    for _id in update['devices']:
+                        if _id in self.updates:
+                            self.updates[_id].append(update)
+            yield from batch
+
+    @staticmethod
+    def _get_updates(ids: list) -> list:
+        """The Update events performed to any of the devices, from the oldest."""
+        return DeviceEventDomain.get({'$query': {'devices': {'$in': ids}, '@type': 'devices:Update'},
+                                      '$orderby': {'_created': pymongo.ASCENDING}})
+
+    @staticmethod
+    def row(field_names: list, translated: dict) -> list:
+        """A row of a translated resource; we do not use pick as we don't want None but '' for empty."""
+        return [translated[f] if translated.get(f, None) is not None else '' for f in field_names]
+
+    def _fixed_field_names(self) -> list:
+        """The columns that are always in the header, before the ones from the components and sameAs."""
         field_names = list(self.dict.keys())
         if not self.brief:
-            field_names.extend([
-                'Margin', 'Price Update', 'Partners', 'Origin note', 'Target note',
-                'Guarantee Years', 'Invoice Platform ID', 'Invoice Retailer ID',
-                'Last other inventory ID', 'eTag'
-            ])
-        field_names += py_(translated).map(keys).flatten().uniq().difference(field_names).sort().value()
-        # compute the rows; header titles + fields (note we do not use pick as we don't want None but '' for empty)
-        return [field_names] + map_(translated, lambda res: [res.get(f, '') if res.get(f, None) is not None else '' for f in field_names])
+            field_names.extend(self.UPDATE_FIELD_NAMES)
+        return field_names
+
+    def _component_field_names(self, header: str, _type: str) -> list:
+        """The columns :meth:`translate_one` can set for a component of the given type and header."""
+        field_names = [header + ' system id', header + ' serial number', header + ' model', header + ' manufacturer']
+        if not self.brief or _type not in self.BRIEF_COMPONENT_TYPES:
+            field_names.append(header)
+            field_names.extend(header + ' ' + name for name in self.COMPONENT_FIELD_NAMES.get(_type, []))
+        return field_names
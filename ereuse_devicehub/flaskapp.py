@@ -2,6 +2,8 @@
 DeviceHub app
 """
 import inspect
+import time
+from collections import OrderedDict
 from contextlib import contextmanager, suppress
 from datetime import timedelta
 from typing import Type
@@ -19,11 +21,12 @@ from flask import json, redirect, request
 from flask_mail import Mail
 from inflection import camelize
 from shortid import ShortId
+from werkzeug.utils import cached_property
 
 # noinspection PyUnresolvedReferences
 from ereuse_devicehub import helpers
 from ereuse_devicehub.aggregation.settings import aggregate_view
-from ereuse_devicehub.data_layer import DataLayer, MongoEncoder
+from ereuse_devicehub.data_layer import DataLayer, MongoEncoder, report_collection_stats, start_collection_stats
 from ereuse_devicehub.desktop_app.desktop_app import DesktopApp
 from ereuse_devicehub.dh_pydash import pydash
 from ereuse_devicehub.documents.documents import documents
@@ -33,20 +36,26 @@ from ereuse_devicehub.header_cache import header_cache
 from ereuse_devicehub.hooks import hooks
 from ereuse_devicehub.inventory import inventory
 from ereuse_devicehub.mails.mails import mails
+from ereuse_devicehub.resources.account.cache import AccountCache, report_auth_stats, start_auth_stats
 from ereuse_devicehub.resources.account.domain import AccountDomain
 from ereuse_devicehub.resources.account.login.settings import login
-from ereuse_devicehub.resources.device.score_condition import Price, Score
+from ereuse_devicehub.resources.device.score_condition import SCORE_BACKENDS
 from ereuse_devicehub.resources.event.device.live.geoip_factory import GeoIPFactory
 from ereuse_devicehub.resources.event.device.register.placeholders import placeholders
-from ereuse_devicehub.resources.event.device.snapshot.hooks import return_202_when_could_not_add_to_group
+from ereuse_devicehub.resources.event.device.snapshot.hooks import add_condition_price_job, \
+    return_202_when_could_not_add_to_group, save_snapshot_response
+from ereuse_devicehub.resources.identity_map import report_identity_map, start_identity_map
+from ereuse_devicehub.resources.job.condition_price.domain import ConditionPriceDomain
+from ereuse_devicehub.resources.job.group_move.hooks import return_202_when_moving_children
+from ereuse_devicehub.resources.job.snapshot_import.upload import import_snapshots
+from ereuse_devicehub.resources.job.worker import JobWorkers
 from ereuse_devicehub.resources.manufacturers import ManufacturerDomain
 from ereuse_devicehub.resources.resource import ResourceSettings
 from ereuse_devicehub.resources.submitter.grd_submitter.grd_submitter import GRDSubmitter
 from ereuse_devicehub.resources.submitter.submitter_caller import SubmitterCaller
-from ereuse_devicehub.scripts.get_manufacturers import ManufacturersGetter
 from ereuse_devicehub.security.auth import Auth
 from ereuse_devicehub.static import send_device_icon
-from ereuse_devicehub.url_parse import UrlParse
+from ereuse_devicehub.url_parse import DatabaseConverter, UrlParse
 from ereuse_devicehub.utils import DeviceHubConfig, cache
 from ereuse_devicehub.validation.validation import DeviceHubValidator
 
@@ -56,49 +65,154 @@ class DeviceHub(Eve):
 
     def __init__(self, import_name=__package__, settings='settings.py', validator=DeviceHubValidator, data=DataLayer,
                  auth=Auth, redis=None, url_converters=None, json_encoder=None, media=GridFSMediaStorage,
-                 url_parse=UrlParse, mongo_encoder=MongoEncoder, score=Score, price=Price, desktop_app=DesktopApp,
+                 url_parse=UrlParse, mongo_encoder=MongoEncoder, score=None, price=None, desktop_app=DesktopApp,
                  **kwargs):
         ensure_utf8(self.__class__.__name__)
-        super().__init__(import_name, settings, validator, data, auth, redis, url_converters, json_encoder, media,
-                         **kwargs)
-        self.json_encoder = MongoJSONEncoder
-        self.mongo_encoder = mongo_encoder()
-        self.cache = cache
-        self.cache.init_app(self)
-        self.sid = ShortId()  # Short id for groups
-        # Use flask_cors to extend flask's native implementation of options to use cors, for all the endpoints
-        # that are not resources.
-        flask_cors.CORS(self, origins=self.config.get('DOMAINS', '*'),
-                        expose_headers=self.config['X_EXPOSE_HEADERS'],
-                        allow_headers=self.config['X_HEADERS'],
-                        max_age=self.config['X_MAX_AGE'])
-        self.url_parse = url_parse()
-        flask_excel.init_excel(self)  # required since version 0.0.7
-        self.geoip = GeoIPFactory(self)
-        hooks(self)  # Set up hooks. You can add more hooks by doing something similar with app "hooks(app)"
-        ErrorHandlers(self)
-        self.add_url_rule('/login', 'login', view_func=login, methods=['POST'])
-        self.add_url_rule('/devices/icons/<file_name>', view_func=send_device_icon)
-        self.add_url_rule('/<db>/aggregations/<resource>/<method>', 'aggregation', view_func=aggregate_view)
-        self.add_url_rule('/<db>/export/<resource>', view_func=export)
-        self.add_url_rule('/<db>/events/<resource>/placeholders', view_func=placeholders, methods=['POST'])
-        self.add_url_rule('/<db>/inventory', view_func=inventory)
-        self.before_request(self.redirect_on_browser)
-        self.after_request(return_202_when_could_not_add_to_group)
-        self.register_blueprint(documents)
-        self.register_blueprint(mails)
-        self.desktop_app = desktop_app(self)
-        self.mail = Mail(self)
-        self._load_jinja_stuff()
+        self.startup_times = OrderedDict()
+        """The milliseconds each phase of the start-up and each lazily initialized subsystem took."""
+        url_converters = dict(url_converters or {}, database=DatabaseConverter)
+        with self.startup_phase('eve'):
+            super().__init__(import_name, settings, validator, data, auth, redis, url_converters, json_encoder,
+                             media, **kwargs)
+            # For DatabaseConverter, which cannot use current_app
+            self.url_map.databases = self.config['DATABASES']
+        with self.startup_phase('app'):
+            self.json_encoder = MongoJSONEncoder
+            self.mongo_encoder = mongo_encoder()
+            self.cache = cache
+            self.cache.init_app(self)
+            self.sid = ShortId()  # Short id for groups
+            ttl = self.config['ACCOUNT_CACHE_TTL']
+            self.account_cache = AccountCache(ttl, self.config['ACCOUNT_CACHE_SIZE']) if ttl else None
+            # Use flask_cors to extend flask's native implementation of options to use cors, for all the endpoints
+            # that are not resources.
+            flask_cors.CORS(self, origins=self.config.get('DOMAINS', '*'),
+                            expose_headers=self.config['X_EXPOSE_HEADERS'],
+                            allow_headers=self.config['X_HEADERS'],
+                            max_age=self.config['X_MAX_AGE'])
+            self.url_parse = url_parse()
+            flask_excel.init_excel(self)  # required since version 0.0.7
+            hooks(self)  # Set up hooks. You can add more hooks by doing something similar with app "hooks(app)"
+            ErrorHandlers(self)
+            self.add_url_rule('/login', 'login', view_func=login, methods=['POST'])
+            self.add_url_rule('/devices/icons/<file_name>', view_func=send_device_icon)
+            self.add_url_rule('/<database:db>/aggregations/<resource>/<method>', 'aggregation', view_func=aggregate_view)
+            self.add_url_rule('/<database:db>/export/<resource>', view_func=export)
+            self.add_url_rule('/<database:db>/events/<resource>/placeholders', view_func=placeholders, methods=['POST'])
+            self.add_url_rule('/<database:db>/events/<resource>/import', view_func=import_snapshots, methods=['POST'])
+            self.add_url_rule('/<database:db>/inventory', view_func=inventory)
+            self.url_value_preprocessor(self.pop_database)
+            self.before_request(self.redirect_on_browser)
+            self.before_request(start_identity_map)
+            self.after_request(report_identity_map)
+            self.before_request(start_collection_stats)
+            self.after_request(report_collection_stats)
+            self.before_request(start_auth_stats)
+            self.after_request(report_auth_stats)
+            # Flask executes after_request functions in reverse order, so we save the final response of the snapshot
+            self.after_request(save_snapshot_response)
+            self.after_request(add_condition_price_job)
+            self.after_request(return_202_when_could_not_add_to_group)
+            self.after_request(return_202_when_moving_children)
+            self.register_blueprint(documents)
+            self.register_blueprint(mails)
+            self.desktop_app = desktop_app(self)
+            # Mail only reads the settings, and Message needs it in app.extensions before sending
+            self.mail = Mail(self)
+            self._load_jinja_stuff()
+        # R, GeoIP, the GRD submitter and the manufacturers are initialized on first use
+        # (see the properties below), or all at once through warm_up
+        self._score_class, self._price_class = score, price
+        self.manufacturers_loaded = False
+        if self.config['WARM_UP']:
+            self.warm_up()
+        # Workers are forked from here, so they inherit what warm_up initialized and initialize the rest on first use
+        with self.startup_phase('workers'):
+            self.workers = []
+            if self.config['JOB_WORKERS']:
+                self.job_workers = JobWorkers(self, self.config['JOB_WORKERS'], self.config['JOB_POLL_INTERVAL'])
+                self.workers.append(self.job_workers)
+            if self.config['SCORE_WORKERS']:
+                self.score_workers = JobWorkers(self, self.config['SCORE_WORKERS'], self.config['JOB_POLL_INTERVAL'],
+                                                ConditionPriceDomain)
+                self.workers.append(self.score_workers)
+            self.before_request(self.prepare_workers)
+        self.logger.info('Started DeviceHub in {:.2f} ms ({}).'.format(
+            sum(self.startup_times.values()),
+            ', '.join('{} {:.2f} ms'.format(phase, ms) for phase, ms in self.startup_times.items())
+        ))
+
+    @contextmanager
+    def startup_phase(self, phase: str):
+        """Times the enclosed initialization, saving it in :attr:`startup_times`."""
+        start = time.perf_counter()
+        yield
+        self.startup_times[phase] = (time.perf_counter() - start) * 1000
+
+    def _initialize(self, subsystem: str, initialize):
+        """Initializes a lazy subsystem, logging how long it took."""
+        with self.startup_phase(subsystem):
+            value = initialize()
+        self.logger.info('Initialized {} in {:.2f} ms.'.format(subsystem, self.startup_times[subsystem]))
+        return value
+
+    @cached_property
+    def score(self):
+        """Computes the condition score of the devices, loading R or the NumPy models as SCORE_BACKEND says."""
+        default_score, _ = SCORE_BACKENDS[self.config['SCORE_BACKEND']]
+        return self._initialize('score', lambda: (self._score_class or default_score)(self))
+
+    @cached_property
+    def price(self):
+        """Computes the price of the devices, loading R or the NumPy models as SCORE_BACKEND says."""
+        _, default_price = SCORE_BACKENDS[self.config['SCORE_BACKEND']]
+        return self._initialize('price', lambda: (self._price_class or default_price)(self))
+
+    @cached_property
+    def geoip(self):
+        """The client of the GeoIP service, built on the first Live event."""
+        return self._initialize('geoip', lambda: GeoIPFactory(self))
+
+    @cached_property
+    def grd_submitter_caller(self):
+        """The GRD submitter, which starts its process (and logs in GRD's account) with the first event to submit."""
+        return self._initialize('GRD submitter', lambda: SubmitterCaller(self, GRDSubmitter))
+
+    def prepare_workers(self):
+        """
+        Starts again the job and score workers that died. This is executed in a before_request.
+
+        The jobs they were executing are claimed again once their lease expires (see :meth:`JobDomain.claim`).
+        """
+        for workers in self.workers:
+            workers.prepare_processes()
+
+    def load_manufacturers(self):
+        """Loads the manufacturers to database if their collection is empty, once per process."""
+        if not self.manufacturers_loaded:
+            def _load():
+                with self.app_context():
+                    if ManufacturerDomain.count() == 0:
+                        from ereuse_devicehub.scripts.get_manufacturers import ManufacturersGetter
+                        ManufacturersGetter().execute(self)
+
+            self._initialize('manufacturers', _load)
+            self.manufacturers_loaded = True
+
+    def warm_up(self):
+        """
+        Initializes now the subsystems that are otherwise initialized on first use: R (or the NumPy models),
+        GeoIP, the GRD submitter and the manufacturers.
+
+        Call it once per process where you prefer paying the cost before the first request, like in the post_fork
+        hook of gunicorn, or set WARM_UP.
+        """
+        subsystems = ['score', 'price', 'geoip']
         if self.config.get('GRD', True):
-            self.grd_submitter_caller = SubmitterCaller(self, GRDSubmitter)
-        # Load manufacturers to database if manufacturer's collection in db is empty
-        with self.app_context():
-            if ManufacturerDomain.count() == 0:
-                ManufacturersGetter().execute(self)
-        # Load RScore and RPrice
-        self.score = score(self)
-        self.price = price(self)
+            subsystems.append('grd_submitter_caller')
+        for subsystem in subsystems:
+            getattr(self, subsystem)
+        self.load_manufacturers()
 
     def register_resource(self, resource: str, settings: Type[ResourceSettings]):
         """
@@ -115,34 +229,40 @@ class DeviceHub(Eve):
 
     def _add_resource_url_rules(self, resource, settings):
         """
-            For the given resources set to work with different databases, it registers as many URL as defined databases
-            in the following way:
+            For the given resources set to work with different databases, it registers their URLs prefixed
+            with the database, which the converter :class:`ereuse_devicehub.url_parse.DatabaseConverter`
+            validates against DATABASES when matching the URL:
             For resource 'devices' and db1, db2, ... dn databases:
-            - db1/devices
-            - db2/devices
-            ...
-            - dbn/devices
+            - <database:db>/devices, matching db1/devices, db2/devices ... dn/devices
+
+            This is one set of rules for all the databases, instead of one for each database. Eve's views
+            don't get the database; check :meth:`pop_database`.
 
             Check the attribute 'use_default_database' in class :class:`app.resources.resource.ResourceSettings`,
             which forces the resource to just use the default database.
         """
-
-        @contextmanager
-        def prefixed_db(db):
+        if settings.get('use_default_database', False):
+            super()._add_resource_url_rules(resource, settings)
+        else:
             real_url_prefix = self.config['URL_PREFIX']
             if real_url_prefix:
-                self.config['URL_PREFIX'] += '/{}'.format(db)
+                self.config['URL_PREFIX'] += '/<database:db>'
             else:
-                self.config['URL_PREFIX'] = db
-            yield
-            self.config['URL_PREFIX'] = real_url_prefix
+                self.config['URL_PREFIX'] = '<database:db>'
+            try:
+                super()._add_resource_url_rules(resource, settings)
+            finally:
+                self.config['URL_PREFIX'] = real_url_prefix
 
-        if settings.get('use_default_database', False):
-            super()._add_resource_url_rules(resource, settings)
-        else:
-            for db in self.config['DATABASES']:
-                with prefixed_db(db):
-                    super()._add_resource_url_rules(resource, settings)
+    @staticmethod
+    def pop_database(endpoint: str, values: dict):
+        """
+        Removes the database from the URL values of the endpoints of Eve, which use them as the lookup of the
+        query. :attr:`ereuse_devicehub.resources.account.domain.AccountDomain.requested_database` gets the
+        database from the URL.
+        """
+        if endpoint and '|' in endpoint and values:
+            values.pop('db', None)
 
     def _init_media_endpoint(self):
         """
@@ -161,7 +281,7 @@ class DeviceHub(Eve):
 
         endpoint = self.config['MEDIA_ENDPOINT']
         if endpoint:
-            url = '{}/<db>/{}/<{}:_id>'.format(self.api_prefix, endpoint, self.config['MEDIA_URL'])
+            url = '{}/<database:db>/{}/<{}:_id>'.format(self.api_prefix, endpoint, self.config['MEDIA_URL'])
             self.add_url_rule(url, 'media', view_func=_media_endpoint)
             url = '{}/{}/<{}:_id>'.format(self.api_prefix, endpoint, self.config['MEDIA_URL'])
             self.add_url_rule(url, 'media-open', view_func=_media_endpoint_open)
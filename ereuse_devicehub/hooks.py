@@ -13,6 +13,9 @@ def hooks(app):
     from ereuse_devicehub.resources.hooks import convert_dh_operators
     app.on_pre_GET += convert_dh_operators
 
+    from ereuse_devicehub.resources.manufacturers import load_manufacturers
+    app.on_pre_GET_manufacturers += load_manufacturers
+
     from ereuse_devicehub.resources.hooks import avoid_deleting_if_not_last_event_or_more_x_minutes
     app.on_pre_DELETE += avoid_deleting_if_not_last_event_or_more_x_minutes
 
@@ -48,16 +51,20 @@ def hooks(app):
 
     from ereuse_devicehub.resources.event.device.snapshot.hooks import on_insert_snapshot, save_request, \
         materialize_test_hard_drives, materialize_erasures, delete_events, move_id_remove_logical_name, \
-        compute_condition_price_and_materialize_in_device, add_to_group
+        compute_condition_price_and_materialize_in_device, add_to_group, replay_snapshot, delete_snapshot_response, \
+        materialize_unsecured_components
     from ereuse_devicehub.resources.event.device.hooks import validate_only_components_can_have_parents
     app.on_insert_devices_snapshot += validate_only_components_can_have_parents
     app.on_insert_devices_snapshot += on_insert_snapshot
     app.on_insert_devices_snapshot += save_request
     app.on_inserted_devices_snapshot += materialize_test_hard_drives
     app.on_inserted_devices_snapshot += materialize_erasures
+    app.on_inserted_devices_snapshot += materialize_unsecured_components
     app.on_inserted_devices_snapshot += compute_condition_price_and_materialize_in_device
     app.on_delete_item += delete_events
-    app.on_pre_POST_devices_snapshot = move_id_remove_logical_name
+    app.on_delete_item += delete_snapshot_response
+    app.on_pre_POST_devices_snapshot += replay_snapshot
+    app.on_pre_POST_devices_snapshot += move_id_remove_logical_name
     app.on_inserted_devices_snapshot += add_to_group
 
     from ereuse_devicehub.resources.event.device.hooks import get_place, materialize_components, materialize_parent, \
@@ -112,6 +119,11 @@ def hooks(app):
     app.on_insert_accounts += hash_password
     app.on_insert_accounts += set_default_database_if_empty
 
+    from ereuse_devicehub.resources.account.hooks import invalidate_cached_account, invalidate_cached_deleted_account
+    app.on_updated_accounts += invalidate_cached_account
+    app.on_replaced_accounts += invalidate_cached_account
+    app.on_deleted_item_accounts += invalidate_cached_deleted_account
+
     from ereuse_devicehub.resources.event.device.receive.hooks import transfer_property, set_organization
     app.on_insert_devices_receive += transfer_property
     app.on_insert_devices_receive += set_organization
@@ -126,6 +138,10 @@ def hooks(app):
     app.on_insert += set_perms
     app.on_update += update_perms
 
+    from ereuse_devicehub.resources.job.group_move.hooks import mark_migrating_item, mark_migrating_items
+    app.on_fetched_item += mark_migrating_item
+    app.on_fetched_resource += mark_migrating_items
+
     from ereuse_devicehub.resources.group.physical.place.hooks import avoid_deleting_if_has_event
     app.on_delete_item_places += avoid_deleting_if_has_event
 
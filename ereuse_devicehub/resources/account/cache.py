@@ -0,0 +1,103 @@
+import copy
+import time
+from collections import OrderedDict
+
+from flask import Response, current_app, g, request
+
+
+class AccountCache:
+    """
+    A process-wide cache of the accounts by their token, so authenticating a request does not read
+    the account from the database every time.
+
+    :attr:`ereuse_devicehub.resources.account.domain.AccountDomain.actual` consults it. Accounts expire
+    after ``ttl`` seconds, which bounds how long other processes (that do not get our invalidations)
+    use an account that changed. Writing an account through python-eve or through
+    :meth:`ereuse_devicehub.resources.account.domain.AccountDomain.add_shared` and ``remove_shared``
+    invalidates it in this process; writes performed directly through pymongo are not tracked.
+
+    Accounts are copied in and out, so changing a returned account does not change the cached one.
+    The cache holds up to ``size`` accounts, evicting the least recently used.
+
+    Set ACCOUNT_CACHE_TTL to 0 to disable it.
+    """
+
+    def __init__(self, ttl: float, size: int):
+        self.ttl = ttl
+        self.size = size
+        self.accounts = OrderedDict()
+        """The accounts and when they expire, by token."""
+        self.tokens = {}
+        """The token of the cached accounts, by account id."""
+
+    def get(self, token: str) -> dict or None:
+        """Gets a copy of the account with the token, or None if it is not cached or it expired."""
+        try:
+            expires, account = self.accounts[token]
+        except KeyError:
+            return None
+        if expires < time.monotonic():
+            self._remove(token)
+            return None
+        self.accounts.move_to_end(token)
+        return copy.deepcopy(account)
+
+    def set(self, account: dict):
+        """Stores a copy of a full account."""
+        self.invalidate((account['_id'],))  # In case the account had another token
+        self.accounts[account['token']] = time.monotonic() + self.ttl, copy.deepcopy(account)
+        self.tokens[account['_id']] = account['token']
+        while len(self.accounts) > self.size:
+            self._remove(next(iter(self.accounts)))
+
+    def invalidate(self, ids):
+        """Removes the accounts with the passed-in ids."""
+        for _id in ids:
+            token = self.tokens.get(_id)
+            if token is not None:
+                self._remove(token)
+
+    def clear(self):
+        self.accounts.clear()
+        self.tokens.clear()
+
+    def _remove(self, token: str):
+        _, account = self.accounts.pop(token)
+        self.tokens.pop(account['_id'], None)
+
+
+def invalidate_cached_accounts(ids):
+    """Invalidates the accounts in the cache of the app, if any."""
+    if current_app.account_cache is not None:
+        current_app.account_cache.invalidate(ids)
+
+
+class AuthStats:
+    """How many times a request authenticated, how many of them got the account from the cache, and the time spent."""
+
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+        self.seconds = 0.0
+        self.request = request._get_current_object()
+
+    @staticmethod
+    def current() -> 'AuthStats' or None:
+        return g.get('dh_auth_stats')
+
+
+def start_auth_stats():
+    """Starts counting authentications if AUTH_STATS is set. This is executed in a before_request."""
+    # Internal requests share 'g' with the request that executes them, and so the stats
+    if current_app.config['AUTH_STATS'] and 'dh_auth_stats' not in g:
+        g.dh_auth_stats = AuthStats()
+
+
+def report_auth_stats(response: Response) -> Response:
+    """Logs the auth stats of the request. This is executed in an after_request."""
+    stats = AuthStats.current()
+    if stats is not None and stats.request is request._get_current_object():
+        current_app.logger.info('Auth of {} {}: {} account lookups ({} cached) in {:.2f} ms.'.format(
+            request.method, request.endpoint, stats.lookups, stats.hits, stats.seconds * 1000))
+        del g.dh_auth_stats
+    return response
@@ -9,6 +9,7 @@ from werkzeug.http import parse_authorization_header
 
 from ereuse_devicehub.exceptions import BasicError, StandardError, UserHasExplicitDbPerms, WrongCredentials, \
     AuthHeaderError
+from ereuse_devicehub.resources.account.cache import AuthStats, invalidate_cached_accounts
 from ereuse_devicehub.resources.account.role import Role
 from ereuse_devicehub.resources.account.settings import AccountSettings
 from ereuse_devicehub.resources.domain import Domain, ResourceNotFound
@@ -27,15 +28,23 @@ class AccountDomain(Domain):
             # http://stackoverflow.com/a/33382823/2710757
             token = cls.actual_token
             if not hasattr(g, '_actual_user') or g._actual_user['token'] != token:
-                from flask import request
-                try:
-                    from flask import current_app as app
-                    g._actual_user = AccountDomain.get_one({'token': token})
-                    g._actual_user['role'] = Role(g._actual_user['role'])
-                except UserNotFound:
-                    raise UserIsAnonymous("You need to be logged in.")
-                except TypeError:
-                    raise NoUserForGivenToken()
+                cache = current_app.account_cache
+                account = cache.get(token) if cache is not None else None
+                stats = AuthStats.current()
+                if stats is not None:
+                    stats.lookups += 1
+                    stats.hits += account is not None
+                if account is None:
+                    try:
+                        account = AccountDomain.get_one({'token': token})
+                        account['role'] = Role(account['role'])
+                    except UserNotFound:
+                        raise UserIsAnonymous("You need to be logged in.")
+                    except TypeError:
+                        raise NoUserForGivenToken()
+                    if cache is not None:
+                        cache.set(account)
+                g._actual_user = account
             return g._actual_user
         except RuntimeError as e:
             # Documentation access this variable
@@ -78,9 +87,9 @@ class AccountDomain(Domain):
         return request.headers.environ['HTTP_AUTHORIZATION']
 
     @classmethod
-    def get_one(cls, id_or_filter: dict or ObjectId or str) -> dict:
+    def get_one(cls, id_or_filter: dict or ObjectId or str, projection: dict = None) -> dict:
         try:
-            return super().get_one(id_or_filter)
+            return super().get_one(id_or_filter, projection)
         except ResourceNotFound:
             raise UserNotFound()
 
@@ -138,6 +147,7 @@ class AccountDomain(Domain):
             }
         }
         cls.update_many_raw({'_id': {'$in': accounts_id}}, q)
+        invalidate_cached_accounts(accounts_id)
 
     @classmethod
     def remove_shared(cls, db: str, accounts_id: Set[ObjectId], _id: str or ObjectId, type_name: str):
@@ -153,6 +163,7 @@ class AccountDomain(Domain):
                 cls.get_one({'shared': {'$elemMatch': {'db': db, 'baseUrl': base_url}}})
             except UserNotFound:
                 cls.update_one_raw(account_id, {'$unset': {'shared.{}'.format(db): ''}})
+        invalidate_cached_accounts(accounts_id)
 
 
 class UserIsAnonymous(WrongCredentials):
@@ -4,6 +4,7 @@ import string
 from flask import current_app as app
 from passlib.handlers.sha2_crypt import sha256_crypt
 
+from ereuse_devicehub.resources.account.cache import invalidate_cached_accounts
 from ereuse_devicehub.resources.account.domain import AccountDomain, UserNotFound
 from ereuse_devicehub.resources.account.role import Role
 from ereuse_devicehub.rest import execute_post_internal
@@ -24,6 +25,16 @@ def add_token(documents: list):
         document["token"] = token
 
 
+def invalidate_cached_account(_, original: dict):
+    """Removes the updated or replaced account from the account cache."""
+    invalidate_cached_accounts((original['_id'],))
+
+
+def invalidate_cached_deleted_account(account: dict):
+    """Removes the deleted account from the account cache."""
+    invalidate_cached_accounts((account['_id'],))
+
+
 def generate_token() -> str:
     return (''.join(random.choice(string.ascii_uppercase)
                     for x in range(10)))
@@ -1,39 +1,44 @@
 from ereuse_devicehub.resources.device.component.settings import ComponentSettings
 from ereuse_devicehub.resources.device.domain import DeviceDomain
-from ereuse_devicehub.resources.event.device import DeviceEventDomain
-from ereuse_devicehub.resources.event.domain import EventDomain
 
 
 class ComponentDomain(DeviceDomain):
     resource_settings = ComponentSettings
     @classmethod
-    def get_parent(cls, _id: str) -> dict or None:
-        return cls.get_one({'components': {'$in': [_id]}})
+    def get_parent(cls, _id: str, projection: dict = None) -> dict or None:
+        return cls.get_one({'components': {'$in': [_id]}}, projection)
+
+    @classmethod
+    def get_parents(cls, ids: list) -> dict:
+        """Like :meth:`get_parent` for several components at once, returning a dict of component id: parent."""
+        parents = {}
+        if ids:
+            for parent in cls.get({'components': {'$in': ids}}):
+                for _id in parent['components']:
+                    parents.setdefault(_id, parent)
+        return parents
 
     @classmethod
     def get_similar_component(cls, component: dict, parent_id: str) -> dict:
-        """Gets a component that has same parent, doesn't generate HID and their ETAG are the same"""
-        # We the unsecured _id of the devices of all parent_id snapshots
-        snapshots = EventDomain.get({'@type': DeviceEventDomain.new_type('Snapshot'), 'device': parent_id})
-        devices_id = set()
-        for snapshot in snapshots:
-            for unsecured in snapshot['unsecured']:
-                if unsecured['_id'] not in component['_blacklist']:
-                    devices_id.add(unsecured['_id'])
-        # We get the devices whose _id and etag matches
-        etag = cls.generate_etag(component)
-        query = {'_id': {'$in': list(devices_id)}, '_etag': etag}
-        device = cls.get_one(query)
-        return cls.get_one(device['_id'])  # todo if we materialize components we do not need to do double query
+        """
+        Gets a component that has same parent, doesn't generate HID and their ETAG are the same.
+
+        We only look in the components that the snapshots of the parent could not identify by HID,
+        which are materialized in *unsecuredComponents* of the parent.
+        """
+        parent = DeviceDomain.get_one(parent_id, {'unsecuredComponents': True})
+        devices_id = set(parent.get('unsecuredComponents', [])) - set(component['_blacklist'])
+        return cls.get_one({'_id': {'$in': list(devices_id)}, '_etag': cls.generate_etag(component)})
 
     @classmethod
-    def get_devices_with_components(cls, devices_id: list) -> list:
+    def get_devices_with_components(cls, devices_id: list, projection: dict = None) -> list:
         """
         Gets a list of devices with their components, not more values.
         :param devices_id:
+        :param projection: Other fields to get apart from the components.
         :return:
         """
-        return cls.get({'_id': {'$in': devices_id}})
+        return cls.get({'_id': {'$in': devices_id}}, projection=dict(projection or {}, components=True))
 
     @classmethod
     def get_components_in_set(cls, devices_id: list) -> set:
@@ -57,7 +62,16 @@ class ComponentDomain(DeviceDomain):
         :param component:
         """
         assert '_id' in component, 'Component needs to be created'
+        operation = cls.benchmark_operation(component)
+        if operation:
+            cls.update_raw(component['_id'], operation)
+
+    @staticmethod
+    def benchmark_operation(component: dict) -> dict:
+        """The MongoDB update that adds the benchmarks of the component, which is empty if there are none."""
         if 'benchmark' in component:
-            cls.update_raw(component['_id'], {'$push': {'benchmarks': component['benchmark']}})
+            return {'$push': {'benchmarks': component['benchmark']}}
         elif 'benchmarks' in component:
-            cls.update_raw(component['_id'], {'$push': {'benchmarks': {'$each': component['benchmarks']}}})
+            return {'$push': {'benchmarks': {'$each': component['benchmarks']}}}
+        else:
+            return {}
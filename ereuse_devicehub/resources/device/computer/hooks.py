@@ -28,7 +28,8 @@ def update_materialized_computer(device_or_id: str or dict, components_id: list,
     update_query = {}
     inc = defaultdict(int)
     total_types = {RamModule.type_name, HardDrive.type_name}
-    for component in ComponentDomain.get({'_id': {'$in': components_id}}):
+    projection = {'@type': True, 'size': True, 'model': True}
+    for component in ComponentDomain.get({'_id': {'$in': components_id}}, projection=projection):
         _type = component['@type']
         if _type in total_types:
             inc[_type] += component.get('size', 0)
@@ -73,8 +74,9 @@ def inherit_group_and_perms(computer_ancestors_id: list, perms: list, components
         to their events.
     """
     # update components' ``ancestors`` and ``perms``
-    components = ComponentDomain.update_raw_get(components_id,
-                                                {'$set': {'ancestors': computer_ancestors_id, 'perms': perms}})
+    ancestor_ids = GroupDomain.ancestor_ids(computer_ancestors_id)
+    q = {'$set': {'ancestors': computer_ancestors_id, 'ancestorIds': ancestor_ids, 'perms': perms}}
+    components = ComponentDomain.update_many_raw_get(components_id, q, projection={'events._id': True})
     for parent in computer_ancestors_id:
         # update parent's property ``children.components``
         query = {'$addToSet': {'children.components': components_id}}
@@ -8,7 +8,7 @@ from ereuse_devicehub.resources.account.domain import AccountDomain
 from ereuse_devicehub.resources.device.exceptions import DeviceNotFound
 from ereuse_devicehub.resources.device.settings import DeviceSettings
 from ereuse_devicehub.resources.domain import Domain, ResourceNotFound
-from ereuse_devicehub.rest import execute_get
+from ereuse_devicehub.rest import get_resources
 from ereuse_utils.naming import Naming
 
 
@@ -16,12 +16,12 @@ class DeviceDomain(Domain):
     resource_settings = DeviceSettings
 
     @classmethod
-    def get_one(cls, id_or_filter: str or dict) -> dict:
+    def get_one(cls, id_or_filter: str or dict, projection: dict = None) -> dict:
         """
         :throws DeviceNotFound:
         """
         try:
-            return super().get_one(id_or_filter)
+            return super().get_one(id_or_filter, projection)
         except ResourceNotFound as e:
             raise DeviceNotFound(e.message) from e
 
@@ -30,30 +30,27 @@ class DeviceDomain(Domain):
         domain = current_app.config['DOMAIN']
         return document_etag(device, domain[Naming.resource(device['@type'])]['etag_ignore_fields'])
 
+    @classmethod
+    def etag(cls, device: dict) -> str:
+        """The etag of the device, generating it if the device does not have one."""
+        return device['_etag'] if '_etag' in device else cls.generate_etag(device)
+
     @classmethod
     def seem_equal(cls, x: dict, y: dict) -> bool:
-        x_tag = x['_etag'] if '_etag' in x else cls.generate_etag(x)
-        y_tag = y['_etag'] if '_etag' in y else cls.generate_etag(y)
-        return x_tag == y_tag
+        return cls.etag(x) == cls.etag(y)
 
     @classmethod
     def difference(cls, list_to_remove_devices_from, checking_list):
         """
-        Computes the difference between two lists of devices.
+        Computes the difference between two lists of devices, comparing them by etag (see :meth:`seem_equal`).
 
         To compute the difference the position of the parameters is important
         :param list_to_remove_devices_from:
         :param checking_list:
-        :return:
+        :return: The devices of *list_to_remove_devices_from* that are not in *checking_list*, in the same order.
         """
-        difference = []
-        for x in list_to_remove_devices_from:
-            for y in checking_list:
-                if cls.seem_equal(x, y):
-                    break
-            else:
-                difference.append(x)
-        return difference
+        checking_etags = {cls.etag(device) for device in checking_list}
+        return [device for device in list_to_remove_devices_from if cls.etag(device) not in checking_etags]
 
     @classproperty
     def uid_fields(cls):
@@ -84,10 +81,4 @@ class DeviceDomain(Domain):
         """Get components with all their events and tests."""
         if not components:
             return []
-        params = {
-            'where': {'_id': {'$in': components}},
-            'embedded': {'tests': 1, 'erasures': 1}
-        }
-        db = AccountDomain.requested_database
-        return execute_get(db + '/devices', token=AccountDomain.hash_token(AccountDomain.actual_token),
-                           params=params)['_items']
+        return get_resources(cls.resource_name, {'_id': {'$in': components}}, {'tests': 1, 'erasures': 1})
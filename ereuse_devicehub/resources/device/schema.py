@@ -142,11 +142,20 @@ class Device(IndividualProduct):
     events = copy.copy(events_pk_schema.events)
     events['default'] = []
     ancestors = Package.ancestors
+    ancestorIds = Package.ancestorIds
     placeholder = {
         'type': 'boolean',
         'default': False,
         'doc': 'Invalid for components.'
     }
+    unsecuredComponents = {
+        'type': 'list',
+        'readonly': True,
+        'materialized': True,
+        'teaser': False,
+        'doc': 'The components that snapshots of this device could not identify by HID. '
+               'See ComponentDomain.get_similar_component.'
+    }
     condition = {
         'type': 'dict',
         'schema': condition,
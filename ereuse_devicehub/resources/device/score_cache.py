@@ -0,0 +1,108 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, List
+
+from flask import current_app
+from pymongo import ASCENDING, ReplaceOne
+
+from ereuse_devicehub.resources.domain import Domain
+from ereuse_devicehub.resources.resource import ResourceSettings
+from ereuse_devicehub.resources.schema import Thing
+
+
+class ScoreCache(Thing):
+    """
+    The condition or pricing that R computed for a device, identified by a hash of what we sent to R.
+    See :class:`ereuse_devicehub.resources.device.score_condition.RScorePriceBase`.
+
+    This is shared between databases, as devices that are translated the same get the same result.
+    """
+    _id = {
+        'type': 'string',
+        'doc': 'The hash of the kind, the version and the translated device, without previous results.'
+    }
+    kind = {
+        'type': 'string',
+        'doc': 'Score or Price.'
+    }
+    version = {
+        'type': 'string',
+        'doc': 'The version of the R package that computed the result.'
+    }
+    result = {
+        'type': 'dict'
+    }
+    hits = {
+        'type': 'integer'
+    }
+    used = {
+        'type': 'datetime',
+        'doc': 'The last time the result was computed or read; we evict the ones not used for longer.'
+    }
+
+
+class ScoreCacheSettings(ResourceSettings):
+    _schema = ScoreCache
+    internal_resource = True
+    use_default_database = True
+    datasource = {
+        'source': 'score-cache'
+    }
+
+
+class ScoreCacheDomain(Domain):
+    resource_settings = ScoreCacheSettings
+    TRIM_EVERY = 0.01
+    """A process checks the size of the cache after inserting this fraction of SCORE_CACHE_SIZE results."""
+    _inserted = 0
+
+    @staticmethod
+    def key(kind: str, version: str, fields: list, values: list) -> str:
+        """A stable hash of the fields and values that R uses to compute a device."""
+        data = [kind, version, list(zip(fields, values))]
+        return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+    @classmethod
+    def get_results(cls, keys: List[str]) -> Dict[str, dict]:
+        """Gets the cached results of the passed-in keys, marking them as used."""
+        entries = cls.collection.find({'_id': {'$in': keys}}, {'result': True})
+        results = {entry['_id']: entry['result'] for entry in entries}
+        if results:
+            cls.collection.update_many({'_id': {'$in': list(results)}},
+                                       {'$set': {'used': datetime.utcnow()}, '$inc': {'hits': 1}})
+        return results
+
+    @classmethod
+    def save_results(cls, kind: str, version: str, results: Dict[str, dict]):
+        """
+        Caches the results by their key, evicting the least recently used results when the cache is full.
+
+        Counting the cache is slow, so we only do it every TRIM_EVERY of its size, and each process can
+        surpass the size in that much until then.
+        """
+        if not results:
+            return
+        now = datetime.utcnow()
+        encode = current_app.mongo_encoder.encode_to_mongo
+        requests = [ReplaceOne({'_id': key}, {'kind': kind, 'version': version, 'result': encode(result), 'hits': 0,
+                                              'used': now}, upsert=True)
+                    for key, result in results.items()]
+        cls._inserted += cls.collection.bulk_write(requests, ordered=False).upserted_count
+        size = current_app.config['SCORE_CACHE_SIZE']
+        if cls._inserted >= max(int(size * cls.TRIM_EVERY), 1):
+            cls._inserted = 0
+            cls.trim(size)
+
+    @classmethod
+    def trim(cls, size: int):
+        """Removes the least recently used results that surpass *size*."""
+        excess = cls.collection.count() - size
+        if excess > 0:
+            ids = [e['_id'] for e in cls.collection.find({}, {'_id': True}, sort=[('used', ASCENDING)], limit=excess)]
+            cls.collection.delete_many({'_id': {'$in': ids}})
+
+    @classmethod
+    def invalidate(cls, kind: str, version: str) -> int:
+        """Removes the results of *kind* computed with other versions of the R package, returning how many."""
+        return cls.collection.delete_many({'kind': kind, 'version': {'$ne': version}}).deleted_count
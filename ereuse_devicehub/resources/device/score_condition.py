@@ -1,11 +1,13 @@
 import contextlib
 import itertools
-from collections import defaultdict
+import json
+from collections import OrderedDict, defaultdict
+from typing import Iterator, List, Tuple
 from warnings import filterwarnings, resetwarnings
 
+import numpy
+from eve.exceptions import ConfigException
 from pydash import ceil, floor
-from rpy2.rinterface import NA_Real, RRuntimeWarning
-from rpy2.robjects import DataFrame, ListVector, packages as rpackages, r
 
 from ereuse_devicehub.exceptions import StandardError
 from ereuse_devicehub.export.export import SpreadsheetTranslator
@@ -13,34 +15,36 @@ from ereuse_devicehub.resources.account.domain import AccountDomain
 from ereuse_devicehub.resources.condition import condition as condition_schema
 from ereuse_devicehub.resources.device.computer.settings import Computer
 from ereuse_devicehub.resources.device.domain import DeviceDomain
+from ereuse_devicehub.resources.device.score_cache import ScoreCacheDomain
 from ereuse_devicehub.resources.pricing import pricing
 from ereuse_devicehub.validation.validation import DeviceHubValidator
 
 
 class ScorePriceBase:
     """
-    Abstract class `to compute device attributes, like score and pricing, that use R libraries for such purpose.
+    Abstract class to compute device attributes, like score and pricing.
 
     The way of executing this class is as follows:
 
     1. Get a device with all the data needed by executing``get_device()``.
     2. Then execute ``compute()`` to generate the score/price.
 
+    To compute many devices at once use ``get_devices()`` and ``compute_many()``.
+
+    There are two engines: the R packages of eReuse.org (:class:`Score` and :class:`Price`) and
+    a port of them to NumPy (:class:`NumpyScore` and :class:`NumpyPrice`). ``SCORE_BACKEND`` selects them.
+
     See an example in
     :py:func:`ereuse_devicehub.resources.event.device.snapshot.hooks.compute_condition_price_and_materialize_in_device`.
     """
     ROUND_DECIMALS = 2
+    FIELD = None
+    """The field of the device where we set the result."""
 
     def __init__(self, app) -> None:
         self.app = app
-        self.translator = SpreadsheetTranslator(brief=False)
         self.validator = NotImplementedError()
-        self.library_kwargs = {'lib_loc': app.config['R_PACKAGES_PATH']} if app.config['R_PACKAGES_PATH'] else {}
-        # If we use R_PACKAGES_PATH we need to load all dependencies one by one, otherwise
-        # R does it automatically
-        with self.filter_warnings():
-            for library in 'stringr', 'data.table', 'dplyr':
-                r.library(library, **self.library_kwargs)
+        self.cache_hits = self.cache_misses = 0
 
     @staticmethod
     def get_device(device_id: str, condition: dict) -> dict:
@@ -59,17 +63,41 @@ class ScorePriceBase:
         device['condition'] = condition
         return device
 
-    def compute(self, device: dict) -> DataFrame:
-        """Computes the score or condition. Subclass this method to perform something valuable."""
-        keys, values = self.translator.translate([device])
-        # R cannot parse parenthesis in fieldnames
-        data = {key.replace('(', '.').replace(')', '.'): val for key, val in zip(keys, values)}
-        return DataFrame(data)
+    def get_devices(self, devices: List[dict]) -> List[dict]:
+        """
+        Like ``get_device`` but for many devices that already have their condition, getting the
+        full components of all of them at once.
+        """
+        components = DeviceDomain.get_full_components([_id for device in devices for _id in device['components']])
+        components = {component['_id']: component for component in components}
+        for device in devices:
+            device['components'] = [components[_id] for _id in device['components'] if _id in components]
+        return devices
 
-    @staticmethod
-    def _parse_response(data: DataFrame) -> dict:
-        """Parses the DataFrame returned from eReuse.org's R libraries to a dictionary."""
-        return {name: data[i][0] for i, name in enumerate(data.names)}
+    def compute(self, device: dict) -> dict:
+        """
+        Computes the score or price of the device.
+        :raise ScorePriceError:
+        """
+        result = self.compute_many([device])[0]
+        if isinstance(result, ScorePriceError):
+            raise result
+        return result
+
+    def compute_many(self, devices: List[dict]) -> list:
+        """
+        Computes the score or price of the devices.
+
+        :return: The score or price of each device, in the same order, or the ScorePriceError
+            that prevented computing it.
+        """
+        raise NotImplementedError()
+
+    @property
+    def cache_hit_rate(self) -> float:
+        """The ratio of devices this process got from the cache."""
+        total = self.cache_hits + self.cache_misses
+        return self.cache_hits / total if total else 0.0
 
     def _validate(self, validator: DeviceHubValidator, value: dict, device_id: str):
         """
@@ -83,26 +111,194 @@ class ScorePriceBase:
             t += 'Validation error is: {}'.format(validator.errors)
             raise ScorePriceError(t)
 
+
+class RScorePriceBase(ScorePriceBase):
+    """
+    Computes with the R libraries of eReuse.org, which take seconds to load in each process.
+
+    ``compute_many()`` sends the devices to R in one data frame.
+
+    Results are cached by what we send to R (see
+    :class:`ereuse_devicehub.resources.device.score_cache.ScoreCacheDomain`), so computing a device that has
+    not changed does not call R. Set ``SCORE_CACHE_SIZE`` to 0 to disable the cache.
+    """
+    PACKAGE = None
+    """The R package that computes the result."""
+    OUTPUTS = frozenset()
+    """
+    The fields of the spreadsheet with results of this or later computations, which do not identify
+    the device in the cache.
+    """
+
+    def __init__(self, app) -> None:
+        from rpy2.robjects import r
+        super().__init__(app)
+        self.version = None
+        self._cache_invalidated = False
+        self.translator = SpreadsheetTranslator(brief=False)
+        self.library_kwargs = {'lib_loc': app.config['R_PACKAGES_PATH']} if app.config['R_PACKAGES_PATH'] else {}
+        # If we use R_PACKAGES_PATH we need to load all dependencies one by one, otherwise
+        # R does it automatically
+        with self.filter_warnings():
+            for library in 'stringr', 'data.table', 'dplyr':
+                r.library(library, **self.library_kwargs)
+
+    def compute_many(self, devices: List[dict]) -> list:
+        """
+        Computes the score or price of the devices, calling R once for all the devices that have
+        the same fields in the spreadsheet (usually the same components) and that are not cached.
+
+        :return: The score or price of each device, in the same order, or the ScorePriceError
+            that prevented computing it.
+        """
+        results = [None] * len(devices)
+        rows = [self.translator.translate([device]) for device in devices]
+        pending = list(range(len(devices)))
+        keys = None
+        if self.app.config['SCORE_CACHE_SIZE']:
+            kind = type(self).__name__
+            keys = [ScoreCacheDomain.key(kind, self.version, *self._inputs(fields, values)) for fields, values in rows]
+            cached = self._get_cached(keys)
+            pending = []
+            for position, key in enumerate(keys):
+                if key in cached:
+                    devices[position][self.FIELD] = results[position] = cached[key]
+                else:
+                    pending.append(position)
+            self.cache_hits += len(devices) - len(pending)
+            self.cache_misses += len(pending)
+        for group, data in self.frames([devices[p] for p in pending], [rows[p] for p in pending]):
+            positions = [pending[i] for i in group]
+            ids = [devices[position]['_id'] for position in positions]
+            try:
+                response = self._execute(data, ids)
+            except ScorePriceError as e:
+                if len(positions) == 1:
+                    results[positions[0]] = e
+                else:  # Let's find out which devices fail
+                    for position in positions:
+                        results[position] = self._compute_alone(devices[position], rows[position])
+                continue
+            for row, position in enumerate(positions):
+                try:
+                    results[position] = self._result(devices[position], self._parse_response(response, row))
+                except ScorePriceError as e:
+                    results[position] = e
+        if keys is not None:
+            computed = {keys[p]: results[p] for p in pending if not isinstance(results[p], ScorePriceError)}
+            ScoreCacheDomain.save_results(type(self).__name__, self.version, computed)
+        return results
+
+    def _compute_alone(self, device: dict, row: tuple) -> dict or ScorePriceError:
+        """
+        Computes a device in its own call to R, without the cache, which ``compute_many`` already
+        looked up and counted.
+        """
+        _, data = next(self.frames([device], [row]))
+        try:
+            return self._result(device, self._parse_response(self._execute(data, [device['_id']])))
+        except ScorePriceError as e:
+            return e
+
+    def _inputs(self, fields: list, values: list) -> Tuple[list, list]:
+        """The fields and values of a translated device without the OUTPUTS."""
+        inputs = [(field, value) for field, value in zip(fields, values) if field not in self.OUTPUTS]
+        return [field for field, _ in inputs], [value for _, value in inputs]
+
+    def _get_cached(self, keys: List[str]) -> dict:
+        if not self._cache_invalidated:
+            # Results of other versions of the R package are never used again
+            removed = ScoreCacheDomain.invalidate(type(self).__name__, self.version)
+            if removed:
+                self.app.logger.info('Removed {} cached {} results of old versions of {}'
+                                     .format(removed, type(self).__name__, self.PACKAGE))
+            self._cache_invalidated = True
+        return ScoreCacheDomain.get_results(keys)
+
+    def frames(self, devices: List[dict], rows: List[tuple] = None) -> Iterator[Tuple[List[int], 'DataFrame']]:
+        """
+        Translates the devices to data frames for R, one row per device, grouping the devices that
+        have the same fields.
+
+        :param rows: The translation of each device, if we already have them.
+        :return: Tuples of the positions of the devices in *devices* and their data frame.
+        """
+        from rpy2.robjects import DataFrame
+        groups = OrderedDict()
+        for position, device in enumerate(devices):
+            keys, values = rows[position] if rows is not None else self.translator.translate([device])
+            positions, group_rows = groups.setdefault(tuple(keys), ([], []))
+            positions.append(position)
+            group_rows.append(values)
+        for keys, (positions, group_rows) in groups.items():
+            # R cannot parse parenthesis in fieldnames
+            data = OrderedDict((key.replace('(', '.').replace(')', '.'), _column([row[i] for row in group_rows]))
+                               for i, key in enumerate(keys))
+            yield positions, DataFrame(data)
+
+    def _package_version(self) -> str:
+        from rpy2.robjects import r
+        return r('as.character(packageVersion("{}"))'.format(self.PACKAGE))[0]
+
+    def _execute(self, data: 'DataFrame', ids: List[str]) -> 'DataFrame':
+        """
+        Calls R with the data frame of the devices with the passed-in ids.
+        :raise ScorePriceError: R could not compute the devices.
+        """
+        raise NotImplementedError()
+
+    def _result(self, device: dict, result: dict) -> dict:
+        """
+        Gets the score or price of the device from its row of the R response, validating it.
+        :raise ScorePriceError:
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def _parse_response(data: 'DataFrame', row: int = 0) -> dict:
+        """Parses a row of the DataFrame returned from eReuse.org's R libraries to a dictionary."""
+        return {name: data[i][row] for i, name in enumerate(data.names)}
+
     @contextlib.contextmanager
     def filter_warnings(self):
         """Filter warning coming from R. Use it in a ``with`` block."""
+        from rpy2.rinterface import RRuntimeWarning
         filterwarnings('ignore', category=RRuntimeWarning)
         yield
         resetwarnings()
 
 
-class Score(ScorePriceBase):
+PRICING_FIELDS = frozenset((
+    'Price', 'Price 2 years warranty',
+    'Refurbisher percentage', 'Refurbisher amount', 'Retailer percentage', 'Retailer amount',
+    'Platform percentage', 'Platform amount',
+    'Refurbisher percentage 2 years warranty', 'Refurbisher amount 2 years warranty',
+    'Retailer percentage 2 years warranty', 'Retailer amount 2 years warranty',
+    'Platform percentage 2 years warranty', 'Platform amount 2 years warranty'
+))
+"""The fields of the spreadsheet that Price computes."""
+CONDITION_FIELDS = frozenset(('Condition Score', 'Condition', 'Appearance Score', 'Functionality Score',
+                              'Processor Score', 'RAM Score', 'HDD Score'))
+"""The fields of the spreadsheet that Score computes."""
+
+
+class Score(RScorePriceBase):
     """
     Computes the Score of a device.
 
     When calling ``compute``, this class sends the passed-in ``device`` to the Rdevicescore R package and returns
     the ``condition`` representing the score.
     """
+    PACKAGE = 'Rdevicescore'
+    FIELD = 'condition'
+    OUTPUTS = CONDITION_FIELDS | PRICING_FIELDS
 
     def __init__(self, app) -> None:
+        from rpy2.robjects import packages as rpackages, r
         super().__init__(app)
         with self.filter_warnings():
             r.library('Rdevicescore', **self.library_kwargs)
+            self.version = self._package_version()
             self.compute_score = rpackages.importr('Rdevicescore').deviceScoreMain
             r('deviceScoreConfig <- Rdevicescore::models')
             # todo to get the range values
@@ -112,9 +308,8 @@ class Score(ScorePriceBase):
         # This is the function we call
         self.validator = self.app.validator(condition_schema)
 
-    def compute(self, device) -> dict:
-        """Computes the score for the passed-in ``device``. This method mutates ``device.condition``."""
-        data = super().compute(device)
+    def _execute(self, data: 'DataFrame', ids: List[str]) -> 'DataFrame':
+        from rpy2.robjects import ListVector, r
         param = ListVector({
             'sourceData': data,
             'config': r.deviceScoreConfig,
@@ -127,11 +322,14 @@ class Score(ScorePriceBase):
         result, status, status_description = tuple(self.compute_score(param))
         status = int(status[0])
         if status != 0:
-            message = '{} couldn\'t be computed for device {}, status {}'.format(self.__class__.__name__, device['_id'],
-                                                                                 status_description)
+            message = '{} couldn\'t be computed for devices {}, status {}'.format(self.__class__.__name__,
+                                                                                  ', '.join(ids), status_description)
             raise ScorePriceError(message)
+        return result
 
-        result = self._parse_response(result)
+    def _result(self, device: dict, result: dict) -> dict:
+        """Gets the score of the passed-in ``device``. This method mutates ``device.condition``."""
+        from rpy2.rinterface import NA_Real
         FIELDS = 'Score', 'Ram.score', 'Processor.score', 'Drive.score', 'appearance.score', 'functionality.score'
         score, ram_score, processor_score, drive_score, appearance_score, functionality_score = list(
             map(lambda x: None if result[x] is NA_Real else round(result[x], self.ROUND_DECIMALS), FIELDS)
@@ -157,13 +355,18 @@ class Score(ScorePriceBase):
         return device['condition']
 
 
-class Price(ScorePriceBase):
+class Price(RScorePriceBase):
     """As Score, but computing the Price."""
+    PACKAGE = 'Rdeviceprice'
+    FIELD = 'pricing'
+    OUTPUTS = PRICING_FIELDS
 
     def __init__(self, app) -> None:
+        from rpy2.robjects import packages as rpackages, r
         super().__init__(app)
         with self.filter_warnings():
             r.library('Rdeviceprice', **self.library_kwargs)
+            self.version = self._package_version()
             self.compute_price = rpackages.importr('Rdeviceprice').devicePriceMain
             r('devicePriceConfig <- Rdeviceprice::config')
             r('devicePriceSchemas <- Rdeviceprice::schemas')
@@ -173,9 +376,8 @@ class Price(ScorePriceBase):
     VAL = {'per': 'percentage', 'amount': 'amount'}
     SERVICE = {'2yearsGuarantee': 'warranty2', 'standard': 'standard'}
 
-    def compute(self, device: dict):
-        """Computes the price of the passed-in ``device``. This method mutates ``device.pricing``."""
-        data = super().compute(device)
+    def _execute(self, data: 'DataFrame', ids: List[str]) -> 'DataFrame':
+        from rpy2.robjects import ListVector, r
         param = ListVector({
             'sourceData': data,
             'config': r.devicePriceConfig,
@@ -183,7 +385,11 @@ class Price(ScorePriceBase):
             'versionSchema': '1.0',
             'versionPrice': '1.0'
         })
-        result = self._parse_response(self.compute_price(param))
+        return self.compute_price(param)
+
+    def _result(self, device: dict, result: dict) -> dict:
+        """Gets the price of the passed-in ``device``. This method mutates ``device.pricing``."""
+        from rpy2.rinterface import NA_Real
         # Combinatronics of self.FIELDS to do d['refurbisher']['standard']['per'] = val['per.standard.refurbisher']
         d = defaultdict(lambda: defaultdict(dict))
         for val, service, role in itertools.product(*self.FIELDS):
@@ -200,6 +406,266 @@ class Price(ScorePriceBase):
         return d
 
 
+class NumpyScorePriceBase(ScorePriceBase):
+    """
+    Computes like the R libraries of eReuse.org but in Python, with NumPy arrays over all the devices
+    at once, so it does not load R.
+
+    The parameters are the ones of the installed R packages, exported to the JSON of ``SCORE_MODELS`` with
+    :mod:`ereuse_devicehub.scripts.export_score_models`. We have no parameters of our own, as nothing checks
+    them against R, so this fails to start without that JSON.
+    """
+    SECTION = None
+    """The section of the exported JSON with our parameters."""
+    PARAMETERS = frozenset()
+    """The parameters that the JSON must have, by their name in the R models."""
+
+    def __init__(self, app) -> None:
+        super().__init__(app)
+        path = app.config['SCORE_MODELS']
+        if not path:
+            raise ConfigException('SCORE_BACKEND \'numpy\' needs SCORE_MODELS, the parameters of the R packages '
+                                  'exported with export_score_models.')
+        with open(path) as f:
+            self.params = json.load(f).get(self.SECTION, {})
+        missing = sorted(self.PARAMETERS - set(self.params))
+        if missing:
+            raise ConfigException('The {} section of {} does not have the parameters {}.'
+                                  .format(self.SECTION, path, ', '.join(missing)))
+
+    def compute_many(self, devices: List[dict]) -> list:
+        results = self._compute(devices)
+        for position, (device, result) in enumerate(zip(devices, results)):
+            if not isinstance(result, ScorePriceError):
+                try:
+                    self._validate(self.validator, result, device['_id'])
+                except ScorePriceError as e:
+                    results[position] = e
+        return results
+
+    def _compute(self, devices: List[dict]) -> list:
+        """Computes the devices, setting the result in them, without validating it."""
+        raise NotImplementedError()
+
+
+class NumpyScore(NumpyScorePriceBase):
+    """
+    As :class:`Score` but in NumPy.
+
+    Each component gets a rate from its normalized characteristics: exponential from *cexp*, linear
+    from *clin* and logarithmic from *clog*, which are the values where the curves meet. The score is the weighted harmonic mean of the rates of
+    the processor, RAM and hard drives plus the scores of appearance and functionality.
+    """
+    SECTION = 'score'
+    FIELD = 'condition'
+    PARAMETERS = frozenset((
+        'cexp', 'clin', 'clog', 'processor.xMin', 'processor.xMax', 'processor.default', 'processor.weight',
+        'ram.size.xMin', 'ram.size.xMax', 'ram.speed.xMin', 'ram.speed.xMax', 'ram.size.weight', 'ram.speed.weight',
+        'ram.weight', 'drive.size.xMin', 'drive.size.xMax', 'drive.readingSpeed.xMin', 'drive.readingSpeed.xMax',
+        'drive.writingSpeed.xMin', 'drive.writingSpeed.xMax', 'drive.size.weight', 'drive.readingSpeed.weight',
+        'drive.writingSpeed.weight', 'drive.weight', 'appearance.0', 'appearance.A', 'appearance.B', 'appearance.C',
+        'appearance.D', 'appearance.E', 'functionality.A', 'functionality.B', 'functionality.C', 'functionality.D',
+        'range.low', 'range.medium', 'range.high'
+    ))
+    """The parameters of the models of Rdevicescore that we use. Ranges are the minimum score of each range."""
+
+    def __init__(self, app) -> None:
+        super().__init__(app)
+        self.validator = self.app.validator(condition_schema)
+
+    def _compute(self, devices: List[dict]) -> list:
+        p = self.params
+        characteristics = numpy.array([self._characteristics(device) for device in devices], dtype=float)
+        processor, ram_size, ram_speed, drive_size, reading_speed, writing_speed = characteristics.T
+        processor_rate = self._rate(self._norm(processor, 'processor'))
+        ram_rate = self._harmonic_mean((p['ram.size.weight'], p['ram.speed.weight']),
+                                       (self._rate(self._norm(ram_size, 'ram.size')),
+                                        self._rate(self._norm(ram_speed, 'ram.speed'))))
+        drive_rate = self._harmonic_mean((p['drive.size.weight'], p['drive.readingSpeed.weight'],
+                                          p['drive.writingSpeed.weight']),
+                                         (self._rate(self._norm(drive_size, 'drive.size')),
+                                          self._rate(self._norm(reading_speed, 'drive.readingSpeed')),
+                                          self._rate(self._norm(writing_speed, 'drive.writingSpeed'))))
+        components_rate = self._harmonic_mean((p['processor.weight'], p['ram.weight'], p['drive.weight']),
+                                              (processor_rate, ram_rate, drive_rate))
+        appearance = numpy.array([self._grade(device, 'appearance') for device in devices], dtype=float)
+        functionality = numpy.array([self._grade(device, 'functionality') for device in devices], dtype=float)
+        score = numpy.maximum(components_rate + appearance + functionality, 0)
+        results = []
+        for i, device in enumerate(devices):
+            if not (ram_size[i] and drive_size[i]):
+                results.append(ScorePriceError('{} couldn\'t be computed for device {}: it has no RAM or hard drive'
+                                               .format(self.__class__.__name__, device['_id'])))
+                continue
+            condition = device['condition']
+            condition['general'] = {
+                'score': round(float(score[i]), self.ROUND_DECIMALS),
+                'range': self._range(round(float(score[i]), self.ROUND_DECIMALS))
+            }
+            condition['scoringSoftware'] = {
+                'label': 'ereuse.org',
+                'version': '1.0'
+            }
+            condition['components'] = {
+                'ram': round(float(ram_rate[i]), self.ROUND_DECIMALS),
+                'processors': round(float(processor_rate[i]), self.ROUND_DECIMALS),
+                'hardDrives': round(float(drive_rate[i]), self.ROUND_DECIMALS)
+            }
+            condition.setdefault('appearance', {})['score'] = round(float(appearance[i]), self.ROUND_DECIMALS)
+            condition.setdefault('functionality', {})['score'] = round(float(functionality[i]), self.ROUND_DECIMALS)
+            results.append(condition)
+        return results
+
+    def _characteristics(self, device: dict) -> tuple:
+        """
+        The processor benchmark, the total size and speed of the RAM and the total size of the hard
+        drives and their reading and writing speeds weighted by their size.
+        """
+        processor = next((benchmark['score'] for component in device['components']
+                          if component['@type'] == 'Processor'
+                          for benchmark in component.get('benchmarks', [])
+                          if benchmark['@type'] == 'BenchmarkProcessor'), self.params['processor.default'])
+        ram_size = ram_speed = drive_size = reading_speed = writing_speed = benchmarked_size = 0
+        for component in device['components']:
+            if component['@type'] == 'RamModule':
+                ram_size += component.get('size') or 0
+                ram_speed += component.get('speed') or 0
+            elif component['@type'] == 'HardDrive':
+                size = component.get('size') or 0
+                drive_size += size
+                # Hard drives without benchmark do not count for the speed
+                benchmark = next(iter(component.get('benchmarks', [])), None)
+                if benchmark:
+                    benchmarked_size += size
+                    reading_speed += benchmark.get('readingSpeed', 0) * size
+                    writing_speed += benchmark.get('writingSpeed', 0) * size
+        if benchmarked_size:
+            reading_speed /= benchmarked_size
+            writing_speed /= benchmarked_size
+        return processor, ram_size, ram_speed, drive_size, reading_speed, writing_speed
+
+    def _norm(self, values: numpy.ndarray, name: str) -> numpy.ndarray:
+        x_min, x_max = self.params[name + '.xMin'], self.params[name + '.xMax']
+        return numpy.maximum((values - x_min) / (x_max - x_min), 0)
+
+    def _rate(self, norm: numpy.ndarray) -> numpy.ndarray:
+        """
+        Rates normalized characteristics: exponential growth in [cexp, clin), linear in [clin, clog) and
+        logarithmic from clog. Values under cexp are rated as cexp.
+        """
+        p = self.params
+        norm = numpy.maximum(norm, p['cexp'])
+        with numpy.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            return numpy.select([norm >= p['clog'], norm >= p['clin']],
+                                [numpy.log10(2 * norm) + 3.57, 7 * norm + 0.06],
+                                numpy.exp(norm) / (2 - numpy.exp(norm)))
+
+    @staticmethod
+    def _harmonic_mean(weights: tuple, rates: tuple) -> numpy.ndarray:
+        with numpy.errstate(divide='ignore'):
+            return sum(weights) / sum(weight / rate for weight, rate in zip(weights, rates))
+
+    def _grade(self, device: dict, name: str) -> float:
+        """The score of the appearance or functionality; 0 if the condition does not have it."""
+        general = device['condition'].get(name, {}).get('general')
+        return self.params.get('{}.{}'.format(name, general), 0)
+
+    def _range(self, score: float) -> str:
+        if score >= self.params['range.high']:
+            return 'High'
+        elif score >= self.params['range.medium']:
+            return 'Medium'
+        elif score >= self.params['range.low']:
+            return 'Low'
+        return 'VeryLow'
+
+
+class NumpyPrice(NumpyScorePriceBase):
+    """
+    As :class:`Price` but in NumPy.
+
+    The price is the score times a multiplier, and the range of the score sets which share
+    of the price goes to each role, for the standard service and the 2 years warranty.
+    """
+    SECTION = 'price'
+    FIELD = 'pricing'
+    ROLES = 'refurbisher', 'platform', 'retailer'
+    SERVICES = 'standard', 'warranty2'
+    RANGES = 'Low', 'Medium', 'High'
+    PARAMETERS = frozenset((
+        'multiplier', 'Low.standard.refurbisher', 'Low.standard.platform', 'Low.standard.retailer',
+        'Medium.standard.refurbisher', 'Medium.standard.platform', 'Medium.standard.retailer',
+        'Medium.warranty2.refurbisher', 'Medium.warranty2.platform', 'Medium.warranty2.retailer',
+        'High.standard.refurbisher', 'High.standard.platform', 'High.standard.retailer', 'High.warranty2.refurbisher',
+        'High.warranty2.platform', 'High.warranty2.retailer'
+    ))
+    """
+    The parameters of the config of Rdeviceprice that we use; the Low range does not have the 2 years
+    warranty. Devices in the VeryLow range are priced as Low.
+    """
+
+    def __init__(self, app) -> None:
+        super().__init__(app)
+        self.validator = self.app.validator(pricing)
+
+    def _compute(self, devices: List[dict]) -> list:
+        general = [device['condition'].get('general', {}) for device in devices]
+        price = numpy.array([g.get('score', numpy.nan) for g in general], dtype=float) * self.params['multiplier']
+        ranges = numpy.array([self.RANGES.index(g['range']) if g.get('range') in self.RANGES else 0 for g in general])
+        shares = {}  # The share of each service and role for each device, nan if the service is not for the range
+        for service, role in itertools.product(self.SERVICES, self.ROLES):
+            table = numpy.array([self.params.get('{}.{}.{}'.format(r, service, role), numpy.nan) for r in self.RANGES])
+            shares[service, role] = table[ranges]
+        amounts = {key: numpy.floor(price * share * 10 ** self.ROUND_DECIMALS) / 10 ** self.ROUND_DECIMALS
+                   for key, share in shares.items()}
+        totals = {service: numpy.ceil(price * sum(shares[service, role] for role in self.ROLES)
+                                      * 10 ** self.ROUND_DECIMALS) / 10 ** self.ROUND_DECIMALS
+                  for service in self.SERVICES}
+        results = []
+        for i, device in enumerate(devices):
+            if numpy.isnan(price[i]):
+                results.append(ScorePriceError('{} couldn\'t be computed for device {}: it has no score'
+                                               .format(self.__class__.__name__, device['_id'])))
+                continue
+            d = defaultdict(lambda: defaultdict(dict))
+            for (service, role), share in shares.items():
+                if not numpy.isnan(share[i]):
+                    d[role][service]['percentage'] = floor(float(share[i]), self.ROUND_DECIMALS)
+                    d[role][service]['amount'] = float(amounts[service, role][i])
+            for service in self.SERVICES:
+                if not numpy.isnan(totals[service][i]):
+                    d.setdefault('total', {})[service] = float(totals[service][i])
+            device['pricing'] = d
+            results.append(d)
+        return results
+
+
+SCORE_BACKENDS = {
+    'r': (Score, Price),
+    'numpy': (NumpyScore, NumpyPrice)
+}
+"""The classes that compute the score and the price for each value of ``SCORE_BACKEND``."""
+
+
+def _column(values: list):
+    """
+    An R vector of the values of a column of the spreadsheet, where '' is an empty cell.
+
+    Columns of numbers or booleans get NA in their empty cells, as R does reading a spreadsheet;
+    the rest of columns are strings.
+    """
+    from rpy2.rinterface import NA_Integer, NA_Logical, NA_Real
+    from rpy2.robjects import BoolVector, FloatVector, IntVector, StrVector
+    present = [value for value in values if value != '']
+    if present and all(type(value) is bool for value in present):
+        return BoolVector([NA_Logical if value == '' else value for value in values])
+    if present and all(type(value) is int for value in present):
+        return IntVector([NA_Integer if value == '' else value for value in values])
+    if present and all(type(value) in (int, float) for value in present):
+        return FloatVector([NA_Real if value == '' else value for value in values])
+    return StrVector([str(value) for value in values])
+
+
 class ScorePriceError(StandardError):
     pass
 
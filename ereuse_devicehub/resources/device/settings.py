@@ -16,7 +16,7 @@ class DeviceSettings(ResourceSettings):
     etag_ignore_fields = ['hid', '_id', 'components', 'isUidSecured', '_created', '_updated', '_etag', 'speed',
                           'busClock', 'labelId', 'owners', 'place', 'benchmark', 'benchmarks', 'public', '_links',
                           'forceCreation', 'parent', 'events', 'created', 'sameAs', 'placeholder', 'ancestors',
-                          'condition', 'perms', '_blacklist']
+                          'ancestorIds', 'condition', 'perms', '_blacklist']
     cache_control = 'max-age=1, must-revalidate'
     extra_response_fields = ResourceSettings.extra_response_fields + ['hid', 'pid', 'ancestors', 'gid', 'rid', 'perms',
                                                                       'events', 'components']
@@ -1,15 +1,20 @@
+from typing import Dict, List
+
 from bson.objectid import ObjectId
 from flask import current_app
 from passlib.utils import classproperty
-from pydash import merge
-from pymongo import ReturnDocument
+from pymongo import ReturnDocument, UpdateOne
 from pymongo.collection import Collection
 from pymongo.cursor import Cursor
 
 from ereuse_devicehub.data_layer import mongo_encode
 from ereuse_devicehub.exceptions import StandardError
+from ereuse_devicehub.resources.identity_map import IdentityMap
 from ereuse_devicehub.resources.resource import ResourceSettings
 
+_sources = {}
+"""The resource and collection names of each Domain, which do not change."""
+
 
 class Domain:
     """Provides utility methods to work with resources, like easier access to data-layers. Extend it happily."""
@@ -18,14 +23,31 @@ class Domain:
 
     @classmethod
     @mongo_encode('id_or_filter')
-    def get_one(cls, id_or_filter: dict or ObjectId or str) -> dict:
+    def get_one(cls, id_or_filter: dict or ObjectId or str, projection: dict = None) -> dict:
         """
         Obtains a resource.
         :param id_or_filter: An identifier or the filter in Mongo to obtain the resource.
+        :param projection: A Mongo projection to only obtain some fields of the resource.
         :raise ResourceNotFound:
         :return:
         """
-        resource = current_app.data.find_one_raw(cls.resource_name, id_or_filter)
+        # The identity map only works with full resources
+        identity_map = IdentityMap.current() if projection is None else None
+        if identity_map is not None:
+            # Only filters that are exactly {'_id': ...} identify the resource
+            if type(id_or_filter) is not dict:
+                _id = id_or_filter
+            elif id_or_filter.keys() == {'_id'}:
+                _id = id_or_filter['_id']
+            else:
+                _id = None
+            if _id is not None and type(_id) is not dict:
+                resource = identity_map.get(cls.collection, _id)
+                if resource is not None and cls._matches_datasource_filter(resource):
+                    return resource
+        resource = current_app.data.find_one_raw(cls.resource_name, id_or_filter, projection)
+        if identity_map is not None and resource is not None:
+            identity_map.set(cls.collection, resource)
         if resource is None:
             if type(id_or_filter) is dict:
                 text = 'There is no resource matching the query {}'.format(id_or_filter)
@@ -37,45 +59,81 @@ class Domain:
 
     @classmethod
     @mongo_encode('query_filter')
-    def get(cls, query_filter: dict, as_list: bool = True) -> list or Cursor:
+    def get(cls, query_filter: dict, as_list: bool = True, projection: dict = None) -> list or Cursor:
         """
         Obtains several resources.
         :param query_filter: A Mongo filter to obtain the resources.
         :param as_list: Should be returned as a list or as a generator?
+        :param projection: A Mongo projection to only obtain some fields of the resources.
         """
-        result = current_app.data.find_raw(cls.resource_name, query_filter)
+        result = current_app.data.find_raw(cls.resource_name, query_filter, projection)
         return list(result) if as_list else result
 
     @classmethod
     @mongo_encode('values')
-    def get_in(cls, field: str, values: list, as_list: bool = True):
-        """The same as get({field: {$in: values}})."""
-        return cls.get({field: {'$in': values}})
+    def get_in(cls, field: str, values: list, as_list: bool = True, projection: dict = None) -> list or Cursor:
+        """
+        The same as get({field: {$in: values}}).
+
+        When getting full resources by *_id* with an identity map, this only reads the resources that are
+        not in the map, returning always a list.
+        """
+        identity_map = IdentityMap.current()
+        if identity_map is None or field != '_id' or projection is not None:
+            return cls.get({field: {'$in': values}}, as_list, projection)
+        resources, missing = [], []
+        for value in values:
+            resource = identity_map.get(cls.collection, value)
+            if resource is None:
+                missing.append(value)
+            else:
+                resources.append(resource)
+        if missing:
+            for resource in cls.get({field: {'$in': missing}}):
+                identity_map.set(cls.collection, resource)
+                resources.append(resource)
+        return resources
 
     @classmethod
     @mongo_encode('operation')
     def update_raw(cls, ids: str or ObjectId or list, operation: dict):
         """
-        Sets the properties of a resource using directly the database layer.
+        Sets the properties of a resource using directly the database layer, in one query.
         :param ids:
         :param operation: MongoDB update query.
         :return The number of files edited in total
         """
-        resources_id = [ids] if type(ids) is str or type(ids) is ObjectId else ids
-        count = 0
-        for resource_id in resources_id:
-            count += cls.collection.update_one({'_id': resource_id}, operation).modified_count
-        return count
+        resources_id = [ids] if type(ids) is str or type(ids) is ObjectId else list(ids)
+        if not resources_id:
+            return 0
+        cls._invalidate(resources_id)
+        return cls.collection.update_many({'_id': {'$in': resources_id}}, operation).modified_count
+
+    @classmethod
+    def update_each_raw(cls, operations: Dict[str or ObjectId, dict]) -> int:
+        """
+        Like update_raw but with a different operation for each resource, in one *bulk_write*.
+        :param operations: A dict of resource identifiers and their MongoDB update query.
+        :return The number of files edited in total
+        """
+        if not operations:
+            return 0
+        encode = current_app.mongo_encoder.encode_to_mongo
+        requests = [UpdateOne({'_id': _id}, encode(operation)) for _id, operation in operations.items()]
+        cls._invalidate(list(operations))
+        return cls.collection.bulk_write(requests, ordered=False).modified_count
 
     @classmethod
     @mongo_encode('filter', 'operation')
     def update_many_raw(cls, filter, operation):
+        cls._invalidate()
         return cls.collection.update_many(filter, operation)
 
     @classmethod
     @mongo_encode('id_or_filter', 'operation')
     def update_one_raw(cls, resource_id: str or ObjectId, operation, key='_id'):
         count = cls.collection.update_one({key: resource_id}, operation).matched_count
+        cls._invalidate([resource_id] if key == '_id' else None)
         if count == 0:
             name = cls.resource_settings._schema.type_name
             raise ResourceNotFound('{} {} cannot be updated as it is not found.'.format(name, resource_id))
@@ -86,6 +144,7 @@ class Domain:
                            key='_id', **kwargs):
         document = cls.collection.find_one_and_update({key: resource_id}, operation, return_document=return_document,
                                                       **kwargs)
+        cls._update_identity_map([document], return_document, **kwargs)
         if document is None:
             name = cls.resource_settings._schema.type_name
             raise ResourceNotFound('{} {} cannot be updated as it is not found.'.format(name, resource_id))
@@ -95,23 +154,96 @@ class Domain:
     @mongo_encode('operation', 'extra_query')
     def update_raw_get(cls, ids: str or ObjectId or list, operation: dict, key='_id',
                        return_document=ReturnDocument.AFTER, extra_query={}, **kwargs):
-        """Updates the resources and returns them. Set return_document to get the documents before/after the update."""
+        """
+        Updates the resources one by one and returns them. Set return_document to get the documents
+        before/after the update. See :meth:`update_many_raw_get` for a faster version.
+        """
         resources_id = [ids] if type(ids) is str or type(ids) is ObjectId else ids
         results = []
         for identifier in resources_id:
-            q = merge({key: identifier}, extra_query)
+            q = dict(extra_query, **{key: identifier})
             results.append(cls.collection.find_one_and_update(q, operation, return_document=return_document, **kwargs))
+        cls._update_identity_map(results, return_document, **kwargs)
+        return results
+
+    @classmethod
+    @mongo_encode('operation')
+    def update_many_raw_get(cls, ids: list, operation: dict, key='_id', projection: dict = None) -> List[dict]:
+        """
+        Updates the resources and then returns them as they are after the update, in two queries
+        regardless the number of resources.
+
+        As opposed to :meth:`update_raw_get`, the update and the read are not atomic: if someone else
+        modifies the resources between both queries we return their changes too. Resources are returned
+        in database order and the ones that do not exist are not returned.
+        """
+        ids = list(ids)
+        if not ids:
+            return []
+        q = {key: {'$in': ids}}
+        cls.collection.update_many(q, operation)
+        results = cls.get(q, projection=projection)
+        cls._invalidate(ids if key == '_id' else None)
+        cls._update_identity_map(results, ReturnDocument.AFTER, projection=projection)
         return results
 
+    @classmethod
+    def bulk_write(cls, requests: list, ordered: bool = True):
+        """
+        The same as pymongo.collection.Collection.bulk_write.
+
+        Requests are not mongo-encoded: encode the queries before building the pymongo operations.
+        """
+        cls._invalidate()
+        return cls.collection.bulk_write(requests, ordered=ordered)
+
     @classmethod
     @mongo_encode('query')
     def delete_one(cls, query):
+        cls._invalidate()
         return cls.collection.delete_one(query)
 
     @classmethod
     def delete_all(cls):
+        cls._invalidate()
         return cls.collection.drop()
 
+    @classmethod
+    def _invalidate(cls, ids: list = None):
+        """Invalidates the resources with the passed-in ids, or all of them, from the identity map, if any."""
+        identity_map = IdentityMap.current()
+        if identity_map is not None:
+            if ids is None:
+                identity_map.invalidate_collection(cls.collection)
+            else:
+                identity_map.invalidate(cls.collection, ids)
+
+    @classmethod
+    def _update_identity_map(cls, documents: list, return_document, projection=None, **_):
+        """Stores the documents returned by find_one_and_update in the identity map, if any, or invalidates them."""
+        identity_map = IdentityMap.current()
+        if identity_map is not None:
+            for document in documents:
+                if document is not None:
+                    if return_document == ReturnDocument.AFTER and projection is None:
+                        identity_map.set(cls.collection, document)
+                    else:
+                        identity_map.invalidate(cls.collection, [document['_id']])
+
+    @classmethod
+    def _matches_datasource_filter(cls, resource: dict) -> bool:
+        """
+        Would the resource be obtained through the datasource filter of our resource? Like components
+        from devices, whose filter is on *@type*.
+        """
+        _filter = current_app.config['DOMAIN'][cls.resource_name]['datasource'].get('filter')
+        if not _filter:
+            return True
+        if set(_filter) != {'@type'}:
+            return False
+        types = _filter['@type'].get('$in', []) if type(_filter['@type']) is dict else [_filter['@type']]
+        return resource.get('@type') in types
+
     @classmethod
     def path_for(cls, database: str, identifier: str or ObjectId or int) -> str:
         """Returns the resource path for a given identifier."""
@@ -141,17 +273,17 @@ class Domain:
     @classproperty
     def collection(cls) -> Collection:
         """Gets the collection in the correct database for the current resource and logged-in account."""
-
-        # (which is the same as the resource)
         try:
-            # Collection name is usually the name of the resource, but not always (ex. for components is devices)
-            collection_name = cls.resource_settings.datasource['source']
-        except AttributeError:
-            raise AttributeError('Make sure resource_settings points to the correct subclass of ResourceSettings.')
-        else:
-            # pymongo(resource) gets the db of our resource and db[resource] the collection
-            # This invokes data_layer.current_mongo_prefix, which selects the db
-            return current_app.data.pymongo(cls.resource_name).db[collection_name]
+            resource_name, collection_name = _sources[cls]
+        except KeyError:
+            try:
+                # Collection name is usually the name of the resource, but not always (ex. for components is devices)
+                collection_name = cls.resource_settings.datasource['source']
+            except AttributeError:
+                raise AttributeError('Make sure resource_settings points to the correct subclass of ResourceSettings.')
+            resource_name, collection_name = _sources[cls] = cls.resource_name, collection_name
+        # This invokes data_layer.current_mongo_prefix, which selects the db
+        return current_app.data.collection(resource_name, collection_name)
 
     @classmethod
     def create_indexes(cls, indexes):
@@ -26,7 +26,7 @@ def avoid_repeating_allocations(allocates: list):
                 {'_id': {'$in': [allocate['devices']]}},
                 {'owners': {'$in': [allocate['to']]}}
             ]
-        })
+        }, projection={'_id': True})
         ids = [device['_id'] for device in devices_with_repeating_owners]
         allocate['devices'] = list(set(allocate['devices']) - set(ids))
         if len(allocate['devices']) == 0:
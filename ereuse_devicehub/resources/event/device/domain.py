@@ -75,9 +75,10 @@ class DeviceEventDomain(EventDomain):
         )
 
     @classmethod
-    def get_devices_components_id(cls, devices_id: List[str]):
+    def get_devices_components_id(cls, devices_id: List[str], projection: dict = None):
         """Like ``devices_id`` but getting it from db using ``device`` and ``devices`` properties."""
-        return cls.get({'$or': [{'device': {'$in': devices_id}}, {'devices': {'$in': devices_id}}, {'components': {'$in': devices_id}}]})
+        return cls.get({'$or': [{'device': {'$in': devices_id}}, {'devices': {'$in': devices_id}}, {'components': {'$in': devices_id}}]},
+                       projection=projection)
 
     DEVICES_ID_COMPONENTS = 'device', 'devices', 'components'
     DEVICES_ID_COMPONENTS_PARENT = DEVICES_ID_COMPONENTS + ('parent',)
@@ -63,7 +63,7 @@ def materialize_parent(resource_name: str, events: list):
         for event in events:
             sub_schema = current_app.config['DOMAIN'][resource_name]['schema']
             if sub_schema.get('parent', {}).get('materialized', False):
-                event['parent'] = ComponentDomain.get_parent(event['device'])['_id']
+                event['parent'] = ComponentDomain.get_parent(event['device'], {'_id': True})['_id']
 
 
 def set_place(resource_name: str, events: list):
@@ -78,7 +78,7 @@ def set_place(resource_name: str, events: list):
     if resource_name in Event.resource_names:
         for event in events:
             if 'place' in event:
-                place = PlaceDomain.get_one(event['place'])
+                place = PlaceDomain.get_one(event['place'], {'children.devices': True})
                 device = [event['device']] if 'device' in event else []
                 devices = uniq(place['children'].get('devices', []) + event.get('devices', []) + device)
                 patch = {'@type': 'Place', '_id': place['_id'], 'children': {'devices': devices}}
@@ -88,7 +88,7 @@ def set_place(resource_name: str, events: list):
 def unset_place(resource_name: str, event: dict):
     if resource_name in Event.resource_names:
         if 'place' in event:
-            place = PlaceDomain.get_one(event['place'])
+            place = PlaceDomain.get_one(event['place'], {'children.devices': True})
             device = [event['device']] if 'device' in event else []
             devices = list(set(place['children'].get('devices', [])) - set(event.get('devices', []) + device))
             patch = {'@type': 'Place', '_id': place['_id'], 'children': {'devices': devices}}
@@ -106,7 +106,8 @@ def delete_events_in_device(resource_name: str, device: dict):
         query = {'$or': [{'device': _id}, {'devices': qin}, {'components': qin}], '@type': {'$ne': 'devices:Register'}}
         sort = {'_created': pymongo.ASCENDING}  # Order is important to find the first Snapshot (see below)
         first_snapshot_found = False
-        for event in DeviceEventDomain.get({'$query': query, '$orderby': sort}):
+        projection = {'@type': True, 'device': True, 'devices': True, 'components': True}
+        for event in DeviceEventDomain.get({'$query': query, '$orderby': sort}, projection=projection):
             if not first_snapshot_found and event['@type'] == 'devices:Snapshot':
                 # We cannot delete the Snapshot that created the device, because there is a change to create
                 # an infinite loop: Snapshot that created device -> Register -> DEL /device -> Snapshot that created...
@@ -153,7 +154,8 @@ def fill_devices_field_from_groups(resource_name: str, events: list):
     def get_descendants(ids: list, group_name: str) -> (list, dict):
         """Obtains devices :-)"""
         group_domain = GroupDomain.children_resources[group_name]
-        grouped_descendants = group_domain.get_all_descendants(ids)  # descendants per type: devices: [], lots: []
+        # descendants per type: devices: [], lots: []
+        grouped_descendants = group_domain.get_all_descendants(ids, projection={'_id': True, '@type': True})
         del grouped_descendants['component']
         devices_id = grouped_descendants.pop('devices')
         devices_id = chain(devices_id).filter(lambda device: device['@type'] not in Component.types).map_('_id').value()
@@ -183,5 +185,5 @@ def inherit_permissions_from_devices(resource_name: str, events: List[dict]):
     if resource_name in DeviceEvent.resource_names:
         for event in events:
             devices_id = DeviceEventDomain.devices_id(event, DeviceEventDomain.DEVICES_ID_COMPONENTS)
-            devices = DeviceDomain.get_in('_id', devices_id)
+            devices = DeviceDomain.get_in('_id', devices_id, projection={'perms': True})
             event['perms'] = py_(devices).pluck('perms').flatten().uniq_by(iteratee=lambda x: x['account']).value()
@@ -8,7 +8,7 @@ from ereuse_devicehub.resources.account.domain import AccountDomain
 from ereuse_devicehub.resources.device.domain import DeviceDomain
 from ereuse_devicehub.resources.submitter.grd_submitter.old_translator import ResourceTranslator
 from ereuse_devicehub.resources.submitter.submitter import Submitter
-from ereuse_devicehub.rest import execute_get
+from ereuse_devicehub.rest import get_resource
 from ereuse_utils.naming import Naming
 
 
@@ -40,12 +40,8 @@ class MigrateTranslator(ResourceTranslator):
 
     def get_device(self, device_id: str) -> dict:
         """Gets the device ready to be sent to another database."""
-        # It is just so easy to load stuff (through permissions, etc) through Python-Eve's API
-        embedded = json.dumps({'components': 1})
-        projection = json.dumps({'events': 0})
-        token = AccountDomain.hash_token(AccountDomain.actual_token)
-        url = '{}/devices/{}?embedded={}&projection={}'.format(self.database, device_id, embedded, projection)
-        device = execute_get(url, token)
+        # We get it from the database of the request, which is self.database
+        device = get_resource(DeviceDomain.resource_name, device_id, {'components': 1}, {'events': 0})
         self.clean_device(device)
         for component in device.get('components', []):
             self.clean_device(component)
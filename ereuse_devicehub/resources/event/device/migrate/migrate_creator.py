@@ -20,8 +20,9 @@ class MigrateCreator(Snapshot):
         self.register(event_log)
         self.warn_for_broken_same_as(same_as_found, same_as_found_components)
         self.update_same_as(same_as_found, same_as_found_components)
+        old_parents = self.get_old_parents()
         for component in self.components:
-            self.get_add_remove(component, self.device)
+            self.get_add_remove(component, self.device, old_parents)
         self._remove_nonexistent_components()
         self.generate_returned_same_as()
         return event_log + self.events.process()
@@ -1,3 +1,5 @@
+import copy
+from collections import OrderedDict
 from contextlib import suppress
 
 from bson import json_util
@@ -37,18 +39,13 @@ def post_devices(registers: list):
         device = register['device']  # register['device'] will be only the _id later
         if 'parent' in register:  # If device is a component which we are manually setting its parent
             device['parent'] = register['parent']
-        register['deviceIsNew'] = device_is_new = _execute_register(device, register.get('created'), log)
+        components = register.get('components', [])
+        db_device, *db_components = _get_existing_devices([device] + components)
+        register['deviceIsNew'] = device_is_new = _register_device(device, db_device, register.get('created'), log)
         register['device'] = device['_id']
-        components_created = []  # Note that components_created it doesn't need to be equal to register['comp.']
-        blacklist = set()
-        for component in register.get('components', []):
-            # Although we set materialized 'parent' in component after (in add_components), this one is needed
-            # to help in case of a new component that cannot generate HID, linking it to its parent
-            component['parent'] = device['_id']
-            component['_blacklist'] = blacklist
-            if _execute_register(component, register.get('created'), log):  # Component is new
-                components_created.append(component['_id'])
-            blacklist.add(component['_id'])
+        new_components = _register_components(device, components, db_components, register.get('created'), log)
+        # Note that components_created it doesn't need to be equal to register['comp.']
+        components_created = [component['_id'] for component, new in zip(components, new_components) if new]
         register['components'] = components_created  # We only keep in the event the new components
         if not device_is_new and is_empty(components_created):
             t = 'Device {} and components {} already exist.'.format(register['device'], register['components'])
@@ -67,6 +64,190 @@ def post_devices(registers: list):
         set_date(None, registers)  # Let's get the time AFTER creating the devices
 
 
+def _register_device(device: dict, db_device: dict or None, created: str, log: list, updates: dict = None) -> bool:
+    """
+    Like :func:`_execute_register`, but if we already know that the device exists (*db_device*) we do
+    not try to POST it.
+
+    Placeholders are overridden with the inputting device as the validation of the POST leaves it,
+    so we still POST them.
+    :param updates: If passed-in, the updates for the existing device are added here instead of executed.
+    """
+    if db_device is None or db_device.get('placeholder', False):
+        return _execute_register(device, created, log)
+    _update_existing_device(device, db_device, updates)
+    device.clear()
+    device.update(db_device)
+    return False
+
+
+def _register_components(parent: dict, components: list, db_components: list, created: str, log: list) -> list:
+    """
+    Registers the components of a device, returning a list saying which ones are new.
+
+    Components that we know exist (*db_components*) are not POSTed, and their updates are executed
+    together at the end. The new ones are POSTed at once, one POST per type of component; if one of
+    those POST fails we register its components one by one, which raises the appropriate error.
+
+    Components without HID and _id are registered one by one and in order, as its validation looks for
+    similar components in the parent, which needs the *_blacklist* of the components we have
+    registered before them. We register all components one by one too if some of them share an uid,
+    as each one needs to see the previous ones in the database.
+    """
+    if _have_repeated_uids(components):
+        db_components = [None] * len(components)
+        batch = False
+    else:
+        batch = True
+    new = [None] * len(components)
+    to_post = OrderedDict()  # resource name: indexes of components
+    updates = {}
+    blacklist = set()
+    for i, (component, db_component) in enumerate(zip(components, db_components)):
+        # Although we set materialized 'parent' in component after (in add_components), this one is needed
+        # to help in case of a new component that cannot generate HID, linking it to its parent
+        component['parent'] = parent['_id']
+        component['_blacklist'] = blacklist
+        if not batch or db_component is not None or not _is_secured(component):
+            new[i] = _register_device(component, db_component, created, log, updates)
+        else:
+            to_post.setdefault(Naming.resource(component['@type']), []).append(i)
+        if '_id' in component:  # New components that we POST later do not need to be in the blacklist
+            blacklist.add(component['_id'])
+    for resource_name, indexes in to_post.items():
+        group = [components[i] for i in indexes]
+        if created:
+            for component in group:
+                component['created'] = created
+        try:
+            # We POST copies so the components are as they were if we need to register them one by one
+            response = execute_post_internal(resource_name, copy.deepcopy(group))
+        except InnerRequestError:
+            for i in indexes:
+                new[i] = _execute_register(components[i], created, log)
+        else:
+            for i, db_component in zip(indexes, response['_items'] if len(group) > 1 else [response]):
+                log.append(db_component)
+                components[i].clear()
+                components[i].update(db_component)
+                new[i] = True
+    ComponentDomain.update_each_raw(updates)
+    return new
+
+
+def _is_secured(device: dict) -> bool:
+    """Is the device identified by HID or _id, so its validation does not look for similar devices?"""
+    return '_id' in device or _hid(device) is not None
+
+
+def _hid(device: dict) -> str or None:
+    """Computes the HID like the validation does, or returns None if the device does not have HID."""
+    if device.get('placeholder', False):
+        return None
+    try:
+        return DeviceDomain.hid(device['manufacturer'], device['serialNumber'], device['model'])
+    except KeyError:
+        return None
+
+
+def _uids(device: dict) -> dict:
+    """
+    Gets the uids of the device that the unique validations check, including the computed HID,
+    or nothing if the device is not secured.
+    """
+    uids = {field: device[field] for field in DeviceDomain.uid_fields if field in device and field != 'hid'}
+    hid = _hid(device)  # Validation only checks the computed HID
+    if hid is not None:
+        uids['hid'] = hid
+    return uids if '_id' in device or hid is not None else {}
+
+
+def _have_repeated_uids(devices: list) -> bool:
+    uids = [uid for device in devices for uid in _uids(device).items()]
+    return len(uids) != len(set(uids))
+
+
+def _get_existing_devices(devices: list) -> list:
+    """
+    Gets the database version of the passed-in devices that are identified by HID or _id, and that
+    already exist, in one query, like the unique validations of the POST would find them.
+
+    :raise MismatchBetweenUid: When the unique ids of a device point at different devices.
+    :return: A list with, for each device, its database version or None.
+    """
+    uids = [_uids(device) for device in devices]
+    values = {}  # field: values of the field
+    for device_uids in uids:
+        for field, value in device_uids.items():
+            values.setdefault(field, []).append(value)
+    if not values:
+        return [None] * len(devices)
+    db_devices = {}  # (field, value): db device
+    for db_device in DeviceDomain.get({'$or': [{field: {'$in': v}} for field, v in values.items()]}):
+        for field in values:
+            if field in db_device:
+                db_devices.setdefault((field, db_device[field]), db_device)
+    result = []
+    for device_uids in uids:
+        matches = [(field, db_devices[field, value]) for field, value in device_uids.items()
+                   if (field, value) in db_devices]
+        for (field, db_device), (other_field, other_db_device) in zip(matches, matches[1:]):
+            if db_device['_id'] != other_db_device['_id']:
+                raise MismatchBetweenUid(other_field, other_db_device['_id'], db_device['_id'], field)
+        # Devices can share a database device, which we are going to modify
+        result.append(copy.deepcopy(matches[-1][1]) if matches else None)
+    return result
+
+
+def _update_existing_device(device: dict, db_device: dict, updates: dict = None):
+    """
+    Updates an existing device with the values that other Snapshots can add, like benchmarks or
+    external synthetic ids, and overrides it when it was a placeholder.
+
+    :param device: The inputting device.
+    :param db_device: The device in the database.
+    :param updates: If passed-in, the benchmarks and external synthetic ids are added here, by the
+        device identifier, to be executed later, instead of executing them. Placeholders cannot use it.
+    """
+    device['_id'] = db_device['_id']
+    external_synthetic_id_fields = pick(device, *DeviceDomain.external_synthetic_ids)
+    if updates is not None:
+        assert not db_device.get('placeholder', False), 'Placeholders are overridden right away.'
+        operation = ComponentDomain.benchmark_operation(device)
+        if not is_empty(external_synthetic_id_fields):
+            operation['$set'] = external_synthetic_id_fields
+        if operation:
+            updates[device['_id']] = operation
+        return
+    # We add a benchmark todo move to another place?
+    ComponentDomain.benchmark(device)
+    # If the db_device was a placeholder
+    # We want to override it with the new device
+    if db_device.get('placeholder', False):
+        # Eve do not generate defaults from sub-resources
+        # And we really need the placeholder default set, specially when
+        # discovering a device
+        device['placeholder'] = False
+        # We create hid when we validate (wrong thing) so we
+        # need to manually set it here as we won't
+        # validate in this db operation
+        try:
+            # We can discard wrong hid because the solution for it
+            # is setting a _id, which becoming from a placeholder is
+            # already granted
+            device['hid'] = DeviceDomain.hid(device['manufacturer'],
+                                             device['serialNumber'], device['model'])
+        except KeyError:
+            device['isUidSecured'] = False
+        DeviceDomain.update_one_raw(db_device['_id'], {'$set': device})
+    elif not is_empty(external_synthetic_id_fields):
+        # External Synthetic identifiers are not intrinsically inherent
+        # of devices, and thus can be added later in other Snapshots
+        # Note that the device / post and _get_existing
+        # device() have already validated those ids
+        DeviceDomain.update_one_raw(db_device['_id'], {'$set': external_synthetic_id_fields})
+
+
 def _execute_register(device: dict, created: str, log: list) -> bool:
     """
     Tries to POST the device and updates the `device` dict with the resource from the database; if the device could
@@ -87,37 +268,9 @@ def _execute_register(device: dict, created: str, log: list) -> bool:
         new = False
         try:
             db_device = _get_existing_device(e)
-            # We add a benchmark todo move to another place?
-            device['_id'] = db_device['_id']
-            ComponentDomain.benchmark(device)
-            external_synthetic_id_fields = pick(device, *DeviceDomain.external_synthetic_ids)
-            # If the db_device was a placeholder
-            # We want to override it with the new device
-            if db_device.get('placeholder', False):
-                # Eve do not generate defaults from sub-resources
-                # And we really need the placeholder default set, specially when
-                # discovering a device
-                device['placeholder'] = False
-                # We create hid when we validate (wrong thing) so we
-                # need to manually set it here as we won't
-                # validate in this db operation
-                try:
-                    # We can discard wrong hid because the solution for it
-                    # is setting a _id, which becoming from a placeholder is
-                    # already granted
-                    device['hid'] = DeviceDomain.hid(device['manufacturer'],
-                                                     device['serialNumber'], device['model'])
-                except KeyError:
-                    device['isUidSecured'] = False
-                DeviceDomain.update_one_raw(db_device['_id'], {'$set': device})
-            elif not is_empty(external_synthetic_id_fields):
-                # External Synthetic identifiers are not intrinsically inherent
-                # of devices, and thus can be added later in other Snapshots
-                # Note that the device / post and _get_existing
-                # device() have already validated those ids
-                DeviceDomain.update_one_raw(db_device['_id'], {'$set': external_synthetic_id_fields})
         except DeviceNotFound:
             raise e
+        _update_existing_device(device, db_device)
     else:
         new = True
         log.append(db_device)
@@ -0,0 +1,39 @@
+from datetime import datetime
+from uuid import UUID
+
+from pydash import pick
+
+from ereuse_devicehub.resources.domain import Domain
+from ereuse_devicehub.resources.event.device.snapshot.settings import SnapshotResponseSettings
+
+RESPONSE_FIELDS = '_id', '@type', '_status', '_warning', 'device', 'components', 'events', 'unsecured', '_job'
+"""The fields of the response of a snapshot that we save to replay it."""
+
+
+class SnapshotResponseDomain(Domain):
+    resource_settings = SnapshotResponseSettings
+
+    @classmethod
+    def get_response(cls, uuid: str) -> dict or None:
+        """Gets the saved response of the snapshot with the passed-in *_uuid*, if any."""
+        return cls.collection.find_one({'_id': cls.key(uuid)})
+
+    @classmethod
+    def save_response(cls, uuid: str, status: int, response: dict, by_user):
+        """Saves the response of a snapshot, so we can replay it to the account that uploaded it (*by_user*)."""
+        document = {
+            'status': status,
+            'response': pick(response, *RESPONSE_FIELDS),
+            'byUser': by_user,
+            '_created': datetime.utcnow()
+        }
+        cls.collection.replace_one({'_id': cls.key(uuid)}, document, upsert=True)
+
+    @classmethod
+    def delete_response(cls, uuid: str):
+        cls.collection.delete_one({'_id': cls.key(uuid)})
+
+    @staticmethod
+    def key(uuid: str) -> str:
+        """The normalized *_uuid*, so the same UUID written differently is the same snapshot."""
+        return str(UUID(str(uuid)))
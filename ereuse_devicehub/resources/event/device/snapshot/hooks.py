@@ -2,16 +2,20 @@ import json
 from contextlib import suppress
 from typing import List
 
-from flask import Request, Response, current_app as app, g, request
+from flask import Request, Response, abort, current_app as app, g, jsonify, request
 
 from ereuse_devicehub.exceptions import InnerRequestError, SchemaError
+from ereuse_devicehub.resources.account.domain import AccountDomain
 from ereuse_devicehub.resources.device.domain import DeviceDomain
 from ereuse_devicehub.resources.device.score_condition import ScorePriceError, ScorePriceNotSuitableError
 from ereuse_devicehub.resources.domain import ResourceNotFound
 from ereuse_devicehub.resources.event.device import DeviceEventDomain
+from ereuse_devicehub.resources.event.device.snapshot.domain import SnapshotResponseDomain
 from ereuse_devicehub.resources.event.domain import EventNotFound
 from ereuse_devicehub.resources.group.domain import GroupDomain
+from ereuse_devicehub.resources.job.condition_price.domain import ConditionPriceDomain
 from ereuse_devicehub.rest import execute_delete, execute_patch
+from ereuse_devicehub.utils import url_for_resource
 from ereuse_utils.naming import Naming
 from .snapshot import Snapshot, SnapshotWithoutComponents
 
@@ -55,30 +59,52 @@ def materialize_erasures(_):
         _materialize_event_in_device(erase_basic, 'erasures')
 
 
+def materialize_unsecured_components(snapshots: list):
+    """Materializes the components the snapshot could not identify by HID in ``unsecuredComponents`` of the device."""
+    for snapshot in snapshots:
+        ids = [u['_id'] for u in snapshot.get('unsecured', []) if u['_id'] != snapshot['device']]
+        if ids:
+            DeviceDomain.update_one_raw(snapshot['device'], {'$addToSet': {'unsecuredComponents': {'$each': ids}}})
+
+
 def _materialize_event_in_device(event, field_name):
     DeviceDomain.update_one_raw(event['device'], {'$push': {field_name: event['_id']}})
 
 
 def compute_condition_price_and_materialize_in_device(snapshots: list):
-    """Computes condition and pricing and then saves it in snapshot and materializes in device."""
+    """
+    Computes condition and pricing and then saves it in snapshot and materializes in device.
+
+    When there are score workers this is queued in a
+    :class:`ereuse_devicehub.resources.job.condition_price.settings.ConditionPrice` job instead,
+    so the snapshot does not wait for R.
+    """
     for snapshot in snapshots:
-        try:
-            # condition and pricing may fail as they are executing external unstable libraries
-            # Pricing needs condition, so if condition fails there is no need to execute pricing
-            device = app.score.get_device(snapshot['device'], snapshot.get('condition', {}))
-            snapshot['condition'] = app.score.compute(device)
-            snapshot['pricing'] = app.price.compute(device)
-            q = {'$set': {'condition': snapshot['condition'], 'pricing': snapshot['pricing']}}
-            DeviceEventDomain.update_one_raw(snapshot['_id'], q)
-        except ScorePriceNotSuitableError:
-            # Note that we silent some expected exceptions
-            pass
-        except (ScorePriceError, ScorePriceNotSuitableError) as e:
-            app.logger.info(e)
-        # Materialize to device if needed
-        if 'condition' in snapshot or 'pricing' in snapshot:
-            q = {'$set': {'condition': snapshot.get('condition', {}), 'pricing': snapshot.get('pricing', {})}}
-            DeviceDomain.update_one_raw(snapshot['device'], q)
+        if ConditionPriceDomain.dedicated_workers() and 'condition' in snapshot:
+            ConditionPriceDomain.enqueue_snapshot(snapshot)
+        else:
+            compute_condition_price(snapshot)
+
+
+def compute_condition_price(snapshot: dict):
+    """Computes condition and pricing of a snapshot, saving them in the snapshot and materializing them in device."""
+    try:
+        # condition and pricing may fail as they are executing external unstable libraries
+        # Pricing needs condition, so if condition fails there is no need to execute pricing
+        device = app.score.get_device(snapshot['device'], snapshot.get('condition', {}))
+        snapshot['condition'] = app.score.compute(device)
+        snapshot['pricing'] = app.price.compute(device)
+        q = {'$set': {'condition': snapshot['condition'], 'pricing': snapshot['pricing']}}
+        DeviceEventDomain.update_one_raw(snapshot['_id'], q)
+    except ScorePriceNotSuitableError:
+        # Note that we silent some expected exceptions
+        pass
+    except (ScorePriceError, ScorePriceNotSuitableError) as e:
+        app.logger.info(e)
+    # Materialize to device if needed
+    if 'condition' in snapshot or 'pricing' in snapshot:
+        q = {'$set': {'condition': snapshot.get('condition', {}), 'pricing': snapshot.get('pricing', {})}}
+        DeviceDomain.update_one_raw(snapshot['device'], q)
 
 
 def delete_events(_, snapshot: dict):
@@ -95,6 +121,47 @@ def delete_events(_, snapshot: dict):
                         raise e
 
 
+def delete_snapshot_response(_, snapshot: dict):
+    """Deletes the saved response of a deleted snapshot, so uploading it again executes it."""
+    if snapshot.get('@type') == 'devices:Snapshot' and '_uuid' in snapshot:
+        SnapshotResponseDomain.delete_response(snapshot['_uuid'])
+
+
+def replay_snapshot(payload: Request):
+    """
+    Answers with the saved response when the snapshot has already been uploaded (a snapshot with the
+    same *_uuid*), without executing it again. This happens when Workbench retries an upload.
+
+    This is executed in the pre_POST, so the account is already authenticated, but the permissions
+    are checked in on_insert, which replaying skips: we check them here, and only replay the response
+    to the account that uploaded the snapshot.
+    """
+    # Security hooks import domains that import this module
+    from ereuse_devicehub.security.hooks import check_post_perms
+    snapshot = payload.get_json(silent=True)
+    check_post_perms(Naming.resource(DeviceEventDomain.new_type('Snapshot')), [snapshot])
+    try:
+        saved = SnapshotResponseDomain.get_response(snapshot['_uuid'])
+    except (KeyError, TypeError, ValueError):
+        return  # Validation tells the client what is wrong
+    if saved is not None and saved.get('byUser') == AccountDomain.actual['_id']:
+        response = jsonify(saved['response'])
+        response.status_code = saved['status']
+        abort(response)
+
+
+def save_snapshot_response(response: Response):
+    """Saves the response of a snapshot that has *_uuid* so we can replay it, if we executed the snapshot."""
+    # This is executed in an after_request
+    if 'dh_snapshot' in g and request.method == 'POST' and 200 <= response.status_code < 300 \
+            and (request.endpoint or '').split('|')[0] == Naming.resource(DeviceEventDomain.new_type('Snapshot')):
+        with suppress(KeyError, TypeError, ValueError):
+            uuid = request.get_json(silent=True)['_uuid']
+            SnapshotResponseDomain.save_response(uuid, response.status_code, json.loads(response.data.decode()),
+                                                 AccountDomain.actual['_id'])
+    return response
+
+
 SNAPSHOT_SOFTWARE = {
     'DDI': 'Workbench',
     'Scan': 'AndroidApp',
@@ -137,6 +204,21 @@ def add_to_group(snapshots: List[dict]):
                                                          .format(snapshot['group']['_id'], e))
 
 
+def add_condition_price_job(response: Response):
+    """Adds to the response of the snapshot the job that computes its condition and price, if any."""
+    # This is executed in an after_request
+    if 'dh_condition_price' in g and 200 <= response.status_code < 300:
+        job = g.pop('dh_condition_price')
+        data = json.loads(response.data.decode())
+        data['_job'] = {
+            '@type': job['@type'],
+            '_id': str(job['_id']),
+            'url': url_for_resource('jobs', job['_id'])
+        }
+        response.data = json.dumps(data)
+    return response
+
+
 def return_202_when_could_not_add_to_group(response: Response):
     # This is executed in an after_request
     if 'dh_snapshot_add_to_group' in g:
@@ -9,6 +9,8 @@ from ereuse_devicehub.resources.event.device.settings import EventSubSettingsOne
     place
 from ereuse_devicehub.resources.group.settings import Group
 from ereuse_devicehub.resources.pricing import pricing
+from ereuse_devicehub.resources.resource import ResourceSettings
+from ereuse_devicehub.resources.schema import Thing
 
 
 class Snapshot(EventWithOneDevice):
@@ -288,3 +290,34 @@ class SnapshotSettings(EventSubSettingsOneDevice):
     extra_response_fields = EventSubSettingsOneDevice.extra_response_fields + ['events']
     fa = 'fa-camera'
     short_description = "A fast picture of the state and key information of the computer and it's devices."
+
+
+class SnapshotResponse(Thing):
+    """
+    The response of a POSTed snapshot, identified by the *_uuid* of the snapshot.
+
+    When Workbench retries uploading a snapshot we answer with this response instead of executing
+    the snapshot again. See :func:`ereuse_devicehub.resources.event.device.snapshot.hooks.replay_snapshot`.
+    """
+    _id = {
+        'type': 'uuid'
+    }
+    status = {
+        'type': 'integer'
+    }
+    response = {
+        'type': 'dict',
+        'doc': 'The _id, device, components and events of the snapshot, amongst others.'
+    }
+    byUser = {
+        'type': 'objectid',
+        'doc': 'The account that uploaded the snapshot, the only one we replay the response to.'
+    }
+
+
+class SnapshotResponseSettings(ResourceSettings):
+    _schema = SnapshotResponse
+    internal_resource = True
+    datasource = {
+        'source': 'snapshot-responses'
+    }
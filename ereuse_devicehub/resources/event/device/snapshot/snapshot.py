@@ -78,8 +78,9 @@ class Snapshot(SnapshotWithoutComponents):
         event_log = []
         self.get_tests_and_erasures(self.components)
         self.register(event_log)
+        old_parents = self.get_old_parents()
         for component in self.components:
-            self.get_add_remove(component, self.device)
+            self.get_add_remove(component, self.device, old_parents)
         self.exec_hard_drive_events(event_log, self.erasures + self.test_hard_drives)
         self._remove_nonexistent_components()
         return event_log + self.events.process()
@@ -100,7 +101,12 @@ class Snapshot(SnapshotWithoutComponents):
             event_log.append(execute_post_internal(Naming.resource(event['@type']), event))
             event.update(event_log[-1])
 
-    def get_add_remove(self, device: dict, new_parent: dict):
+    def get_old_parents(self) -> dict:
+        """Gets the actual parents of the components that are not new, by component id, in one query."""
+        ids = [component['_id'] for component in self.components if component['_id'] not in self.new_components_id]
+        return ComponentDomain.get_parents(ids)
+
+    def get_add_remove(self, device: dict, new_parent: dict, old_parents: dict):
         """
         Get the changes (events) that will need to be triggered for the given device.
         Changes will we saved in the same device in the reserved key '_change'.
@@ -108,16 +114,15 @@ class Snapshot(SnapshotWithoutComponents):
 
         :param device: The device must have an hid
         :param new_parent:
+        :param old_parents: The parents of the components before this snapshot, see :meth:`get_old_parents`.
         """
         if not device['_id'] in self.new_components_id:
-            try:
-                old_parent = ComponentDomain.get_parent(device['_id'])
-            except DeviceNotFound:  # The component exists but had no parent device, until now
+            old_parent = old_parents.get(device['_id'])
+            if old_parent is None:  # The component exists but had no parent device, until now
+                self.events.append_add(device, new_parent)
+            elif not DeviceDomain.seem_equal(old_parent, new_parent):
+                self.events.append_remove(device, old_parent)
                 self.events.append_add(device, new_parent)
-            else:
-                if not DeviceDomain.seem_equal(old_parent, new_parent):
-                    self.events.append_remove(device, old_parent)
-                    self.events.append_add(device, new_parent)
 
     def _remove_nonexistent_components(self):
         """
@@ -127,6 +132,10 @@ class Snapshot(SnapshotWithoutComponents):
         of device we still have the old components. We need to remove those that are not present in this new snapshot.
         """
         if 'components' in self.device:
-            full_old_components = [ComponentDomain.get_one(component) for component in self.device['components']]
+            old_components = {c['_id']: c for c in ComponentDomain.get_in('_id', self.device['components'])}
+            try:
+                full_old_components = [old_components[_id] for _id in self.device['components']]
+            except KeyError as e:
+                raise DeviceNotFound('The resource with id {} does not exist.'.format(e.args[0])) from e
             for component_to_remove in ComponentDomain.difference(full_old_components, self.components):
                 self.events.append_remove(component_to_remove, self.device)
@@ -8,9 +8,9 @@ class EventDomain(Domain):
     resource_settings = EventSettings
 
     @classmethod
-    def get_one(cls, id_or_filter: dict or ObjectId or str, **kwargs):
+    def get_one(cls, id_or_filter: dict or ObjectId or str, projection: dict = None, **kwargs):
         try:
-            return super().get_one(id_or_filter)
+            return super().get_one(id_or_filter, projection)
         except ResourceNotFound:
             raise EventNotFound()
 
@@ -1,12 +1,13 @@
-from collections import Iterable
-from typing import Dict, List, Set, Type
+from collections import Iterable, OrderedDict
+from typing import Dict, List, Set, Tuple, Type
 
 from bson import ObjectId
 from ereuse_utils.naming import Naming
+from flask import current_app, g
 from passlib.utils import classproperty
-from pydash import compact, difference, difference_with, flatten, map_values, pick, pluck, py_, \
+from pydash import chunk, compact, difference, difference_with, flatten, pick, pluck, py_, \
     union_by
-from pymongo.errors import OperationFailure
+from pymongo import UpdateMany, UpdateOne
 
 from ereuse_devicehub.resources.account.domain import AccountDomain
 from ereuse_devicehub.resources.device.component.domain import ComponentDomain
@@ -27,6 +28,22 @@ class GroupDomain(Domain):
     - Use ``update_children()`` to create
     """
     resource_settings = GroupSettings
+    BULK_SIZE = 1000
+    """
+    The maximum number of children updated with one bulk write when inheriting. Components are updated
+    in the same bulk of their devices, so the actual number of updated resources can be greater.
+    """
+    INHERITANCE_PROJECTION = {
+        '@type': True,
+        'ancestors': True,
+        'ancestorIds': True,
+        'children': True,
+        'components': True,
+        'events._id': True,
+        'perms': True,
+        'sharedWith': True
+    }
+    """The fields of the children and descendants the inheritance reads."""
 
     @classmethod
     def update_children(cls, original: dict, updated: dict, ancestors: list, _id: str or None, perms: Perms):
@@ -76,7 +93,8 @@ class GroupDomain(Domain):
         :param children: A list of children ids.
         """
         q = {'$pull': {'ancestors': {'@type': cls.resource_settings._schema.type_name, '_id': parent_id}}}
-        full_children = child_domain.update_raw_get(children, q)
+        full_children = child_domain.update_many_raw_get(children, q, projection=cls.INHERITANCE_PROJECTION)
+        cls.update_ancestor_ids(child_domain, full_children)
 
         cls._remove_perms(full_children, parent_accounts, child_domain)
 
@@ -98,7 +116,8 @@ class GroupDomain(Domain):
         type that our children have. Some groups like lots of packages *share parenthood* (they allow
         multiple parents simultaniously for their children) and they override this method with a *pass*.
 
-        This method does not recursively update descendants –use **inherit() after**.
+        This method does not recursively update descendants –use **inherit() after**, which
+        materializes *ancestorIds* too.
 
         :param child_domain: The domain of the children. Note that this forces all children to be of the same @type.
         Call inherit as many times as types of children you have.
@@ -203,39 +222,19 @@ class GroupDomain(Domain):
           updates *ancestors* and **adds** permissions.
         - Removes permissions when passing in *parent_acounts_remove* (internally calling *_remove_perms*)
         - For devices, adds and removes permissions for accounts when necessary (internally calling *_remove_perms*)
+
+        Resources are updated in batches of :attr:`BULK_SIZE`, each batch costing a handful of queries
+        regardless of its size (see :meth:`_update_db_batch`).
+
+        :return: The children (not their components) as they are after the update.
         """
-        new_children = []
-        for resource in resources:  # We cannot run all the resources at once when catching exceptions
-            try:
-                # Let's try to update an existing ancestor dict (this is with the same _id and @type),
-                # Note that this only will succeed when a relationship child-parent already exists, and this happens
-                # when we are updating the grandchilden (and so on) after adding/deleting a relationship
-                eq = {'ancestors.@type': ancestors_new['@type'], 'ancestors._id': parent_id}
-                full_child, *_ = child_domain.update_raw_get(resource, update_query, extra_query=eq, upsert=True)
-            except OperationFailure as e:
-                if e.code == 16836:
-                    # There is not an ancestor dict, so let's create one
-                    # This only happens when creating a relationship parent-child
-                    new_query = {
-                        '$push': {'ancestors': {'$each': [ancestors_new], '$position': 0}},
-                    }
-                    if parent_perms is not None:
-                        # ADDING PERMISSIONS (bis)
-                        # ------------------------
-                        new_query['$set'] = {'perms': parent_perms}
-                    full_child, *_ = child_domain.update_raw_get(resource, new_query)
-                else:
-                    raise e
-            new_children.append(full_child)
-
-            # UPDATE COMPONENTS
-            # -----------------
-            # Components of devices inherit exactly the same way as their parents, so
-            # let's re-call this method with the components
-            components = full_child.get('components', [])  # Let's update the components
-            if components:
-                cls._update_db(parent_id, components, ancestors_new, update_query, ComponentDomain, parent_perms,
-                               parent_accounts_remove)
+        new_children, new_components = [], []
+        for batch in chunk(list(resources), cls.BULK_SIZE):
+            children, components = cls._update_db_batch(parent_id, batch, ancestors_new, update_query, child_domain,
+                                                        parent_perms)
+            new_children += children
+            new_components += components
+            cls._report_progress(len(children) + len(components))
 
         # REMOVING PERMISSIONS
         # --------------------
@@ -244,15 +243,106 @@ class GroupDomain(Domain):
         if parent_accounts_remove:
             # We are inheriting the removal of permissions
             cls._remove_perms(new_children, parent_accounts_remove, child_domain)
+            cls._remove_perms(new_components, parent_accounts_remove, ComponentDomain)
 
         # ADDING PERMISSIONS TO EVENTS
         # ----------------------------
         if parent_perms:
-            events_id = py_(new_children).pluck('events').flatten().pluck('_id').value()
+            events_id = py_(new_children + new_components).pluck('events').flatten().pluck('_id').value()
             cls.add_perms_to_events(events_id, parent_perms)
 
         return new_children
 
+    @classmethod
+    def _update_db_batch(cls, parent_id: str, resources: List[str], ancestors_new: dict, update_query: dict,
+                         child_domain: Type[Domain], parent_perms: Perms = None) -> Tuple[List[dict], List[dict]]:
+        """
+        Updates the *ancestors* and *perms* of the resources and, for devices, of their components, in one
+        *bulk_write*.
+
+        The bulk performs two ordered updates over the same set of resources:
+
+        1. Resources that already have an ancestor dict from the parent (same _id and @type), which happens
+           when we are updating the grandchildren (and so on) after adding/deleting a relationship, get it
+           replaced through the positional operator.
+        2. Resources that do not have it, which happens when creating a relationship parent-child, get it
+           prepended. As the first update never adds the ancestor dict, this one only hits the resources the
+           first one did not update.
+
+        Components of devices inherit exactly the same way as their parents and they live in the same collection,
+        so we update them in the same batch.
+
+        :return: A tuple with the updated children and their updated components.
+        """
+        encode = current_app.mongo_encoder.encode_to_mongo
+        # UPDATE COMPONENTS
+        # -----------------
+        components = []
+        if issubclass(child_domain, DeviceDomain) and not issubclass(child_domain, ComponentDomain):
+            devices = child_domain.collection.find({'_id': {'$in': resources}}, {'components': True})
+            components = py_(devices).pluck('components').flatten().compact().value()
+        ids = {'$in': resources + components}
+        has_ancestor = {'$elemMatch': {'@type': ancestors_new['@type'], '_id': parent_id}}
+        requests = []
+        if update_query['$set']:
+            requests.append(UpdateMany({'_id': ids, 'ancestors': has_ancestor}, encode(update_query)))
+        new_query = {'$push': {'ancestors': {'$each': [ancestors_new], '$position': 0}}}
+        if parent_perms is not None:
+            # ADDING PERMISSIONS (bis)
+            # ------------------------
+            new_query['$set'] = {'perms': parent_perms}
+        requests.append(UpdateMany({'_id': ids, 'ancestors': {'$not': has_ancestor}}, encode(new_query)))
+        child_domain.bulk_write(requests)
+
+        # We get the post-image of all resources at once
+        updated = child_domain.get_in('_id', resources + components, projection=cls.INHERITANCE_PROJECTION)
+        cls.update_ancestor_ids(child_domain, updated)
+        children_ids = set(resources)
+        new_children = [resource for resource in updated if resource['_id'] in children_ids]
+        new_components = [resource for resource in updated if resource['_id'] not in children_ids]
+        return new_children, new_components
+
+    @classmethod
+    def update_ancestor_ids(cls, domain: Type[Domain], resources: List[dict]):
+        """
+        Materializes *ancestorIds* from the *ancestors* of the passed-in resources in one bulk write,
+        updating the dicts too. Resources need to have their latest *ancestors*.
+        """
+        requests = []
+        for resource in resources:
+            ancestor_ids = cls.ancestor_ids(resource.get('ancestors', []))
+            if resource.get('ancestorIds') != ancestor_ids:
+                resource['ancestorIds'] = ancestor_ids
+                requests.append(UpdateOne({'_id': resource['_id']}, {'$set': {'ancestorIds': ancestor_ids}}))
+        if requests:
+            domain.bulk_write(requests, ordered=False)
+
+    @staticmethod
+    def ancestor_ids(ancestors: list) -> List[str]:
+        """
+        Flattens an *ancestors* field to the typed ids of all the ancestors, like ``['Lot:a', 'Place:b']``,
+        which is the value of *ancestorIds*.
+        """
+        ids = set()
+        for ancestor in ancestors:
+            ids.add(GroupDomain.typed_id(ancestor['@type'], ancestor['_id']))
+            for resource_name, ancestors_id in ancestor.items():
+                if resource_name not in ('@type', '_id'):
+                    ids.update(GroupDomain.typed_id(Naming.type(resource_name), _id) for _id in ancestors_id)
+        return sorted(ids)
+
+    @staticmethod
+    def typed_id(type_name: str, _id: str) -> str:
+        """The id of a group prefixed by its type, as used in *ancestorIds*."""
+        return '{}:{}'.format(type_name, _id)
+
+    @staticmethod
+    def _report_progress(processed: int):
+        """Tells how many resources we have updated to the job executing the inheritance, if any."""
+        progress = g.get('dh_job_progress')
+        if progress:
+            progress(processed)
+
     @classmethod
     def _update_inheritance_grandchildren(cls, full_children: list, child_domain: Type['GroupDomain'],
                                           parent_perms: Perms = None, accounts_to_remove: List[str] = None):
@@ -302,32 +392,74 @@ class GroupDomain(Domain):
     def is_parent(cls, parent_type: str, parent_id: str, child_id: str) -> bool:
         q = {'_id': child_id, 'ancestors': {'$elemMatch': {'@type': parent_type, '_id': parent_id}}}
         try:
-            return bool(cls.get_one(q))
+            return bool(cls.get_one(q, {'_id': True}))
         except ResourceNotFound:
             return False
 
     @classmethod
-    def get_descendants(cls, child_domain: Type[Domain], parent_ids: str or list) -> list:
+    def get_descendants(cls, child_domain: Type[Domain], parent_ids: str or list, projection: dict = None) -> list:
         """
         Get the descendants of this class type of the given ancestor.
         :param child_domain: The child domain.
         :param parent_ids: The id of a parent or a list of them. We retrieve descendants of **any** parent.
+        :param projection: A Mongo projection to only obtain some fields of the descendants.
+        """
+        return child_domain.get(cls.descendants_query(parent_ids), projection=projection)
+
+    @classmethod
+    def count_descendants(cls, parent_ids: str or list) -> int:
+        """Counts the descendants of all types of the given ancestors."""
+        q = cls.descendants_query(parent_ids)
+        return sum(domain.count(q) for domain, _ in cls._children_collections())
+
+    @classmethod
+    def descendants_query(cls, parent_ids: str or list) -> dict:
+        """
+        The query to get the descendants of the given ancestors. See :meth:`get_descendants`.
+
+        This uses the flattened *ancestorIds*, which is indexed, instead of *ancestors*.
         """
         # The following is possible because during the inheritance, we only add to 'ancestors' the valid ones.
         type_name = cls.resource_settings._schema.type_name
         ids = parent_ids if type(parent_ids) is list else [parent_ids]
-        query = {
-            '$or': [
-                {'ancestors': {'$elemMatch': {'@type': type_name, '_id': {'$in': ids}}}},
-                {'ancestors': {'$elemMatch': {cls.resource_settings.resource_name(): {'$elemMatch': {'$in': ids}}}}}
-            ]
-        }
-        return child_domain.get(query)
+        return {'ancestorIds': {'$in': [cls.typed_id(type_name, _id) for _id in ids]}}
 
     @classmethod
-    def get_all_descendants(cls, parent_ids: str or list) -> list:
-        # Todo enhance by performing only one query
-        return map_values(cls.children_resources, lambda domain: cls.get_descendants(domain, parent_ids))
+    def get_all_descendants(cls, parent_ids: str or list, projection: dict = None) -> Dict[str, list]:
+        """
+        Get the descendants of any type of the given ancestors, grouped by resource name,
+        like ``{'devices': [...], 'components': [...], 'lots': [...]}``.
+
+        Resources that share a collection (like devices and components) are obtained with the same query,
+        so this performs one query per collection. Note that a descendant can be in several resources
+        (a component is in *devices* and *components*) and then the same dict is in both lists.
+
+        :param parent_ids: The id of a parent or a list of them. We retrieve descendants of **any** parent.
+        :param projection: A Mongo projection to only obtain some fields of the descendants. We always
+        obtain *@type*, as we need it to group the descendants.
+        """
+        if projection and any(value in (True, 1) for value in projection.values()):
+            projection = dict(projection, **{'@type': True})
+        q = cls.descendants_query(parent_ids)
+        descendants = {resource_name: [] for resource_name in cls.children_resources}
+        for domain, resource_names in cls._children_collections():
+            for descendant in domain.get(q, projection=projection):
+                for resource_name in resource_names:
+                    if descendant['@type'] in cls.children_resources[resource_name].resource_settings._schema.types:
+                        descendants[resource_name].append(descendant)
+        return descendants
+
+    @classmethod
+    def _children_collections(cls) -> List[Tuple[Type[Domain], List[str]]]:
+        """
+        Groups the children resources by the collection they are stored in, returning a domain to access
+        each collection and the names of the resources stored in it.
+        """
+        collections = OrderedDict()
+        for resource_name, domain in cls.children_resources.items():
+            source = domain.resource_settings.datasource['source']
+            collections.setdefault(source, (domain, []))[1].append(resource_name)
+        return list(collections.values())
 
     @classmethod
     def _remove_perms(cls, resources: List[dict], accounts: List[str], child_domain: Type[Domain]):
@@ -341,6 +473,7 @@ class GroupDomain(Domain):
         :param child_domain: The child domain.
         """
         # Remove permissions
+        operations = {}
         for resource in resources:
             # Compute which accounts we remove
             accounts_to_remove = difference(accounts, resource.get('sharedWith', []))
@@ -348,11 +481,14 @@ class GroupDomain(Domain):
             perms = difference_with(resource['perms'], accounts_to_remove, comparator=lambda a, b: a['account'] == b)
             if len(perms) != len(resource['perms']):
                 # We have lost some permissions
-                child_domain.update_one_raw(resource['_id'], {'$set': {'perms': perms}})
+                operations[resource['_id']] = {'$set': {'perms': perms}}
                 resource['perms'] = perms  # As we pass it into another function, just in case it is used later
-                if resource['@type'] in Device.types:
-                    # For devices, we need to update their events too
-                    cls._remove_perms_in_event(accounts_to_remove, resource['_id'])
+        child_domain.update_each_raw(operations)
+        for resource in resources:
+            if resource['_id'] in operations and resource['@type'] in Device.types:
+                # For devices, we need to update their events too
+                accounts_to_remove = difference(accounts, resource.get('sharedWith', []))
+                cls._remove_perms_in_event(accounts_to_remove, resource['_id'])
 
     @classmethod
     def _remove_perms_in_event(cls, accounts_to_remove_from_device: List[ObjectId], device_id: str):
@@ -367,7 +503,9 @@ class GroupDomain(Domain):
         :param events_id: The affected events.
         """
         from ereuse_devicehub.resources.event.device import DeviceEventDomain
-        for event in DeviceEventDomain.get_devices_components_id([device_id]):
+        fields = DeviceEventDomain.DEVICES_ID_COMPONENTS + ('@type', 'perms', 'sharedWith')
+        projection = {field: True for field in fields}
+        for event in DeviceEventDomain.get_devices_components_id([device_id], projection):
             # Which accounts have access to any of the other devices?
             # Those accounts with access will be saved, as it means the user can access the event because this
             # event represents a device that the account can access to.
@@ -375,7 +513,7 @@ class GroupDomain(Domain):
             # device we are removing, so we will drop access to the account as well.
             devices_id = DeviceEventDomain.devices_id(event, DeviceEventDomain.DEVICES_ID_COMPONENTS)
             devices_id.remove(device_id)
-            devices = DeviceDomain.get_in('_id', devices_id)
+            devices = DeviceDomain.get_in('_id', devices_id, projection={'perms': True})
             accounts_to_remove_from_event = difference(accounts_to_remove_from_device,
                                                        py_(devices).pluck('perms').flatten().pluck('account').value())
             if accounts_to_remove_from_event:
@@ -390,7 +528,8 @@ class GroupDomain(Domain):
 
         sharedWith is updated for both the resource and its descendants, if needed; this updates the account too.
 
-        Be aware that the cost of this method greatly increases by the number of descendants.
+        Descendants and their events are updated with a few bulk queries regardless of their number,
+        see :meth:`_inherit_perms`.
 
         :raise UserHasExplicitDbPerms: You can't share to accounts that already have full access to this database.
         """
@@ -408,32 +547,7 @@ class GroupDomain(Domain):
 
             # Inherit
             new_modified_perms = difference(new_perms, old_perms)  # New or modified permissions to write to descendants
-            for resource_name, domain in cls.children_resources.items():
-                for descendant in cls.get_descendants(domain, resource_id):
-                    # Remove permissions
-                    f = lambda a, b: a['account'] == b
-                    perms = difference_with(descendant['perms'], list(accounts_to_remove), comparator=f)
-
-                    # Set or re-set new or updated permissions
-                    perms = union_by(new_modified_perms, perms, iteratee=lambda x: x['account'])
-
-                    q = {'$set': {'perms': perms}}
-
-                    if resource_name not in Device.resource_names:
-                        # Remove accounts that lost permission from sharedWith
-                        descendant_shared_with = set(descendant.get('sharedWith', set()))
-                        descendant_shared_with = cls.remove_shared_with(descendant['@type'], descendant['_id'],
-                                                                        descendant_shared_with, accounts_to_remove)
-                        q['$set']['sharedWith'] = descendant_shared_with
-                    else:
-                        # For devices, remove the perms from the events
-                        cls._remove_perms_in_event(list(accounts_to_remove), descendant['_id'])
-                        # add new perms to events
-                        events_id = pluck(descendant['events'], '_id')
-                        cls.add_perms_to_events(events_id, perms)
-
-                    # Update the changes of the descendant in the database
-                    domain.update_one_raw(descendant['_id'], q)
+            cls._inherit_perms(resource_id, new_modified_perms, list(accounts_to_remove))
         return shared_with
 
     @classmethod
@@ -444,12 +558,114 @@ class GroupDomain(Domain):
         AccountDomain.remove_shared(db, shared_with.intersection(accounts_to_remove), _id, type_name)
         return set(shared_with) - accounts_to_remove
 
-    @staticmethod
-    def add_perms_to_events(events_id: List[str], perms: List[dict]):
-        """Adds the perms to the events."""
-        for event in DeviceEventDomain.get_in('_id', events_id):
-            _perms = union_by(event['perms'], perms, iteratee=lambda x: x['account'])
-            DeviceEventDomain.update_one_raw(event['_id'], {'$set': {'perms': _perms}})
+    @classmethod
+    def _inherit_perms(cls, resource_id: str, new_modified_perms: Perms, accounts_to_remove: List[ObjectId]):
+        """
+        Sets or re-sets the new or modified permissions and removes the permissions of the passed-in
+        accounts from all the descendants of the group and, for devices, from their events.
+
+        Descendants are updated with two *update_many* per collection (a *$pull* and a *$push*) and events
+        are computed in memory from a few bulk reads and then written in one *bulk_write*.
+        """
+        encode = current_app.mongo_encoder.encode_to_mongo
+        q = cls.descendants_query(resource_id)
+        for domain, resource_names in cls._children_collections():
+            if not set(resource_names) & Device.resource_names:
+                # Remove accounts that lost permission from sharedWith
+                shared = domain.get({'$and': [q, {'sharedWith': {'$in': accounts_to_remove}}]},
+                                    projection={'@type': True, 'sharedWith': True})
+                for descendant in shared:
+                    cls.remove_shared_with(descendant['@type'], descendant['_id'], set(descendant['sharedWith']),
+                                           set(accounts_to_remove))
+                if shared:
+                    domain.update_many_raw(q, {'$pull': {'sharedWith': {'$in': accounts_to_remove}}})
+            # Remove permissions and the permissions we are going to set, and then set them first,
+            # which is the same as union_by(new_modified_perms, perms) for every descendant
+            requests = []
+            accounts = accounts_to_remove + pluck(new_modified_perms, 'account')
+            if accounts:
+                requests.append(UpdateMany(q, encode({'$pull': {'perms': {'account': {'$in': accounts}}}})))
+            if new_modified_perms:
+                perms = {'$each': new_modified_perms, '$position': 0}
+                requests.append(UpdateMany(q, encode({'$push': {'perms': perms}})))
+            if requests:
+                domain.bulk_write(requests)
+        devices = DeviceDomain.get(q, projection={'perms': True, 'events._id': True})
+        if devices:
+            cls._inherit_perms_in_events(devices, accounts_to_remove)
+
+    @classmethod
+    def _inherit_perms_in_events(cls, devices: List[dict], accounts_to_remove: List[ObjectId]):
+        """
+        Updates the events of the passed-in devices, which have just got their new perms:
+
+        1. Removes the permissions of the accounts from the events, except for the accounts that
+           still have access to other devices of the event or that the event is explicitly shared with.
+           This is what :meth:`_remove_perms_in_event` does for one device.
+        2. Adds the perms of the devices to their events, see :meth:`add_perms_to_events`.
+
+        The ids are queried in batches of :attr:`BULK_SIZE`, so the queries do not surpass the
+        maximum size of a Mongo command.
+        """
+        fields = DeviceEventDomain.DEVICES_ID_COMPONENTS + ('perms', 'sharedWith')
+        projection = {field: True for field in fields}
+        devices_id = set(pluck(devices, '_id'))
+        events = {}
+        if accounts_to_remove:
+            for batch in chunk(list(devices_id), cls.BULK_SIZE):
+                q = {'$or': [{field: {'$in': batch}} for field in DeviceEventDomain.DEVICES_ID_COMPONENTS]}
+                for event in DeviceEventDomain.get(q, projection=projection):
+                    events[event['_id']] = event
+            # Accounts with access to devices of the events that are not descendants keep access to the events
+            others_id = {device_id for event in events.values()
+                         for device_id in DeviceEventDomain.devices_id(event, DeviceEventDomain.DEVICES_ID_COMPONENTS)
+                         if device_id not in devices_id}
+            accounts_per_device = {}
+            for batch in chunk(list(others_id), cls.BULK_SIZE):
+                for device in DeviceDomain.get({'_id': {'$in': batch}}, projection={'perms': True}):
+                    accounts_per_device[device['_id']] = set(pluck(device['perms'], 'account'))
+        events_id = py_(devices).pluck('events').flatten().pluck('_id').value()
+        missing = list({event_id for event_id in events_id if event_id not in events})
+        for batch in chunk(missing, cls.BULK_SIZE):
+            for event in DeviceEventDomain.get({'_id': {'$in': batch}}, projection=projection):
+                events[event['_id']] = event
+
+        original_perms = {_id: event['perms'] for _id, event in events.items()}
+        if accounts_to_remove:
+            for event in events.values():
+                other_accounts = set()
+                for device_id in DeviceEventDomain.devices_id(event, DeviceEventDomain.DEVICES_ID_COMPONENTS):
+                    other_accounts |= accounts_per_device.get(device_id, set())
+                accounts = difference(accounts_to_remove, list(other_accounts), event.get('sharedWith', []))
+                if accounts:
+                    event['perms'] = [perm for perm in event['perms'] if perm['account'] not in accounts]
+        for device in devices:
+            for event_id in pluck(device.get('events', []), '_id'):
+                if event_id in events:
+                    event = events[event_id]
+                    event['perms'] = union_by(event['perms'], device['perms'], iteratee=lambda x: x['account'])
+
+        encode = current_app.mongo_encoder.encode_to_mongo
+        requests = [UpdateOne({'_id': _id}, encode({'$set': {'perms': event['perms']}}))
+                    for _id, event in events.items() if event['perms'] != original_perms[_id]]
+        if requests:
+            DeviceEventDomain.bulk_write(requests, ordered=False)
+
+    @classmethod
+    def add_perms_to_events(cls, events_id: List[str], perms: List[dict]):
+        """
+        Adds the perms to the events, keeping the perm events already have for an account.
+
+        This is the same as ``union_by(event['perms'], perms)`` for every event, performed
+        with one *update_many* per perm and batch of :attr:`BULK_SIZE` events, so the
+        updates do not surpass the maximum size of a Mongo command.
+        """
+        if events_id and perms:
+            encode = current_app.mongo_encoder.encode_to_mongo
+            requests = [UpdateMany({'_id': {'$in': batch}, 'perms.account': {'$ne': perm['account']}},
+                                   encode({'$push': {'perms': perm}}))
+                        for batch in chunk(list(events_id), cls.BULK_SIZE) for perm in perms]
+            DeviceEventDomain.bulk_write(requests)
 
 
 class GroupNotFound(ResourceNotFound):
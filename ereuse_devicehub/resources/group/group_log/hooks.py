@@ -1,3 +1,4 @@
+from flask import g
 from pydash import difference
 from pydash import is_empty
 from pydash import map_values
@@ -11,7 +12,8 @@ from ereuse_devicehub.rest import execute_post_internal
 
 
 def add_group_change_to_log(_, updated: dict, original: dict):
-    if updated.get('@type', None) in Group.types:
+    # Groups moving their children in a job write the log entry when the job finishes
+    if updated.get('@type', None) in Group.types and 'dh_group_move' not in g:
         RESOURCES = GroupDomain.children_resources
         orig = original.get('children', {})
         upd = updated.get('children', {})
@@ -1,7 +1,8 @@
-from flask import current_app
+from flask import current_app, g
 
 from ereuse_devicehub.resources.group.domain import GroupDomain
 from ereuse_devicehub.resources.group.settings import Group
+from ereuse_devicehub.resources.job.group_move.domain import GroupMoveDomain
 from ereuse_utils.naming import Naming
 
 
@@ -14,9 +15,17 @@ def set_children(_, groups: list):
 
 
 def update_children(_, updated: dict, original: dict):
-    """Updates children and permissions when modifying the ``children`` property in the group."""
+    """
+    Updates children and permissions when modifying the ``children`` property in the group.
+
+    If the client asks for it, this is done in the background through a
+    :class:`ereuse_devicehub.resources.job.group_move.settings.GroupMove` job.
+    """
     # todo what happens when I patch *children* and *perms*?
     if updated.get('@type', None) in Group.types and updated.get('children', None) is not None:
+        if GroupMoveDomain.is_requested():
+            g.dh_group_move = GroupMoveDomain.enqueue_move(updated, original)
+            return
         domain = GroupDomain.children_resources[Naming.resource(original['@type'])]
         domain.update_children(original['children'], updated['children'], original['ancestors'], original['_id'],
                                original['perms'])
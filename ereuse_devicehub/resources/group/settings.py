@@ -82,6 +82,15 @@ class Group(Thing):
                'I inherit the following descendants form ancestor._id of type ancestor.@type:'
                'ancestor.places = [p1,p2...], ancestor.lots = [l1, l2...]'
     }
+    ancestorIds = {
+        'type': 'list',
+        'readonly': True,
+        'materialized': True,
+        'teaser': False,
+        'description': 'The typed ids of all the ancestors, like "Lot:abc".',
+        'doc': 'A flattened copy of ancestors, indexed to get descendants with only one $in. '
+               'GroupDomain keeps it updated with ancestors.'
+    }
     events = events_pk_schema.events
     perms = perms
     sharedWith = {
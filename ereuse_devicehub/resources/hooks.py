@@ -1,7 +1,6 @@
 from datetime import datetime, timezone
 
 from bson import ObjectId
-from ereuse_utils.naming import Naming
 from flask import Request, current_app, json
 from pydash import pick
 from requests import Response
@@ -159,12 +158,9 @@ class TypeIsInvalid(SchemaError):
     message = '@type is missing or misspelled.'
 
 
-def _get_is_ancestor(resource_type: str, _id: str):
-    resource_name = Naming.resource(resource_type)
-    return [
-        {'ancestors': {'$elemMatch': {'@type': resource_type, '_id': _id}}},
-        {'ancestors': {'$elemMatch': {resource_name: {'$elemMatch': {'$in': [_id]}}}}}
-    ]
+def _get_is_ancestor(_id: str, *resource_types: str) -> dict:
+    """A query for resources that have the group of any of the passed-in types as ancestor."""
+    return {'ancestorIds': {'$in': [GroupDomain.typed_id(resource_type, _id) for resource_type in resource_types]}}
 
 
 def convert_dh_operators(_, request: Request, __):
@@ -207,19 +203,14 @@ def convert_dh_operators(_, request: Request, __):
                     ]
                 })
         if 'dh$insideLot' in where:
-            lot_id = where.pop('dh$insideLot')
-            _and.append({
-                '$or': _get_is_ancestor(Lot.type_name, lot_id) + [
-                    {'ancestors': {'$elemMatch': {'@type': IncomingLot.type_name, '_id': lot_id}}},
-                    {'ancestors': {'$elemMatch': {'@type': OutgoingLot.type_name, '_id': lot_id}}}
-                ]
-            })
+            lot_types = Lot.type_name, IncomingLot.type_name, OutgoingLot.type_name
+            _and.append(_get_is_ancestor(where.pop('dh$insideLot'), *lot_types))
         if 'dh$insidePackage' in where:
-            _and.append({'$or': _get_is_ancestor(Package.type_name, where.pop('dh$insidePackage'))})
+            _and.append(_get_is_ancestor(where.pop('dh$insidePackage'), Package.type_name))
         if 'dh$insidePallet' in where:
-            _and.append({'$or': _get_is_ancestor(Pallet.type_name, where.pop('dh$insidePallet'))})
+            _and.append(_get_is_ancestor(where.pop('dh$insidePallet'), Pallet.type_name))
         if 'dh$insidePlace' in where:
-            _and.append({'$or': _get_is_ancestor(Place.type_name, where.pop('dh$insidePlace'))})
+            _and.append(_get_is_ancestor(where.pop('dh$insidePlace'), Place.type_name))
         if not where['$and']:  # If we did not add anything, just delete it or mongo will complain
             del where['$and']
         request.args['where'] = json.dumps(where)
@@ -0,0 +1,73 @@
+import copy
+
+from flask import Response, current_app, g, request
+from pymongo.collection import Collection
+
+
+class IdentityMap:
+    """
+    A cache of the resources obtained by their identifier during a request, so we only read a resource
+    once from the database even if several hooks get it.
+
+    :class:`ereuse_devicehub.resources.domain.Domain` consults it in ``get_one`` and ``get_in``, and
+    updates or invalidates it when writing; :class:`ereuse_devicehub.data_layer.DataLayer` invalidates
+    it when python-eve writes. Writes performed directly through pymongo are not tracked.
+
+    Resources are stored by (database, collection, _id) and copied in and out, so changing a
+    returned resource does not change the cached one.
+
+    This is opt-in through the ``IDENTITY_MAP`` setting.
+    """
+
+    def __init__(self):
+        self.resources = {}
+        self.hits = 0
+        self.misses = 0
+        self.request = request._get_current_object()
+
+    @staticmethod
+    def current() -> 'IdentityMap' or None:
+        """Gets the identity map of the actual request, if any."""
+        return g.get('dh_identity_map')
+
+    def get(self, collection: Collection, _id) -> dict or None:
+        """Gets a copy of a resource, or None if it is not in the map, counting the hits and misses."""
+        try:
+            resource = self.resources[collection.full_name, _id]
+        except KeyError:
+            self.misses += 1
+            return None
+        else:
+            self.hits += 1
+            return copy.deepcopy(resource)
+
+    def set(self, collection: Collection, resource: dict):
+        """Stores a copy of the resource, which needs to be full (not projected) and up-to-date."""
+        self.resources[collection.full_name, resource['_id']] = copy.deepcopy(resource)
+
+    def invalidate(self, collection: Collection, ids: list):
+        for _id in ids:
+            self.resources.pop((collection.full_name, _id), None)
+
+    def invalidate_collection(self, collection: Collection):
+        """Invalidates all the resources of a collection, for writes whose affected resources we do not know."""
+        for key in [key for key in self.resources if key[0] == collection.full_name]:
+            del self.resources[key]
+
+
+def start_identity_map():
+    """Starts an identity map for the request if IDENTITY_MAP is set. This is executed in a before_request."""
+    # Internal requests share 'g' with the request that executes them, and so the identity map
+    if current_app.config['IDENTITY_MAP'] and 'dh_identity_map' not in g:
+        g.dh_identity_map = IdentityMap()
+
+
+def report_identity_map(response: Response) -> Response:
+    """Logs the hits and misses of the identity map of the request. This is executed in an after_request."""
+    identity_map = IdentityMap.current()
+    if identity_map is not None and identity_map.request is request._get_current_object():
+        current_app.logger.info('Identity map of {} {}: {} hits, {} misses.'.format(request.method, request.endpoint,
+                                                                                   identity_map.hits,
+                                                                                   identity_map.misses))
+        del g.dh_identity_map
+    return response
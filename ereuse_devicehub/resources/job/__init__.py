@@ -0,0 +1,4 @@
+# Load the schema and resource classes
+from .condition_price import settings
+from .group_move import settings
+from .snapshot_import import settings
@@ -0,0 +1,31 @@
+from flask import current_app, g
+
+from ereuse_devicehub.resources.job.condition_price.settings import ConditionPriceSettings
+from ereuse_devicehub.resources.job.domain import JobDomain
+
+
+class ConditionPriceDomain(JobDomain):
+    resource_settings = ConditionPriceSettings
+
+    @classmethod
+    def dedicated_workers(cls) -> int:
+        return current_app.config['SCORE_WORKERS']
+
+    @classmethod
+    def enqueue_snapshot(cls, snapshot: dict) -> dict:
+        """Queues computing the condition and price of the snapshot, returning the job."""
+        job = {
+            'snapshot': snapshot['_id'],
+            'device': snapshot['device'],
+            'condition': snapshot.get('condition', {}),
+            'total': 1
+        }
+        g.dh_condition_price = job = cls.enqueue(job)
+        return job
+
+    @classmethod
+    def execute(cls, job: dict):
+        """Computes and saves the condition and the price with the score backend of this worker."""
+        from ereuse_devicehub.resources.event.device.snapshot.hooks import compute_condition_price
+        compute_condition_price({'_id': job['snapshot'], 'device': job['device'], 'condition': job['condition']})
+        cls.progress(job['_id'], 1)
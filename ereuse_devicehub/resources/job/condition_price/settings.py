@@ -0,0 +1,30 @@
+from ereuse_devicehub.resources.job.settings import Job, JobSettings
+
+
+class ConditionPrice(Job):
+    """
+    Computes the condition (score) and the price of the device of a snapshot in the background,
+    saving them in the snapshot and materializing them in the device.
+
+    Snapshots queue this job when there are score workers (see ``SCORE_WORKERS``), returning it
+    in the *_job* field of their response; clients poll it to know when the condition and price are ready.
+    """
+    snapshot = {
+        'type': 'objectid',
+        'readonly': True,
+        'description': 'The snapshot that gets the condition and the price.'
+    }
+    device = {
+        'type': 'string',
+        'readonly': True,
+        'description': 'The device of the snapshot.'
+    }
+    condition = {
+        'type': 'dict',
+        'readonly': True,
+        'description': 'The condition the user set in the snapshot, which the score needs.'
+    }
+
+
+class ConditionPriceSettings(JobSettings):
+    _schema = ConditionPrice
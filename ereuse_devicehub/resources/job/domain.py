@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+from typing import Type
+
+from bson import ObjectId
+from flask import current_app
+from pymongo import ASCENDING, ReturnDocument
+
+from ereuse_devicehub.resources.domain import Domain, ResourceNotFound
+from ereuse_devicehub.resources.job.settings import ACTIVE, DONE, FAILED, JobSettings, QUEUED, RUNNING
+from ereuse_devicehub.rest import execute_post_internal
+from ereuse_devicehub.utils import get_last_exception_info
+
+CLAIM_PAGE = 100
+"""How many jobs a worker looks at when claiming one."""
+
+
+class JobDomain(Domain):
+    """
+    Manages the queue of jobs of a database.
+
+    Each type of job extends this domain, implementing :meth:`execute`.
+    """
+    resource_settings = JobSettings
+
+    @classmethod
+    def enqueue(cls, job: dict) -> dict:
+        """Queues a job with the credentials of the actual account, returning it."""
+        job.setdefault('@type', cls.resource_settings._schema.type_name)
+        return execute_post_internal(cls.resource_settings._schema.resource_name, job, skip_validation=True)
+
+    @classmethod
+    def claim(cls) -> dict or None:
+        """
+        Sets the oldest job that can be executed as running, returning it, or None if there are none.
+
+        A job can be executed when it is queued or when it is running but its lease expired, because
+        its worker died (see :func:`ereuse_devicehub.resources.job.worker.heartbeat`). Jobs whose workers
+        died more than JOB_MAX_ATTEMPTS times fail. Jobs that :meth:`conflicts` with an older running job
+        wait queued.
+
+        This is atomic, so different workers can safely claim jobs at the same time. Claiming from this
+        domain (any type of job) skips the types of job that have their own workers.
+        """
+        now = datetime.utcnow()
+        q = stale_or_queued(now)
+        if cls.resource_settings._schema.type_name != JobSettings._schema.type_name:
+            q['@type'] = cls.resource_settings._schema.type_name
+        else:
+            dedicated = [d.resource_settings._schema.type_name for d in cls.__subclasses__() if d.dedicated_workers()]
+            if dedicated:
+                q['@type'] = {'$nin': dedicated}
+        operation = {'$set': {'status': RUNNING, 'started': now, 'heartbeat': now, '_updated': now},
+                     '$inc': {'attempts': 1}}
+        for candidate in cls.collection.find(q, {'_id': True}, sort=[('_created', ASCENDING)], limit=CLAIM_PAGE):
+            job = cls.collection.find_one_and_update(dict(q, _id=candidate['_id']), operation,
+                                                     return_document=ReturnDocument.AFTER)
+            if job is None:
+                continue  # Another worker claimed it before us
+            if job['attempts'] > current_app.config['JOB_MAX_ATTEMPTS']:
+                error = {'@type': 'WorkerDied', 'message': 'The workers executing the job died.'}
+                cls.finish(job['_id'], FAILED, {'$push': {'errors': error}})
+            elif cls.domain_for(job['@type']).conflicts(job):
+                # We claim before checking, so of two conflicting jobs claimed at once the newest waits
+                cls.collection.update_one({'_id': job['_id']}, {'$set': {'status': QUEUED}, '$inc': {'attempts': -1}})
+            else:
+                return job
+        return None
+
+    @classmethod
+    def conflicts(cls, job: dict) -> bool:
+        """
+        Whether the claimed job cannot be executed now because an older running job works on the
+        same resources. Override it for types of job that cannot run at the same time.
+        """
+        return False
+
+    @classmethod
+    def dedicated_workers(cls) -> int:
+        """
+        The number of worker processes that only execute the jobs of this domain, which the rest
+        of workers do not execute. Override it for jobs that need a prepared worker.
+        """
+        return 0
+
+    @classmethod
+    def run(cls, job: dict):
+        """Executes a claimed job with its domain, recording the result."""
+        domain = cls.domain_for(job['@type'])
+        try:
+            domain.execute(job)
+        except Exception as e:
+            current_app.logger.error(get_last_exception_info())
+            error = {'@type': type(e).__name__, 'message': str(e)}
+            cls.finish(job['_id'], FAILED, {'$push': {'errors': error}})
+        else:
+            cls.finish(job['_id'], DONE)
+
+    @classmethod
+    def execute(cls, job: dict):
+        """Does the work of the job. Override it in the domain of each type of job."""
+        raise NotImplementedError()
+
+    @classmethod
+    def progress(cls, job_id: ObjectId, processed: int):
+        """Adds *processed* resources to the count of the job."""
+        cls.update_one_raw(job_id, {'$inc': {'processed': processed}, '$set': {'_updated': datetime.utcnow()}})
+
+    @classmethod
+    def finish(cls, job_id: ObjectId, status: str, operation: dict = None):
+        operation = operation or {}
+        now = datetime.utcnow()
+        operation.setdefault('$set', {}).update({'status': status, 'finished': now, '_updated': now})
+        cls.update_one_raw(job_id, operation)
+
+    @classmethod
+    def get_active(cls) -> list:
+        """Gets the jobs that are queued or running."""
+        q = {'status': {'$in': ACTIVE}}
+        if cls.resource_settings._schema.type_name != JobSettings._schema.type_name:
+            q['@type'] = cls.resource_settings._schema.type_name
+        return cls.get(q)
+
+    @classmethod
+    def domain_for(cls, type_name: str) -> Type['JobDomain']:
+        """Gets the domain that executes the jobs of the passed-in type."""
+        for subclass in cls.__subclasses__():
+            if subclass.resource_settings._schema.type_name == type_name:
+                return subclass
+        raise JobNotFound('There is no job of type {}'.format(type_name))
+
+
+def stale_or_queued(now: datetime) -> dict:
+    """The query of the jobs, or snapshot import items, that are queued or whose worker died."""
+    lease = now - timedelta(seconds=current_app.config['JOB_LEASE'])
+    return {'$or': [{'status': QUEUED}, {'status': RUNNING, 'heartbeat': {'$lt': lease}}]}
+
+
+class JobNotFound(ResourceNotFound):
+    pass
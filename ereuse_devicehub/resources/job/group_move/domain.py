@@ -0,0 +1,155 @@
+from typing import List
+
+from flask import current_app, g, request
+from pydash import pick
+
+from ereuse_devicehub.resources.group.domain import GroupDomain
+from ereuse_devicehub.resources.job.domain import JobDomain
+from ereuse_devicehub.resources.job.settings import ACTIVE, RUNNING
+from ereuse_devicehub.resources.job.group_move.settings import GroupMoveSettings
+from ereuse_utils.naming import Naming
+
+
+class GroupMoveDomain(JobDomain):
+    resource_settings = GroupMoveSettings
+
+    @staticmethod
+    def is_requested() -> bool:
+        """
+        Has the client asked to move the children of the group asynchronously?
+
+        Clients ask for it with the header ``Prefer: respond-async`` and it only happens when there are job workers.
+        """
+        return bool(current_app.config['JOB_WORKERS']) and 'respond-async' in request.headers.get('Prefer', '')
+
+    @classmethod
+    def enqueue_move(cls, updated: dict, original: dict) -> dict:
+        """
+        Queues moving the children of a group that has been updated from *original* to *updated*.
+
+        The group is already saved with its new children, so the descendants are the only ones left to update.
+        """
+        children = original.get('children', {})
+        new_children = updated.get('children', {})
+        affected = set()
+        for resource_name in GroupDomain.children_resources:
+            affected |= set(children.get(resource_name, [])) ^ set(new_children.get(resource_name, []))
+        job = {
+            'group': pick(original, '@type', '_id'),
+            'original': children,
+            'updated': new_children,
+            'ancestors': original.get('ancestors', []),
+            'perms': original.get('perms', []),
+            'affected': list(affected)
+        }
+        g.pop('dh_group_move_migrating', None)
+        return cls.enqueue(job)
+
+    @classmethod
+    def execute(cls, job: dict):
+        """
+        Updates the descendants of the moved children and writes the group log entry,
+        reporting the progress in the job.
+        """
+        from ereuse_devicehub.resources.group.group_log.hooks import add_group_change_to_log
+        domain = GroupDomain.children_resources[Naming.resource(job['group']['@type'])]
+        cls.update_one_raw(job['_id'], {'$set': {'total': cls.count_affected(job)}})
+        g.dh_job_progress = lambda processed: cls.progress(job['_id'], processed)
+        try:
+            domain.update_children(job['original'], job['updated'], job['ancestors'], job['group']['_id'],
+                                   job['perms'])
+        finally:
+            del g.dh_job_progress
+        add_group_change_to_log(None, dict(job['group'], children=job['updated']),
+                                dict(job['group'], children=job['original']))
+
+    @classmethod
+    def conflicts(cls, job: dict) -> bool:
+        """
+        Whether an older running move updates the same subtree: when any of the groups and children
+        one job moves is moved by, or is an ancestor of, the other. Otherwise both could write
+        different *ancestors* and *perms* to the same descendants.
+        """
+        older = {'@type': job['@type'], 'status': RUNNING, '_id': {'$ne': job['_id']},
+                 '_created': {'$lte': job['_created']}}
+        scope, ancestors = _scope(job)
+        for other in cls.collection.find(older, {'_created': True, 'group': True, 'affected': True,
+                                                 'ancestors': True}):
+            if (other['_created'], other['_id']) > (job['_created'], job['_id']):
+                continue  # We are the older one; the other job yields
+            other_scope, other_ancestors = _scope(other)
+            if scope & (other_scope | other_ancestors) or other_scope & ancestors:
+                return True
+        return False
+
+    @staticmethod
+    def count_affected(job: dict) -> int:
+        """Estimates the number of resources the job is going to update: the moved children and their descendants."""
+        total = 0
+        for resource_name, domain in GroupDomain.children_resources.items():
+            ids = list(set(job['original'].get(resource_name, [])) ^ set(job['updated'].get(resource_name, [])))
+            if ids:
+                total += len(ids)
+                if issubclass(domain, GroupDomain):
+                    total += domain.count_descendants(ids)
+                elif resource_name != 'components':
+                    total += domain.count({'parent': {'$in': ids}})  # Components of the devices
+        return total
+
+    @classmethod
+    def migrating(cls, ids: set) -> dict:
+        """
+        The ids, from *ids*, of the groups and children that active jobs are moving, with the id of their job.
+
+        What is found is cached for the rest of the request, so only the ids not looked up yet are queried;
+        :meth:`enqueue_move` clears it.
+        """
+        cache = g.setdefault('dh_group_move_migrating', {}).setdefault(cls.collection.database.name, {})
+        unknown = list(ids - cache.keys())
+        if unknown:
+            cache.update(dict.fromkeys(unknown))
+            q = {
+                '@type': cls.resource_settings._schema.type_name,
+                'status': {'$in': ACTIVE},
+                '$or': [{'affected': {'$in': unknown}}, {'group._id': {'$in': unknown}}]
+            }
+            for job in cls.collection.find(q, {'affected': True, 'group._id': True}):
+                for _id in job['affected'] + [job['group']['_id']]:
+                    if _id in cache and cache[_id] is None:
+                        cache[_id] = job['_id']
+        return {_id: cache[_id] for _id in ids if cache[_id] is not None}
+
+    @classmethod
+    def mark_migrating(cls, resources: List[dict]):
+        """
+        Sets the *_migrating* field with the id of the job to the resources whose ancestors
+        are being updated by a job, so clients know that their *ancestors* and *perms* are not final.
+
+        Only the jobs that move the resources or their ancestors are looked up.
+        """
+        if not current_app.config['JOB_WORKERS'] or not resources:
+            return
+        related_of = []
+        for resource in resources:
+            related = [resource['_id'], resource.get('parent')]
+            for ancestor in resource.get('ancestors', []):
+                related.append(ancestor['_id'])
+                related.extend(_id for key in GroupDomain.children_resources if key in ancestor
+                               for _id in ancestor[key])
+            related_of.append([_id for _id in related if _id is not None])
+        ids = cls.migrating({_id for related in related_of for _id in related})
+        if ids:
+            for resource, related in zip(resources, related_of):
+                job_id = next((ids[_id] for _id in related if _id in ids), None)
+                if job_id is not None:
+                    resource['_migrating'] = job_id
+
+def _scope(job: dict) -> tuple:
+    """The ids of the group and children a move job updates, and the ids of the ancestors of the group."""
+    scope = set(job['affected'])
+    scope.add(job['group']['_id'])
+    ancestors = set()
+    for ancestor in job['ancestors']:
+        ancestors.add(ancestor['_id'])
+        ancestors.update(_id for key in GroupDomain.children_resources if key in ancestor for _id in ancestor[key])
+    return scope, ancestors
@@ -0,0 +1,36 @@
+import json
+
+from flask import Response, g
+
+from ereuse_devicehub.resources.device.schema import Device
+from ereuse_devicehub.resources.group.settings import Group
+from ereuse_devicehub.resources.job.group_move.domain import GroupMoveDomain
+from ereuse_devicehub.utils import url_for_resource
+
+
+def return_202_when_moving_children(response: Response):
+    """Answers with the job when the children of the group are moved asynchronously."""
+    # This is executed in an after_request
+    if 'dh_group_move' in g and 200 <= response.status_code < 300:
+        job = g.dh_group_move
+        response.status_code = 202
+        data = json.loads(response.data.decode())
+        data['_job'] = {
+            '@type': job['@type'],
+            '_id': str(job['_id']),
+            'url': url_for_resource('jobs', job['_id'])
+        }
+        response.data = json.dumps(data)
+    return response
+
+
+def mark_migrating_item(resource_name: str, resource: dict):
+    """Sets *_migrating* in a GET device or group if a job is updating its ancestors."""
+    if resource_name in Device.resource_names | Group.resource_names:
+        GroupMoveDomain.mark_migrating([resource])
+
+
+def mark_migrating_items(resource_name: str, response: dict):
+    """The same as :func:`mark_migrating_item` but for GETting lists of resources."""
+    if resource_name in Device.resource_names | Group.resource_names:
+        GroupMoveDomain.mark_migrating(response['_items'])
@@ -0,0 +1,53 @@
+from ereuse_devicehub.resources.job.settings import Job, JobSettings
+
+
+class GroupMove(Job):
+    """
+    Moves children in or out of a group in the background, this is, executing the inheritance of *ancestors*
+    and permissions to the descendants and writing the group log entry.
+
+    Clients request it by PATCHing (or PUTting) the *children* of a group with the header
+    ``Prefer: respond-async``, obtaining a 202 with this job.
+    """
+    group = {
+        'type': 'dict',
+        'schema': {
+            '@type': {
+                'type': 'string'
+            },
+            '_id': {
+                'type': 'string'
+            }
+        },
+        'readonly': True,
+        'description': 'The group whose children are moved.'
+    }
+    original = {
+        'type': 'dict',
+        'readonly': True,
+        'description': 'The children of the group before the update.'
+    }
+    updated = {
+        'type': 'dict',
+        'readonly': True,
+        'description': 'The children of the group after the update.'
+    }
+    ancestors = {
+        'type': 'list',
+        'readonly': True,
+        'description': 'The ancestors of the group by the time of the update.'
+    }
+    perms = {
+        'type': 'list',
+        'readonly': True,
+        'description': 'The perms of the group by the time of the update.'
+    }
+    affected = {
+        'type': 'list',
+        'readonly': True,
+        'description': 'The ids of the children that are added or removed. Their descendants are affected too.'
+    }
+
+
+class GroupMoveSettings(JobSettings):
+    _schema = GroupMove
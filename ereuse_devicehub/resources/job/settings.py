@@ -0,0 +1,82 @@
+from ereuse_devicehub.resources.resource import ResourceSettings
+from ereuse_devicehub.resources.schema import Thing
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+ACTIVE = QUEUED, RUNNING
+
+
+class Job(Thing):
+    """
+    A task that DeviceHub executes in the background, outside of the request that created it.
+
+    Jobs are created by DeviceHub (not by users) and executed by the job workers
+    (see :class:`ereuse_devicehub.resources.job.worker.JobWorkers`). Clients poll the job to know
+    how is the task going.
+    """
+    status = {
+        'type': 'string',
+        'allowed': {QUEUED, RUNNING, DONE, FAILED},
+        'default': QUEUED,
+        'readonly': True,
+        'description': 'Whether the job is waiting for a worker, it is being executed or it has finished.'
+    }
+    total = {
+        'type': 'integer',
+        'default': 0,
+        'readonly': True,
+        'description': 'An estimation of the number of resources the job processes.'
+    }
+    processed = {
+        'type': 'integer',
+        'default': 0,
+        'readonly': True,
+        'description': 'The number of resources the job has processed so far.'
+    }
+    errors = {
+        'type': 'list',
+        'default': [],
+        'readonly': True,
+        'description': 'The errors that made the job fail.'
+    }
+    byUser = {
+        'type': 'objectid',
+        'data_relation': {
+            'resource': 'accounts',
+            'field': '_id',
+            'embeddable': True
+        },
+        'readonly': True,
+        'description': 'The job is executed with the credentials of this account.'
+    }
+    started = {
+        'type': 'datetime',
+        'readonly': True
+    }
+    finished = {
+        'type': 'datetime',
+        'readonly': True
+    }
+    heartbeat = {
+        'type': 'datetime',
+        'readonly': True,
+        'description': 'The last time the worker executing the job renewed its lease.'
+    }
+    attempts = {
+        'type': 'integer',
+        'readonly': True,
+        'description': 'How many times a worker has claimed the job, which is more than one when workers die.'
+    }
+
+
+class JobSettings(ResourceSettings):
+    resource_methods = ['GET']
+    item_methods = ['GET']
+    _schema = Job
+    datasource = {
+        'source': 'jobs',
+        'default_sort': [('_created', -1)]
+    }
+    cache_control = 'max-age=1, must-revalidate'
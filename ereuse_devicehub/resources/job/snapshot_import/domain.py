@@ -0,0 +1,219 @@
+import math
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from flask import current_app
+from pydash import pick
+from pymongo import ASCENDING, ReturnDocument
+
+from ereuse_devicehub.exceptions import InnerRequestError
+from ereuse_devicehub.resources.account.domain import AccountDomain
+from ereuse_devicehub.resources.device.domain import DeviceDomain
+from ereuse_devicehub.resources.domain import Domain
+from ereuse_devicehub.resources.job.domain import CLAIM_PAGE, JobDomain, stale_or_queued
+from ereuse_devicehub.resources.job.settings import ACTIVE, DONE, FAILED, QUEUED, RUNNING
+from ereuse_devicehub.resources.job.snapshot_import.settings import SnapshotImportItemSettings, \
+    SnapshotImportSettings
+from ereuse_devicehub.rest import execute_post
+from ereuse_devicehub.utils import get_last_exception_info
+
+ORDER = [('_created', ASCENDING), ('index', ASCENDING)]
+"""The order items are executed, which is the order they were uploaded."""
+
+
+class SnapshotImportDomain(JobDomain):
+    resource_settings = SnapshotImportSettings
+
+    @classmethod
+    def enqueue_import(cls, entries: List[tuple]) -> dict:
+        """
+        Creates the job and its items from the uploaded snapshots, returning the job.
+
+        :param entries: A list of tuples of the name of the entry in the upload, the snapshot and the
+            error that prevented reading it, if any.
+        """
+        now = datetime.utcnow()
+        job = cls.enqueue({'status': RUNNING, 'started': now, 'total': len(entries)})
+        unreadable = SnapshotImportItemDomain.insert_items(job['_id'], entries)
+        if unreadable:
+            cls.item_finished(job['_id'], unreadable)
+        return cls.get_one(job['_id'])
+
+    @classmethod
+    def item_finished(cls, job_id: ObjectId, processed: int = 1):
+        """Counts finished items, finishing the job when it is the last one."""
+        now = datetime.utcnow()
+        job = cls.update_one_raw_get(job_id, {'$inc': {'processed': processed}, '$set': {'_updated': now}})
+        if job['processed'] >= job['total']:
+            # Only one worker gets to here, as $inc is atomic
+            cls.finish_import(job)
+
+    @classmethod
+    def finish_import(cls, job: dict):
+        """Finishes the job, setting and logging its throughput and the latency of the snapshots."""
+        items = SnapshotImportItemDomain.get({'job': job['_id']}, projection={'status': True, 'seconds': True})
+        seconds = max((datetime.utcnow() - job['started']).total_seconds(), 1e-6)
+        latencies = sorted(item['seconds'] for item in items if 'seconds' in item)
+        failed = sum(1 for item in items if item['status'] == FAILED)
+        stats = {
+            'items': len(items),
+            'done': len(items) - failed,
+            'failed': failed,
+            'seconds': seconds,
+            'throughput': len(items) / seconds,
+            'latency': {
+                'mean': sum(latencies) / len(latencies) if latencies else 0,
+                'p50': _percentile(latencies, 0.5),
+                'p95': _percentile(latencies, 0.95),
+                'max': latencies[-1] if latencies else 0
+            }
+        }
+        cls.finish(job['_id'], DONE, {'$set': {'stats': stats}})
+        current_app.logger.info('Snapshot import {}: {} snapshots ({} failed) in {:.2f}s, {:.2f} snapshots/s, '
+                                'latency p50 {:.2f}s, p95 {:.2f}s, max {:.2f}s'
+                                .format(job['_id'], stats['items'], failed, seconds, stats['throughput'],
+                                        stats['latency']['p50'], stats['latency']['p95'], stats['latency']['max']))
+
+
+class SnapshotImportItemDomain(Domain):
+    resource_settings = SnapshotImportItemSettings
+
+    @classmethod
+    def insert_items(cls, job_id: ObjectId, entries: List[tuple]) -> int:
+        """
+        Queues the snapshots of the job, chaining the ones that share the device or a component between
+        them and with the snapshots of other imports that are still active.
+
+        Entries that are not snapshots are saved as failed.
+
+        :return: The number of entries that are not snapshots.
+        """
+        now = datetime.utcnow()
+        account = AccountDomain.actual
+        items, unreadable = [], 0
+        for index, (name, snapshot, error) in enumerate(entries):
+            item = {
+                '_id': ObjectId(),
+                '@type': cls.resource_settings._schema.type_name,
+                '_created': now,
+                '_updated': now,
+                'job': job_id,
+                'index': index,
+                'name': name,
+                'byUser': account['_id'],
+                'errors': []
+            }
+            if error is None:
+                item.update({'status': QUEUED, 'snapshot': snapshot, 'keys': _keys(snapshot)})
+            else:
+                item.update({'status': FAILED, 'finished': now, 'errors': [error]})
+                unreadable += 1
+            items.append(item)
+        keys = {key for item in items for key in item.get('keys', [])}
+        last = {}
+        if keys:
+            previous = cls.get({'keys': {'$in': list(keys)}, 'status': {'$in': ACTIVE}},
+                               projection={'keys': True, '_created': True, 'index': True})
+            for item in sorted(previous, key=lambda i: (i['_created'], i['index'])):
+                last.update((key, item['_id']) for key in item['keys'])
+        for item in items:
+            after = {last[key] for key in item.get('keys', []) if key in last}
+            if after:
+                item['after'] = sorted(after)
+            last.update((key, item['_id']) for key in item.get('keys', []))
+        cls.collection.insert_many(items)
+        return unreadable
+
+    @classmethod
+    def claim(cls, limit: int) -> dict or None:
+        """
+        Sets the oldest queued item that can be executed as running, returning it, or None if there are
+        no items to execute.
+
+        An item can be executed when the previous items of its device and components have finished and when
+        there are less than *limit* items running in the database. Items whose worker died are executed again,
+        as in :meth:`JobDomain.claim`. Items finish only once, so workers can safely claim items at the same
+        time; however the limit is checked before claiming, so concurrent claims can surpass it for a moment.
+        """
+        now = datetime.utcnow()
+        alive = {'$gte': now - timedelta(seconds=current_app.config['JOB_LEASE'])}
+        if cls.count({'status': RUNNING, 'heartbeat': alive}) >= limit:
+            return None
+        page = list(cls.collection.find(stale_or_queued(now), {'after': True}, sort=ORDER, limit=CLAIM_PAGE))
+        afters = [_id for item in page for _id in item.get('after', [])]
+        finished = set()
+        if afters:
+            finished_afters = {'_id': {'$in': afters}, 'status': {'$in': [DONE, FAILED]}}
+            finished = set(cls.collection.distinct('_id', finished_afters))
+        operation = {'$set': {'status': RUNNING, 'started': now, 'heartbeat': now, '_updated': now},
+                     '$inc': {'attempts': 1}}
+        for item in page:
+            if finished.issuperset(item.get('after', [])):
+                item = cls.collection.find_one_and_update(dict(stale_or_queued(now), _id=item['_id']), operation,
+                                                          return_document=ReturnDocument.AFTER)
+                if item is None:
+                    continue  # Another worker claimed it before us
+                if item['attempts'] > current_app.config['JOB_MAX_ATTEMPTS']:
+                    error = {'@type': 'WorkerDied', 'message': 'The workers executing the snapshot died.'}
+                    cls.finish(item, FAILED, {'$push': {'errors': error}})
+                    SnapshotImportDomain.item_finished(item['job'])
+                else:
+                    return item
+        return None
+
+    @classmethod
+    def run(cls, item: dict):
+        """
+        POSTs the snapshot of a claimed item as a regular request, with the credentials of the
+        actual account, recording the result.
+        """
+        from ereuse_devicehub.resources.event.device.snapshot.settings import Snapshot
+        snapshot_url = current_app.config['DOMAIN'][Snapshot.resource_name]['url']
+        url = '/{}/{}'.format(AccountDomain.requested_database, snapshot_url)
+        try:
+            snapshot = execute_post(url, item['snapshot'], [('Authorization', AccountDomain.auth_header)])
+        except InnerRequestError as e:
+            cls.finish(item, FAILED, {'$push': {'errors': e.info}})
+        except Exception as e:
+            current_app.logger.error(get_last_exception_info())
+            cls.finish(item, FAILED, {'$push': {'errors': {'@type': type(e).__name__, 'message': str(e)}}})
+        else:
+            result = pick(snapshot, '_id', '@type', 'device', 'components', 'events')
+            cls.finish(item, DONE, {'$set': {'result': result}, '$unset': {'snapshot': ''}})
+        SnapshotImportDomain.item_finished(item['job'])
+
+    @classmethod
+    def finish(cls, item: dict, status: str, operation: dict):
+        now = datetime.utcnow()
+        seconds = (now - item['started']).total_seconds()
+        operation.setdefault('$set', {}).update({'status': status, 'finished': now, '_updated': now,
+                                                 'seconds': seconds})
+        cls.update_one_raw(item['_id'], operation)
+
+
+def _keys(snapshot: dict) -> List[str]:
+    """The identifiers of the device and components of the snapshot: their _id or HID, if any."""
+    devices = [snapshot.get('device')]
+    if isinstance(snapshot.get('components'), list):
+        devices += snapshot['components']
+    return [key for key in map(_key, devices) if key is not None]
+
+
+def _key(device: dict) -> str or None:
+    """The identifier of a device or component: the _id or the HID, if any."""
+    if not isinstance(device, dict):
+        return None
+    if '_id' in device:
+        return str(device['_id'])
+    try:
+        return DeviceDomain.hid(device['manufacturer'], device['serialNumber'], device['model'])
+    except (KeyError, TypeError, AttributeError):
+        return None
+
+
+def _percentile(values: list, percentile: float) -> float:
+    """The nearest-rank percentile of the sorted values."""
+    if not values:
+        return 0
+    return values[max(math.ceil(percentile * len(values)) - 1, 0)]
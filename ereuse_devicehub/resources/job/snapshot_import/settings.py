@@ -0,0 +1,127 @@
+from ereuse_devicehub.resources.job.settings import DONE, FAILED, Job, JobSettings, QUEUED, RUNNING
+from ereuse_devicehub.resources.resource import ResourceSettings
+from ereuse_devicehub.resources.schema import Thing
+
+
+class SnapshotImport(Job):
+    """
+    Executes in the background many snapshots uploaded at once, like the ones Workbench stations
+    collect in a campaign.
+
+    Clients upload the snapshots to ``/<db>/events/devices_snapshot/import``, obtaining a 202 with this job,
+    and the job workers POST each snapshot as an :class:`SnapshotImportItem`. The job is *running* from
+    the beginning and finishes, setting *stats*, when all its items have finished.
+    """
+    stats = {
+        'type': 'dict',
+        'schema': {
+            'items': {
+                'type': 'integer'
+            },
+            'done': {
+                'type': 'integer'
+            },
+            'failed': {
+                'type': 'integer'
+            },
+            'seconds': {
+                'type': 'float'
+            },
+            'throughput': {
+                'type': 'float'
+            },
+            'latency': {
+                'type': 'dict'
+            }
+        },
+        'readonly': True,
+        'description': 'The number of snapshots, the ones that failed, the total seconds, the snapshots per second '
+                       'and the mean, median, 95th percentile and max seconds of each snapshot.'
+    }
+
+
+class SnapshotImportSettings(JobSettings):
+    _schema = SnapshotImport
+
+
+class SnapshotImportItem(Thing):
+    """
+    A snapshot of an :class:`SnapshotImport` and its result.
+
+    Snapshots of the same device or that share a component (same *_id* or HID) are executed in the
+    order they were uploaded, even between different imports.
+    """
+    job = {
+        'type': 'objectid',
+        'data_relation': {
+            'resource': 'jobs',
+            'field': '_id',
+            'embeddable': True
+        },
+        'readonly': True
+    }
+    index = {
+        'type': 'integer',
+        'readonly': True,
+        'description': 'The position of the snapshot in the upload.'
+    }
+    name = {
+        'type': 'string',
+        'readonly': True,
+        'description': 'The name of the file in the zip, or the line in the NDJSON.'
+    }
+    status = {
+        'type': 'string',
+        'allowed': {QUEUED, RUNNING, DONE, FAILED},
+        'readonly': True
+    }
+    keys = {
+        'type': 'list',
+        'readonly': True,
+        'description': 'The _id or HID of the device and components of the snapshot, if any.'
+    }
+    after = {
+        'type': 'list',
+        'readonly': True,
+        'description': 'The previous items that share a key, which have to finish before executing this one.'
+    }
+    snapshot = {
+        'type': 'dict',
+        'readonly': True,
+        'writeonly': True,
+        'description': 'The uploaded snapshot, which we remove once it is done.'
+    }
+    result = {
+        'type': 'dict',
+        'readonly': True,
+        'description': 'The _id, device, components and events of the snapshot, once it is done.'
+    }
+    errors = {
+        'type': 'list',
+        'default': [],
+        'readonly': True,
+        'description': 'The errors that made the snapshot fail.'
+    }
+    byUser = Job.byUser
+    started = Job.started
+    finished = Job.finished
+    heartbeat = Job.heartbeat
+    attempts = Job.attempts
+    seconds = {
+        'type': 'float',
+        'readonly': True,
+        'description': 'The seconds it took to execute the snapshot.'
+    }
+
+
+class SnapshotImportItemSettings(ResourceSettings):
+    resource_methods = ['GET']
+    item_methods = ['GET']
+    _schema = SnapshotImportItem
+    url = 'jobs/snapshot-import/items'
+    datasource = {
+        'source': 'snapshot-import-items',
+        'default_sort': [('_created', 1), ('index', 1)],
+        'projection': {'snapshot': 0}
+    }
+    cache_control = 'max-age=1, must-revalidate'
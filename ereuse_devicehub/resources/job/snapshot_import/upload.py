@@ -0,0 +1,84 @@
+import io
+import zipfile
+from typing import List
+
+from eve.auth import requires_auth
+from flask import Response, abort, current_app, json, jsonify, request
+
+from ereuse_devicehub.exceptions import StandardError
+from ereuse_devicehub.resources.event.device.snapshot.settings import Snapshot
+from ereuse_devicehub.resources.job.snapshot_import.domain import SnapshotImportDomain
+from ereuse_devicehub.utils import url_for_resource
+
+NDJSON = 'application/x-ndjson', 'application/jsonlines'
+ZIP = 'application/zip', 'application/x-zip-compressed'
+
+
+@requires_auth('resource')
+def import_snapshots(db, resource) -> Response:
+    """
+    Endpoint to upload many snapshots at once, executing them in the background. It expects a POST
+    with NDJSON (one snapshot per line) or a zip of JSON files (one snapshot per file).
+
+    :return: A 202 with the :class:`ereuse_devicehub.resources.job.snapshot_import.settings.SnapshotImport`
+        job. GET ``jobs/snapshot-import/items?where={"job": "<job _id>"}`` to obtain the result of each snapshot.
+    """
+    if resource != Snapshot.resource_name:
+        abort(404)
+    if not current_app.config['JOB_WORKERS']:
+        raise NoJobWorkers('Importing snapshots needs job workers; set JOB_WORKERS.')
+    if request.mimetype in NDJSON:
+        entries = _read_ndjson(request.get_data())
+    elif request.mimetype in ZIP:
+        entries = _read_zip(request.get_data())
+    else:
+        raise UnsupportedUpload('Upload NDJSON ({}) or a zip ({}) of snapshots.'.format(', '.join(NDJSON),
+                                                                                         ', '.join(ZIP)))
+    if not entries:
+        raise UnreadableUpload('There are no snapshots in the upload.')
+    job = SnapshotImportDomain.enqueue_import(entries)
+    job['url'] = url_for_resource('jobs', job['_id'])
+    response = jsonify(job)
+    response.status_code = 202
+    return response
+
+
+def _read_ndjson(data: bytes) -> List[tuple]:
+    entries = []
+    for number, line in enumerate(data.splitlines(), start=1):
+        if line.strip():
+            entries.append(_read_json('line {}'.format(number), line))
+    return entries
+
+
+def _read_zip(data: bytes) -> List[tuple]:
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile as e:
+        raise UnreadableUpload('The zip is not valid: {}'.format(e))
+    with archive:
+        return [_read_json(info.filename, archive.read(info)) for info in archive.infolist()
+                if info.filename.lower().endswith('.json')]
+
+
+def _read_json(name: str, data: bytes) -> tuple:
+    """Returns the name of the entry, the snapshot and, if the entry is not a JSON object, the error."""
+    try:
+        snapshot = json.loads(data.decode())
+    except ValueError as e:
+        return name, None, {'@type': 'UnreadableSnapshot', 'message': str(e)}
+    if not isinstance(snapshot, dict):
+        return name, None, {'@type': 'UnreadableSnapshot', 'message': 'The snapshot is not a JSON object.'}
+    return name, snapshot, None
+
+
+class UnreadableUpload(StandardError):
+    status_code = 400
+
+
+class UnsupportedUpload(UnreadableUpload):
+    status_code = 415
+
+
+class NoJobWorkers(StandardError):
+    status_code = 501
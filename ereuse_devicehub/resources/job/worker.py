@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from multiprocessing import Process
+
+from pymongo.collection import Collection
+from pymongo.errors import PyMongoError
+
+from ereuse_devicehub.resources.account.domain import AccountDomain
+from ereuse_devicehub.resources.job.domain import JobDomain
+from ereuse_devicehub.resources.job.settings import RUNNING
+from ereuse_devicehub.resources.job.snapshot_import.domain import SnapshotImportItemDomain
+from ereuse_devicehub.utils import get_last_exception_info
+
+
+class JobWorkers:
+    """
+    Executes the jobs of all databases in a pool of long-running daemon processes.
+
+    Jobs are stored in the database, so they survive restarts, and workers poll them; see
+    :meth:`JobDomain.claim`. This is similar to
+    :class:`ereuse_devicehub.resources.submitter.submitter_caller.SubmitterCaller`.
+
+    Workers that die are started again in :meth:`prepare_processes`, and the jobs they were
+    executing are claimed again when their lease expires, as workers keep renewing it while
+    they execute a job (see :func:`heartbeat`).
+    """
+
+    def __init__(self, app: 'DeviceHub', processes: int, poll_interval: float, domain=JobDomain):
+        """
+        :param processes: The number of worker processes.
+        :param poll_interval: Seconds a worker waits before polling again when there are no jobs.
+        :param domain: Only execute jobs of this domain. Processes are forked from *app*, so each
+            one has its own copy of what the app has loaded; the R session of the score only with
+            WARM_UP, otherwise each process loads its own on first use.
+        """
+        self.app = app
+        self.poll_interval = poll_interval
+        self.domain = domain
+        self.processes = [None] * processes
+        self.pid = os.getpid()
+        self.prepare_processes()
+
+    def prepare_processes(self):
+        """Ensures that the processes are up and ready, starting the ones that died."""
+        if os.getpid() != self.pid:
+            return  # Only the process that created the workers can check them (the workers have a copy)
+        for i, process in enumerate(self.processes):
+            if not process or not process.is_alive():
+                # noinspection PyArgumentList
+                self.processes[i] = Process(target=_process, args=(self.app, self.poll_interval, self.domain),
+                                            daemon=True)
+                self.processes[i].start()
+
+    def __del__(self):
+        if os.getpid() == self.pid:
+            for process in self.processes:
+                if process:
+                    process.terminate()
+
+
+def execute_next_job(app: 'DeviceHub', domain=JobDomain) -> bool:
+    """
+    Claims and executes the oldest queued job of the first database that has one or, if there are no
+    jobs, a snapshot of an import (see :meth:`SnapshotImportItemDomain.claim`).
+
+    The job is executed in the database it belongs to and with the credentials of the account that
+    created it.
+
+    :param domain: Only execute jobs of this domain.
+    :return: Whether there was a job to execute.
+    """
+    with app.app_context():
+        for database in app.config['DATABASES']:
+            with app.auth.database(database):
+                job = domain.claim()
+                item = None
+                if not job and domain is JobDomain:
+                    item = SnapshotImportItemDomain.claim(app.config['SNAPSHOT_IMPORT_PARALLELISM'])
+                if job or item:
+                    token = AccountDomain.get_one((job or item)['byUser'])['token']
+            if job or item:
+                headers = [('Authorization', 'Basic ' + AccountDomain.hash_token(token).decode())]
+                with app.auth.database(database, headers):
+                    queue = JobDomain if job else SnapshotImportItemDomain
+                    with heartbeat(queue.collection, (job or item)['_id'], app.config['JOB_LEASE'] / 4):
+                        queue.run(job or item)
+                return True
+    return False
+
+
+@contextmanager
+def heartbeat(collection: Collection, _id, interval: float):
+    """
+    Renews the lease of the running job or item with the passed-in id every *interval* seconds, from
+    another thread, while executing the with block. The lease expires when a worker dies and then
+    other workers claim the job or item again.
+    """
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            try:
+                collection.update_one({'_id': _id, 'status': RUNNING}, {'$set': {'heartbeat': datetime.utcnow()}})
+            except PyMongoError:
+                pass  # We try again in the next beat, before the lease expires
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _process(app: 'DeviceHub', poll_interval: float, domain=JobDomain):
+    """A separate process that executes the jobs forever."""
+    while True:
+        try:
+            if not execute_next_job(app, domain):
+                time.sleep(poll_interval)
+        except Exception:
+            # Errors of the jobs are saved in the jobs themselves, so this is about the worker
+            app.logger.error(get_last_exception_info())
+            time.sleep(poll_interval)
@@ -1,3 +1,4 @@
+from flask import current_app
 from pymongo import ASCENDING
 
 from ereuse_devicehub.resources.domain import Domain
@@ -41,3 +42,8 @@ class ManufacturerSettings(ResourceSettings):
 
 class ManufacturerDomain(Domain):
     resource_settings = ManufacturerSettings
+
+
+def load_manufacturers(request, lookup):
+    """Loads the manufacturers on their first GET, see :meth:`DeviceHub.load_manufacturers`."""
+    current_app.load_manufacturers()
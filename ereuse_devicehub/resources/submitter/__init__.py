@@ -6,7 +6,7 @@
     2. An implementation, grd_submitter, which handles submissions to GRD.
 
     The submission process is as follows:
-    - Submitter_caller is instantiated, usually when instantiating DeviceHub, see flaskapp (app.grd_submitter_caller).
+    - Submitter_caller is instantiated on first use, see flaskapp (app.grd_submitter_caller).
     Then:
     1. A hook starts the process by calling 'submit' of a SubmitterCaller instance (app.grd_submitter_caller).
     In grd_submitter, the hook is called after creating an event. The hooks passes the id of the resource.
@@ -4,7 +4,7 @@ from requests import HTTPError
 from werkzeug.urls import url_parse, URL, url_unparse
 
 from ereuse_devicehub.resources.submitter.grd_submitter.old_translator import ResourceTranslator
-from ereuse_devicehub.rest import execute_get, execute_post
+from ereuse_devicehub.rest import execute_post, get_resource
 from ereuse_devicehub.security.request_auth import Auth
 
 
@@ -46,7 +46,9 @@ class Submitter:
         if self.debug:
             self.logger.info('Submitter: OK FAKE POST \n{}\n to url {}'.format(json.dumps(translated_resource), url))
         else:
-            r = requests.post(url, json=translated_resource, auth=self.auth, **kwargs)
+            # Flask's json encodes the ObjectId and datetime of the resources as python-eve
+            headers = dict(kwargs.pop('headers', {}), **{'Content-Type': 'application/json'})
+            r = requests.post(url, data=json.dumps(translated_resource), headers=headers, auth=self.auth, **kwargs)
             try:
                 r.raise_for_status()
             except HTTPError or ConnectionError:
@@ -108,11 +110,10 @@ class ThreadedSubmitter(Submitter):
         :param database: The database or inventory (db1...) to get the resource from.
         :param resource_name: The name of the resource.
         """
-        url = '{}/{}/{}{}'.format(database, resource_name, resource_id,
-                                  '?embedded={}'.format(json.dumps(self.embedded)))
         with self.app.app_context():
-            resource = execute_get(url, self.token)
-        super().submit(resource, database)
+            with self.app.auth.database(database, [('authorization', 'Basic ' + self.token)]):
+                resource = get_resource(resource_name, resource_id, self.embedded)
+            super().submit(resource, database)
 
     def generate_url(self, original_resource, translated_resource) -> str:
         raise NotImplementedError()
@@ -17,8 +17,8 @@ class SubmitterCaller:
     """
     token = None
     """
-        The token of the account submitters use to access DeviceHub. It is shared to avoid
-        performing login many times.
+        The token of the account submitters use to access DeviceHub. The process of the submitter
+        logs in when it starts, so creating a SubmitterCaller does not wait for it.
     """
 
     def __init__(self, app: 'DeviceHub', submitter: ThreadedSubmitter):
@@ -29,8 +29,6 @@ class SubmitterCaller:
         self.queue = Queue()
         self.process = None
         self.app = app
-        if not self.token:  # Maybe it has been already set by another submitter (class attribute)
-            self.token = self.prepare_user(app)
         self.prepare_process()
 
     def submit(self, event_id: str, database: str, resource_name: str, *args):
@@ -79,9 +77,11 @@ def _process(queue: Queue, token: str, app, submitter_class=ThreadedSubmitter):
         A representation of a separate process.
         It's a for_all: It blocks waiting for events to log, and when there is an event, it invokes the submitter.
     :param queue: The queue sent from SubmitterCaller.
-    :param token: The token of the DeviceHub user Submitter is going to use to get data.
+    :param token: The token of the DeviceHub user Submitter is going to use to get data, or None to log in.
     :param submitter_class: The Submitter *class* to instantiate and use.
     """
+    if token is None:
+        token = SubmitterCaller.prepare_user(app)
     submitter = submitter_class(app, token)
     while True:
         try:
@@ -1,6 +1,5 @@
-from collections import Iterator
-
-from pydash import map_values, py_
+from collections import Iterator, OrderedDict
+from typing import Callable
 
 
 class Translator:
@@ -14,21 +13,47 @@ class Translator:
         Sets the translation dictionary.
         :param dictionary: A translation dictionary whose keys represent the final translated keys and its values
         are a transformation function; a function that called passing by the resource produces the final value for
-        the specific field.
+        the specific field. A value can also be a dotted path of the resource, like ``'pricing.total.standard'``,
+        which is compiled to a function with :func:`field`.
         """
-        self._translate_many = py_().map(lambda r: self.translate_one(r)).compact()
-        self.dict = dictionary
+        self.dict = OrderedDict((key, field(value) if isinstance(value, str) else value)
+                                for key, value in dictionary.items())
+        self._fields = tuple(self.dict.items())
 
     def translate(self, resources: Iterator) -> list:
         """
         Translates many resources.
         @:return A list of translated resources.
         """
-        return self._translate_many(resources)
+        return [translated for translated in map(self.translate_one, resources) if translated]
 
     def translate_one(self, resource: dict) -> dict:
         """
         Translates a single resource.
         :return: A translated resource.
         """
-        return map_values(self.dict, lambda key: key(resource))
+        return {key: get(resource) for key, get in self._fields}
+
+
+def field(path: str) -> Callable[[dict], object]:
+    """
+    Returns a function that gets the value of the dotted path in a resource, or None if
+    the path does not exist, like ``pydash.get(resource, path)`` for paths of dicts.
+
+    The path is split once, so getting the value is just looking up its keys.
+    """
+    keys = tuple(path.split('.'))
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda resource: resource.get(key)
+
+    def get(resource: dict):
+        value = resource
+        for key in keys:
+            try:
+                value = value[key]
+            except (KeyError, TypeError, IndexError):
+                return None
+        return value
+
+    return get
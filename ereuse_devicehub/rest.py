@@ -1,5 +1,6 @@
 import copy
 from contextlib import suppress
+from typing import List
 from urllib.parse import urlencode
 
 from eve.methods.delete import deleteitem_internal
@@ -62,6 +63,96 @@ def execute_get(absolute_path_ref: str, token: str or bytes = None, params: dict
         return data
 
 
+def get_resources(resource: str, where: dict = None, embedded: dict = None, projection: dict = None) -> List[dict]:
+    """
+    Gets resources as GET /<db>/<resource>?where=...&embedded=...&projection=... but in-process,
+    without an inner request nor serializing them to JSON, from the database of the actual request.
+
+    As GET, this applies the filter and projection of the datasource of the resource, the permissions
+    of the actual account (see :func:`ereuse_devicehub.security.hooks.check_get_perms_for_list_of_items`)
+    and embeds the *data_relation* fields, although only the ones in the first level. Unlike GET, this
+    does not paginate nor execute the GET hooks, and the resources keep the types they have in the database,
+    like ObjectId and datetime, without the *_links*.
+
+    :param where: A Mongo filter.
+    :param embedded: The fields to embed, like ``{'tests': 1}``, getting each related resource once.
+    :param projection: A Mongo projection, which is limited by the projection of the datasource.
+    """
+    # Security hooks import domains that import this module
+    from ereuse_devicehub.security.hooks import check_get_perms_for_list_of_items
+    lookup = {}
+    check_get_perms_for_list_of_items(None, None, lookup)
+    query = current_app.data.combine_queries(where, lookup) if where and lookup else where or lookup
+    query = current_app.data._mongotize(current_app.mongo_encoder.encode_to_mongo(query), resource)
+    _, query, fields, sort = current_app.data._datasource_ex(resource, query, projection)
+    cursor = current_app.data.find_raw(resource, query, fields or None)
+    if sort:
+        cursor = cursor.sort(sort)
+    resources = list(cursor)
+    _embed(resource, resources, embedded)
+    return resources
+
+
+def get_resource(resource: str, identifier, embedded: dict = None, projection: dict = None) -> dict:
+    """
+    Gets a resource as GET /<db>/<resource>/<identifier> but in-process. See :func:`get_resources`.
+
+    This applies the permissions of the actual account as
+    :func:`ereuse_devicehub.security.hooks.check_get_perms_for_item`.
+
+    :raise ResourceNotFound:
+    :raise InsufficientDatabasePerm:
+    """
+    from ereuse_devicehub.resources.domain import ResourceNotFound
+    from ereuse_devicehub.security.hooks import check_get_perms_for_item
+    id_field = current_app.config['DOMAIN'][resource]['id_field']
+    query = current_app.data._mongotize({id_field: identifier}, resource)
+    _, query, fields, _ = current_app.data._datasource_ex(resource, query, projection)
+    document = current_app.data.find_one_raw(resource, query, fields or None)
+    if document is None:
+        raise ResourceNotFound('The resource with id {} does not exist.'.format(identifier))
+    check_get_perms_for_item(resource, document)
+    _embed(resource, [document], embedded)
+    return document
+
+
+def _embed(resource: str, documents: List[dict], embedded: dict = None):
+    """
+    Replaces the references of the embedded fields of the documents with the referenced resources,
+    getting all the resources of a field with one query. As python-eve, missing references become None.
+    """
+    settings = current_app.config['DOMAIN'][resource]
+    fields = set(settings['embedded_fields'])
+    if embedded:
+        fields = (fields | {f for f, v in embedded.items() if v == 1}) - {f for f, v in embedded.items() if v == 0}
+    for field in fields:
+        definition = settings['schema'].get(field, {})
+        is_list = definition.get('type') == 'list'
+        relation = (definition['schema'] if is_list else definition).get('data_relation', {})
+        if not relation.get('embeddable'):
+            continue
+        references = [document[field] for document in documents if field in document]
+        ids = {_id for reference in references for _id in (reference if is_list else (reference,))}
+        if not ids:
+            continue
+        related_resource = relation['resource']
+        related_id_field = current_app.config['DOMAIN'][related_resource]['id_field']
+        _, query, fields_, _ = current_app.data._datasource_ex(related_resource,
+                                                               {related_id_field: {'$in': list(ids)}})
+        related = {r[related_id_field]: r for r in current_app.data.find_raw(related_resource, query, fields_ or None)}
+        used = set()
+
+        def get(_id):
+            if _id in used:  # Documents do not share the same dict, as they do through GET
+                return copy.deepcopy(related.get(_id))
+            used.add(_id)
+            return related.get(_id)
+
+        for document in documents:
+            if field in document:
+                document[field] = [get(_id) for _id in document[field]] if is_list else get(document[field])
+
+
 def execute_patch(resource: str, payload: dict, identifier, copy_id: bool = True) -> dict:
     """Executes PATCH to the same DeviceHub with a new connection."""
     # todo we shouldn't have to copy the id, as eve thinks you are updating the _id
@@ -0,0 +1,62 @@
+import argparse
+import json
+
+from ereuse_devicehub.resources.device.score_condition import NumpyPrice, NumpyScore
+
+
+def export_score_models(path: str, lib_loc: str = None, name_column: str = 'name',
+                        value_column: str = 'value') -> dict:
+    """
+    Exports the parameters of ``Rdevicescore::models`` and ``Rdeviceprice::config`` to a JSON that
+    :class:`ereuse_devicehub.resources.device.score_condition.NumpyScorePriceBase` reads (``SCORE_MODELS``),
+    so the NumPy backend computes with the same parameters as the installed R packages.
+
+    The parameters are the rows of the tables, with their name in *name_column* and their value in
+    *value_column*.
+
+    :param lib_loc: The directory of the R packages, like ``R_PACKAGES_PATH``.
+    :return: The exported parameters.
+    :raise ValueError: A table does not have the columns or any of the parameters of the NumPy backend.
+    """
+    from rpy2.robjects import r
+    kwargs = {'lib_loc': lib_loc} if lib_loc else {}
+    exported = {'versions': {}}
+    for section, package, table, engine in ('score', 'Rdevicescore', 'models', NumpyScore), \
+                                           ('price', 'Rdeviceprice', 'config', NumpyPrice):
+        r.library(package, **kwargs)
+        exported['versions'][package] = r('as.character(packageVersion("{}"))'.format(package))[0]
+        name = '{}::{}'.format(package, table)
+        exported[section] = _parameters(r(name), name, name_column, value_column)
+        missing = sorted(engine.PARAMETERS - set(exported[section]))
+        if missing:
+            raise ValueError('{} does not have the parameters {}.'.format(name, ', '.join(missing)))
+    with open(path, 'w') as f:
+        json.dump(exported, f, indent=2, sort_keys=True)
+    return exported
+
+
+def _parameters(table, name: str, name_column: str, value_column: str) -> dict:
+    """The parameters of an R data frame, by their name."""
+    from rpy2.robjects import r
+    for column in name_column, value_column:
+        if column not in table.names:
+            raise ValueError('{} does not have the column {}; it has {}.'
+                             .format(name, column, ', '.join(table.names)))
+    # Names can be factors, which rpy2 gives as their integer codes
+    names, values = list(r['as.character'](table.rx2(name_column))), list(table.rx2(value_column))
+    for parameter, value in zip(names, values):
+        if type(value) not in (int, float):
+            raise ValueError('The parameter {} of {} is not a number: {!r}.'.format(parameter, name, value))
+    return dict(zip(names, values))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Exports the parameters of the R packages that compute the score '
+                                                 'and the price, to use them with SCORE_BACKEND = \'numpy\'.',
+                                     epilog='Minimum example: python export_score_models.py score_models.json')
+    parser.add_argument('path', help='The JSON file to write. Set it in SCORE_MODELS.')
+    parser.add_argument('-l', '--lib-loc', help='The directory of the R packages, if it is not the default one.')
+    parser.add_argument('-n', '--name-column', default='name', help='The column of the tables with the names.')
+    parser.add_argument('-v', '--value-column', default='value', help='The column of the tables with the values.')
+    args = parser.parse_args()
+    export_score_models(args.path, args.lib_loc, args.name_column, args.value_column)
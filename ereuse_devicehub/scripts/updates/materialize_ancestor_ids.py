@@ -0,0 +1,22 @@
+from ereuse_devicehub.resources.group.domain import GroupDomain
+from ereuse_devicehub.scripts.updates.update import Update
+
+
+class MaterializeAncestorIds(Update):
+    """
+    Materializes *ancestorIds* from *ancestors* in devices, components and groups.
+
+    Execute it with ``update_indexes=True`` to create the index of *ancestorIds*.
+    """
+
+    def execute(self, database):
+        # noinspection PyProtectedMember
+        for domain, resource_names in GroupDomain._children_collections():
+            print('Materializing ancestorIds of {}'.format(', '.join(resource_names)))
+            resources = []
+            for resource in domain.get({}, False, {'ancestors': True, 'ancestorIds': True}):
+                resources.append(resource)
+                if len(resources) == GroupDomain.BULK_SIZE:
+                    GroupDomain.update_ancestor_ids(domain, resources)
+                    resources = []
+            GroupDomain.update_ancestor_ids(domain, resources)
@@ -0,0 +1,22 @@
+from ereuse_devicehub.resources.device.domain import DeviceDomain
+from ereuse_devicehub.resources.event.device import DeviceEventDomain
+from ereuse_devicehub.scripts.updates.update import Update
+
+
+class MaterializeUnsecuredComponents(Update):
+    """
+    Materializes *unsecuredComponents* in devices from the *unsecured* of their snapshots.
+
+    Execute it with ``update_indexes=True`` to create the index of *_etag*.
+    """
+
+    def execute(self, database):
+        print('Materializing unsecuredComponents of devices')
+        components = {}
+        q = {'@type': DeviceEventDomain.new_type('Snapshot'), 'unsecured': {'$ne': []}}
+        for snapshot in DeviceEventDomain.get(q, False, {'device': True, 'unsecured': True}):
+            ids = components.setdefault(snapshot['device'], set())
+            ids.update(u['_id'] for u in snapshot.get('unsecured', []) if u['_id'] != snapshot['device'])
+        operations = {_id: {'$addToSet': {'unsecuredComponents': {'$each': list(ids)}}}
+                      for _id, ids in components.items() if ids}
+        DeviceDomain.update_each_raw(operations)
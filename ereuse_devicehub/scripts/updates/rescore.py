@@ -0,0 +1,46 @@
+from ereuse_devicehub.resources.device.computer.settings import Computer
+from ereuse_devicehub.resources.device.domain import DeviceDomain
+from ereuse_devicehub.resources.device.score_condition import ScorePriceError
+from ereuse_devicehub.scripts.updates.update import Update
+
+
+class Rescore(Update):
+    """
+    Recomputes the condition and pricing of the computers that have a condition, like after updating
+    the R packages, and materializes them in the devices. Snapshots keep the ones they computed.
+
+    Devices are computed in batches of *batch_size*, each batch in one call to R.
+    Pass *headers* with the Authorization of an account, as getting the components needs it.
+    """
+
+    def __init__(self, app, batch_size: int = 100, **kwargs):
+        self.batch_size = batch_size
+        super().__init__(app, **kwargs)
+
+    def execute(self, database):
+        q = {'@type': Computer.type_name, 'condition': {'$exists': True, '$ne': {}}}
+        ids = [device['_id'] for device in DeviceDomain.get(q, projection={'_id': True})]
+        print('Rescoring {} computers'.format(len(ids)))
+        failed = 0
+        for i in range(0, len(ids), self.batch_size):
+            devices = self.app.score.get_devices(DeviceDomain.get_in('_id', ids[i:i + self.batch_size]))
+            conditions = self.app.score.compute_many(devices)
+            scored = [device for device, condition in zip(devices, conditions)
+                      if not isinstance(condition, ScorePriceError)]
+            pricings = dict(zip((device['_id'] for device in scored), self.app.price.compute_many(scored)))
+            operations = {}
+            for device, condition in zip(devices, conditions):
+                pricing = pricings.get(device['_id'])
+                if isinstance(condition, ScorePriceError) or isinstance(pricing, ScorePriceError):
+                    print(condition if isinstance(condition, ScorePriceError) else pricing)
+                    failed += 1
+                if not isinstance(condition, ScorePriceError):
+                    operation = {'condition': condition}
+                    if not isinstance(pricing, ScorePriceError):
+                        operation['pricing'] = pricing
+                    operations[device['_id']] = {'$set': operation}
+            DeviceDomain.update_each_raw(operations)
+            print('{} of {} computers rescored'.format(min(i + self.batch_size, len(ids)), len(ids)))
+        print('{} computers could not be rescored'.format(failed))
+        print('Score cache hit rate {:.0%}, price cache hit rate {:.0%}'.format(self.app.score.cache_hit_rate,
+                                                                               self.app.price.cache_hit_rate))
@@ -0,0 +1,25 @@
+import argparse
+
+
+def warm_up(app):
+    """
+    Initializes the subsystems DeviceHub otherwise initializes on first use, printing how long each one took.
+
+    Run it once after deploying to load the manufacturers and to check that R, GeoIP and GRD work, before the
+    first request has to.
+    """
+    app.warm_up()
+    for phase, ms in app.startup_times.items():
+        print('{}: {:.2f} ms'.format(phase, ms))
+
+
+if __name__ == '__main__':
+    desc = 'Initializes R, GeoIP, the GRD submitter and the manufacturers of DeviceHub, printing how long each one ' \
+           'took, including the phases of the start-up.'
+    epilog = 'Minimum example: python warm_up.py'
+    parser = argparse.ArgumentParser(description=desc, epilog=epilog)
+    parser.parse_args()
+
+    from ereuse_devicehub import DeviceHub
+
+    warm_up(DeviceHub())
@@ -1,3 +1,4 @@
+import time
 from contextlib import contextmanager, suppress
 
 from ereuse_devicehub.resources.account.role import Role
@@ -5,6 +6,7 @@ from eve.auth import TokenAuth
 from flask import current_app as app
 from werkzeug.exceptions import NotFound
 
+from ereuse_devicehub.resources.account.cache import AuthStats
 from ereuse_devicehub.resources.account.domain import AccountDomain, NotADatabase
 from ereuse_devicehub.security.perms import DB_PERMS, EXPLICIT_DB_PERMS
 
@@ -26,10 +28,15 @@ class Auth(TokenAuth):
             has access to the specific resources (ex: device #29), as this method cannot access to the data to verify
             this.
         """
-        _ = AccountDomain.actual
-        requested_db = self.set_database_from_url()
-
-        return (self.has_full_db_access() or method in self.METHODS and self.db_access()) if requested_db else True
+        stats = AuthStats.current()
+        start = time.perf_counter() if stats is not None else None
+        try:
+            _ = AccountDomain.actual
+            requested_db = self.set_database_from_url()
+            return (self.has_full_db_access() or method in self.METHODS and self.db_access()) if requested_db else True
+        finally:
+            if stats is not None:
+                stats.seconds += time.perf_counter() - start
 
     def set_database_from_url(self) -> str or None:
         """
@@ -13,6 +13,7 @@ from ereuse_devicehub.resources.event.device.cancel_reservation.settings import
 from ereuse_devicehub.resources.event.device.reserve.settings import Reserve
 from ereuse_devicehub.resources.event.settings import Event
 from ereuse_devicehub.resources.group.settings import Group
+from ereuse_devicehub.resources.job.settings import Job
 from ereuse_devicehub.security.perms import READ, RESOURCE_PERMS
 
 
@@ -46,6 +47,10 @@ def check_get_perms_for_item(resource_name: str, resource: dict):
                 if resource_name in Device.resource_names | Group.resource_names | Event.resource_names:
                     if not find(resource.get('perms', []), read_perm):
                         raise InsufficientDatabasePerm(resource_name, ids=[resource['_id']])
+                elif resource_name in Job.resource_names:
+                    # Jobs are only accessible to the account that created them
+                    if resource.get('byUser') != AccountDomain.actual['_id']:
+                        raise InsufficientDatabasePerm(resource_name, ids=[resource['_id']])
                 else:
                     raise InsufficientDatabasePerm(resource_name, ids=[resource['_id']])
 
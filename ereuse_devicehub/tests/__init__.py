@@ -283,7 +283,8 @@ class TestBase(Client):
 
     def tearDown(self):
         self.drop_databases()
-        if hasattr(self.app, 'grd_submitter_caller'):
+        # grd_submitter_caller is a cached_property: hasattr would create it (and its process)
+        if 'grd_submitter_caller' in vars(self.app):
             # We terminate the child process
             del self.app.grd_submitter_caller
         del self.app
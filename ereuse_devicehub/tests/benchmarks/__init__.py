@@ -0,0 +1,39 @@
+"""
+Benchmarks of the hot paths of Devicehub.
+
+Benchmarks are not tests: they are named ``bench_*.py`` so the test runner does not collect them,
+and they are executed as scripts, like ``python -m ereuse_devicehub.tests.benchmarks.bench_ancestor_ids``.
+They print their results instead of asserting them.
+"""
+import time
+from argparse import ArgumentParser
+from typing import Callable
+
+from pymongo import MongoClient
+from pymongo.database import Database
+
+
+def best_of(f: Callable, repeat: int = 5) -> float:
+    """Executes *f* *repeat* times, returning the seconds of the fastest execution."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def argument_parser(description: str) -> ArgumentParser:
+    """An argument parser with the common arguments of the benchmarks."""
+    parser = ArgumentParser(description=description)
+    parser.add_argument('--host', default='localhost', help='The host of MongoDB.')
+    parser.add_argument('--port', default=27017, type=int, help='The port of MongoDB.')
+    parser.add_argument('--repeat', default=5, type=int, help='Repeat each measure this number of times.')
+    return parser
+
+
+def database(host: str, port: int, name: str) -> Database:
+    """Gets a new empty database, dropping it if it existed."""
+    client = MongoClient(host, port)
+    client.drop_database(name)
+    return client[name]
@@ -0,0 +1,90 @@
+"""
+Compares getting descendants through *ancestors* (``$or`` of ``$elemMatch``) and through the indexed
+*ancestorIds* (one ``$in``), with 100k devices nested 4 levels deep:
+
+place > place > package > package > 10 devices, with 10 children per group, and every 100 devices in a lot.
+"""
+from bson import ObjectId
+from pymongo import ASCENDING, HASHED
+
+from ereuse_devicehub.resources.group.domain import GroupDomain
+from ereuse_devicehub.resources.group.physical.place.domain import PlaceDomain
+from ereuse_devicehub.tests.benchmarks import argument_parser, best_of, database
+
+FAN_OUT = 10
+
+
+def ancestors_query(type_name: str, resource_name: str, ids: list) -> dict:
+    """The query to get descendants before *ancestorIds*."""
+    return {
+        '$or': [
+            {'ancestors': {'$elemMatch': {'@type': type_name, '_id': {'$in': ids}}}},
+            {'ancestors': {'$elemMatch': {resource_name: {'$elemMatch': {'$in': ids}}}}}
+        ]
+    }
+
+
+def populate(devices) -> dict:
+    """Inserts the devices, returning the id of a group of each level."""
+    groups = {}
+    batch = []
+    for place1 in range(FAN_OUT):
+        place1_id = str(ObjectId())
+        for place2 in range(FAN_OUT):
+            place2_id = str(ObjectId())
+            for package1 in range(FAN_OUT):
+                package1_id = str(ObjectId())
+                lot_id = str(ObjectId())
+                for package2 in range(FAN_OUT):
+                    package2_id = str(ObjectId())
+                    for _ in range(FAN_OUT):
+                        ancestors = [
+                            {'@type': 'Package', '_id': package2_id, 'packages': [package1_id],
+                             'places': [place2_id, place1_id]},
+                            {'@type': 'Lot', '_id': lot_id, 'lots': []}
+                        ]
+                        batch.append({
+                            '_id': str(ObjectId()),
+                            '@type': 'Computer',
+                            'ancestors': ancestors,
+                            'ancestorIds': GroupDomain.ancestor_ids(ancestors),
+                            'events': [{'@type': 'devices:Snapshot', '_id': str(ObjectId())}]
+                        })
+                    groups.setdefault('package2', package2_id)
+                groups.setdefault('lot', lot_id)
+                groups.setdefault('package1', package1_id)
+            groups.setdefault('place2', place2_id)
+        groups.setdefault('place1', place1_id)
+        devices.insert_many(batch)
+        batch = []
+    return groups
+
+
+def main():
+    args = argument_parser(__doc__).parse_args()
+    devices = database(args.host, args.port, 'dh_bench_ancestor_ids').devices
+    groups = populate(devices)
+    # The 'all lots ancestors' index of the groups and the new index
+    devices.create_index([('ancestors.lots', HASHED)])
+    devices.create_index([('ancestorIds', ASCENDING)])
+    print('{} devices'.format(devices.count()))
+    print('{:<10}{:>10}{:>14}{:>14}{:>14}{:>14}'.format('ancestor', 'devices', 'old (ms)', 'old examined',
+                                                      'new (ms)', 'new examined'))
+    types = {'place1': ('Place', 'places'), 'place2': ('Place', 'places'), 'package1': ('Package', 'packages'),
+             'package2': ('Package', 'packages'), 'lot': ('Lot', 'lots')}
+    for level, (type_name, resource_name) in sorted(types.items()):
+        old = ancestors_query(type_name, resource_name, [groups[level]])
+        new = {'ancestorIds': {'$in': [GroupDomain.typed_id(type_name, groups[level])]}}
+        if type_name == 'Place':  # The actual query of the domain
+            assert new == PlaceDomain.descendants_query(groups[level])
+        count = devices.count(new)
+        assert count == devices.count(old)
+        row = [level, count]
+        for q in old, new:
+            row.append(best_of(lambda: list(devices.find(q, {'_id': True})), args.repeat) * 1000)
+            row.append(devices.find(q).explain()['executionStats']['totalDocsExamined'])
+        print('{:<10}{:>10}{:>14.2f}{:>14}{:>14.2f}{:>14}'.format(*row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Compares getting the components of each computer of the 2015-12-09 snapshot fixtures, with their
+tests and erasures embedded, through an inner GET request (rest.execute_get, as
+DeviceDomain.get_full_components did) and in-process (rest.get_resources), checking that both
+get the same components.
+
+It uses the settings and fixtures of the tests, so it needs the same MongoDB as them.
+"""
+from argparse import ArgumentParser
+
+from ereuse_devicehub.resources.account.domain import AccountDomain
+from ereuse_devicehub.resources.device.computer.settings import Computer
+from ereuse_devicehub.resources.device.domain import DeviceDomain
+from ereuse_devicehub.rest import execute_get, get_resources
+from ereuse_devicehub.tests.benchmarks import best_of
+from ereuse_devicehub.tests.benchmarks.bench_score import Score
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', default=5, type=int, help='Repeat each measure this number of times.')
+    args = parser.parse_args()
+    bench = Score()
+    bench.setUp()
+    try:
+        bench.populate()
+        with bench.app.test_request_context('/{}/devices'.format(bench.db1), headers=[bench.auth_header]):
+            bench.app.auth.set_database_from_url()
+            computers = DeviceDomain.get({'@type': Computer.type_name, 'components': {'$ne': []}})
+            embedded = {'tests': 1, 'erasures': 1}
+
+            def inner_request():
+                token = AccountDomain.hash_token(AccountDomain.actual_token)
+                return [execute_get(bench.db1 + '/devices', token, {'where': {'_id': {'$in': c['components']}},
+                                                                    'embedded': embedded,
+                                                                    'max_results': len(c['components'])})['_items']
+                        for c in computers]
+
+            def in_process():
+                return [get_resources('devices', {'_id': {'$in': c['components']}}, embedded) for c in computers]
+
+            for old, new in zip(inner_request(), in_process()):
+                assert sorted(c['_id'] for c in old) == sorted(c['_id'] for c in new)
+                assert all(len(c.get('tests', [])) == len(n.get('tests', [])) for c, n in
+                           zip(sorted(old, key=lambda c: c['_id']), sorted(new, key=lambda c: c['_id'])))
+            components = sum(len(c['components']) for c in computers)
+            print('{} computers with {} components'.format(len(computers), components))
+            print('{:<16}{:>12}{:>17}'.format('', 'total (ms)', 'per device (ms)'))
+            for name, f in ('inner request', inner_request), ('in-process', in_process):
+                seconds = best_of(f, args.repeat)
+                print('{:<16}{:>12.2f}{:>17.2f}'.format(name, seconds * 1000, seconds * 1000 / len(computers)))
+    finally:
+        bench.tearDown()
+
+
+if __name__ == '__main__':
+    main()
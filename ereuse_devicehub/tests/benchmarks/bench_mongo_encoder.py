@@ -0,0 +1,133 @@
+"""
+Compares the previous MongoEncoder and mongo_encode (a full copy of the documents with pydash.transform
+and looking up argument positions in every call) with the actual ones, encoding the JSON fixtures of
+the tests as they are and with a set in their deepest dict, like a Mongo update with an *$in* of a set.
+
+It does not need MongoDB.
+"""
+import copy
+import inspect
+import json
+import os
+from argparse import ArgumentParser
+from contextlib import suppress
+
+from flask import Flask
+from pydash import transform
+
+from ereuse_devicehub.data_layer import MongoEncoder, mongo_encode
+from ereuse_devicehub.tests.benchmarks import best_of
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'fixtures')
+
+
+class OldMongoEncoder:
+    def encode_to_mongo(self, query) -> dict:
+        _type = type(query)
+        if _type is dict or _type is list:
+            return transform(query, self._encode_to_mongo_transform, _type())
+        else:
+            return query
+
+    def _encode_to_mongo_transform(self, acc, value, key, subdict):
+        if type(value) is set:
+            value = list(value)
+        if issubclass(type(value), list) or issubclass(type(value), dict):
+            value = self.encode_to_mongo(value)
+        if type(acc) is list:
+            acc.append(value)
+        else:
+            acc[key] = value
+
+
+def old_mongo_encode(*args_to_transform):
+    def decorator(function):
+        keys, *_ = inspect.getfullargspec(function)
+
+        def wrapper(*args, **kwargs):
+            new_args = list(args)
+            new_kwargs = copy.copy(kwargs)
+            for arg in args:
+                i = args.index(arg)
+                if keys[i] in args_to_transform:
+                    new_args[i] = OldMongoEncoder().encode_to_mongo(arg)
+            for key in args_to_transform:
+                if key in kwargs:
+                    new_kwargs[key] = OldMongoEncoder().encode_to_mongo(kwargs[key])
+            return function(*new_args, **new_kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def fixtures() -> list:
+    """Gets the JSON fixtures, skipping the signed ones."""
+    documents = []
+    for directory, _, files in os.walk(FIXTURES):
+        for file in sorted(files):
+            if file.endswith('.json'):
+                with open(os.path.join(directory, file)) as f:
+                    with suppress(ValueError):
+                        documents.append(json.load(f))
+    return documents
+
+
+def with_set(document):
+    """Returns a copy of the document with a set in its deepest dict."""
+    document = copy.deepcopy(document)
+    deepest, depth = None, -1
+    containers = [(document, 0)]
+    while containers:
+        container, level = containers.pop()
+        if type(container) is dict and level > depth:
+            deepest, depth = container, level
+        for value in container.values() if type(container) is dict else container:
+            if type(value) in (dict, list):
+                containers.append((value, level + 1))
+    if deepest is not None:
+        deepest['_bench'] = {'$in': {'a', 'b', 'c'}}
+    return document
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', default=5, type=int, help='Repeat each measure this number of times.')
+    parser.add_argument('--number', default=100, type=int, help='Encode each fixture this number of times.')
+    args = parser.parse_args()
+    documents = fixtures()
+    documents_with_set = [with_set(document) for document in documents]
+    old, new = OldMongoEncoder(), MongoEncoder()
+    for document in documents_with_set:
+        assert old.encode_to_mongo(document) == new.encode_to_mongo(document)
+
+    def encode(encoder, docs):
+        return lambda: [encoder.encode_to_mongo(d) for _ in range(args.number) for d in docs]
+
+    print('{} fixtures, {} times each'.format(len(documents), args.number))
+    print('{:<22}{:>12}{:>12}{:>10}'.format('case', 'old (ms)', 'new (ms)', 'speedup'))
+    cases = [
+        ('encoder, no sets', encode(old, documents), encode(new, documents)),
+        ('encoder, with a set', encode(old, documents_with_set), encode(new, documents_with_set))
+    ]
+
+    app = Flask(__name__)
+    app.mongo_encoder = new
+
+    def function(resource, query_filter, projection=None):
+        pass
+
+    old_function = old_mongo_encode('query_filter')(function)
+    new_function = mongo_encode('query_filter')(function)
+    call = lambda f: lambda: [f('devices', {'_id': 'foo'}, None) for _ in range(args.number * len(documents))]
+    cases.append(('decorator', call(old_function), call(new_function)))
+
+    with app.app_context():
+        for name, old_case, new_case in cases:
+            old_time, new_time = best_of(old_case, args.repeat), best_of(new_case, args.repeat)
+            print('{:<22}{:>12.2f}{:>12.2f}{:>9.1f}x'.format(name, old_time * 1000, new_time * 1000,
+                                                             old_time / new_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Compares computing the condition and price of the computers of the 2015-12-09 snapshot fixtures one
+device at a time (one R call per device) with computing them in one batch (one R call per group of
+devices with the same fields), checking that both get the same results.
+
+It uses the settings and fixtures of the tests, so it needs the same MongoDB and R packages as them.
+"""
+import copy
+import os
+from argparse import ArgumentParser
+
+from ereuse_devicehub.resources.device.computer.settings import Computer
+from ereuse_devicehub.resources.device.domain import DeviceDomain
+from ereuse_devicehub.resources.device.score_condition import ScorePriceError
+from ereuse_devicehub.tests import TestStandard
+from ereuse_devicehub.tests.benchmarks import best_of
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'test_resources',
+                        'test_events', 'test_device_event', 'test_snapshot', 'resources', '2015-12-09')
+CONDITIONS = 'A', 'B', 'C', 'D'
+
+
+class Score(TestStandard):
+    def runTest(self):
+        pass
+
+    def populate(self):
+        """POSTs the snapshots of the fixtures, each one with a condition."""
+        for i, filename in enumerate(sorted(os.listdir(FIXTURES))):
+            if filename.endswith('.json'):
+                snapshot = self.get_json_from_file(filename, FIXTURES)
+                general = CONDITIONS[i % len(CONDITIONS)]
+                snapshot['condition'] = {
+                    'appearance': {'general': general},
+                    'functionality': {'general': general},
+                    'labelling': bool(i % 2),
+                    'bios': {'general': general}
+                }
+                self.post_201(self.DEVICE_EVENT_SNAPSHOT, snapshot)
+
+    def devices(self) -> list:
+        """Gets the computers with their condition and full components."""
+        q = {'@type': Computer.type_name, 'condition': {'$exists': True, '$ne': {}}}
+        return self.app.score.get_devices(DeviceDomain.get(q))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', default=3, type=int, help='Repeat each measure this number of times.')
+    args = parser.parse_args()
+    bench = Score()
+    bench.setUp()
+    try:
+        bench.populate()
+        # Otherwise the cache would answer every repetition after the first one without calling R
+        bench.app.config['SCORE_CACHE_SIZE'] = 0
+        with bench.app.test_request_context('/{}/devices'.format(bench.db1), headers=[bench.auth_header]):
+            bench.app.auth.set_database_from_url()
+            devices = bench.devices()
+            score, price = bench.app.score, bench.app.price
+
+            def one_by_one():
+                result = []
+                for device in copy.deepcopy(devices):
+                    try:
+                        score.compute(device)
+                        pricing = price.compute(device)
+                    except ScorePriceError:
+                        pricing = None
+                    result.append((device['condition'], pricing))
+                return result
+
+            def batch():
+                batch_devices = copy.deepcopy(devices)
+                conditions = score.compute_many(batch_devices)
+                scored = [d for d, c in zip(batch_devices, conditions) if not isinstance(c, ScorePriceError)]
+                pricings = dict(zip((d['_id'] for d in scored), price.compute_many(scored)))
+                return [(d['condition'], None if isinstance(pricings.get(d['_id']), ScorePriceError)
+                         else pricings.get(d['_id'])) for d in batch_devices]
+
+            assert one_by_one() == batch()
+            groups = len(list(score.frames(copy.deepcopy(devices))))
+            print('{} computers in {} groups of the same fields'.format(len(devices), groups))
+            print('{:<14}{:>12}{:>12}{:>10}'.format('', 'one (ms)', 'batch (ms)', 'speedup'))
+            one_time, batch_time = best_of(one_by_one, args.repeat), best_of(batch, args.repeat)
+            print('{:<14}{:>12.2f}{:>12.2f}{:>9.1f}x'.format('score + price', one_time * 1000, batch_time * 1000,
+                                                             one_time / batch_time))
+    finally:
+        bench.tearDown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Measures the bytes MongoDB sends to Devicehub when POSTing snapshots, with the projections of the
+Domain reads and without them (getting full documents, as before having projections).
+
+It uses the settings and fixtures of the tests, so it needs the same MongoDB as them.
+"""
+from argparse import ArgumentParser
+from contextlib import contextmanager, suppress
+from unittest.mock import patch
+
+from bson import BSON
+from pymongo import monitoring
+from pymongo.collection import Collection
+
+from ereuse_devicehub.tests import TestStandard
+
+SNAPSHOTS = 'vaio', 'vostro', 'xps13', 'vaio'  # The last one re-snapshots a device
+
+
+class ReplyBytes(monitoring.CommandListener):
+    """Counts the bytes of the replies of the read commands."""
+    COMMANDS = {'find', 'getMore', 'findAndModify', 'aggregate', 'count'}
+
+    def __init__(self):
+        self.bytes = 0
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if event.command_name in self.COMMANDS:
+            self.bytes += len(BSON.encode(event.reply))
+
+    def failed(self, event):
+        pass
+
+
+@contextmanager
+def without_projections():
+    """Drops the projections of find, find_one and find_one_and_update, getting full documents."""
+    find, find_one, find_one_and_update = Collection.find, Collection.find_one, Collection.find_one_and_update
+
+    def _find(self, filter=None, *_, **kwargs):
+        kwargs.pop('projection', None)
+        return find(self, filter, **kwargs)
+
+    def _find_one(self, filter=None, *_, **kwargs):
+        kwargs.pop('projection', None)
+        return find_one(self, filter, **kwargs)
+
+    def _find_one_and_update(self, filter, update, projection=None, *args, **kwargs):
+        return find_one_and_update(self, filter, update, None, *args, **kwargs)
+
+    with patch.object(Collection, 'find', _find), patch.object(Collection, 'find_one', _find_one), \
+            patch.object(Collection, 'find_one_and_update', _find_one_and_update):
+        yield
+
+
+class SnapshotBytes(TestStandard):
+    def runTest(self):
+        pass
+
+    def measure(self, listener: ReplyBytes) -> list:
+        """POSTs the snapshots, returning the bytes received for each one."""
+        result = []
+        for name in SNAPSHOTS:
+            snapshot = self.get_fixture(self.SNAPSHOT, name)
+            listener.bytes = 0
+            self.post_201(self.DEVICE_EVENT_SNAPSHOT, snapshot)
+            result.append(listener.bytes)
+        return result
+
+
+def main():
+    ArgumentParser(description=__doc__).parse_args()
+    listener = ReplyBytes()
+    monitoring.register(listener)  # Before creating the app, so its MongoClient uses it
+    results = {}
+    for name, context in ('before', without_projections), ('after', suppress):
+        bench = SnapshotBytes()
+        bench.setUp()
+        try:
+            with context():
+                results[name] = bench.measure(listener)
+        finally:
+            bench.tearDown()
+    print('{:<10}{:>14}{:>14}{:>10}'.format('snapshot', 'before (B)', 'after (B)', 'saved'))
+    for name, before, after in zip(SNAPSHOTS, results['before'], results['after']):
+        print('{:<10}{:>14}{:>14}{:>9.0%}'.format(name, before, after, 1 - after / before))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Compares translating the computers of the 2015-12-09 snapshot fixtures to spreadsheet rows with the pydash
+chains and the regex that SpreadsheetTranslator used (evaluated with map_values for every column and device)
+and with the compiled accessors and the str.translate check it uses now, checking that both get the same
+values. It also measures translating whole rows, with their components and Update events.
+
+It uses the settings and fixtures of the tests, so it needs the same MongoDB as them.
+"""
+from argparse import ArgumentParser
+from collections import OrderedDict
+
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from pydash import map_values, py_
+
+from ereuse_devicehub.export.export import ILLEGAL_CHARACTERS, NON_COMPONENTS, SpreadsheetTranslator
+from ereuse_devicehub.resources.device.domain import DeviceDomain
+from ereuse_devicehub.resources.submitter.translator import Translator
+from ereuse_devicehub.tests.benchmarks import best_of
+from ereuse_devicehub.tests.benchmarks.bench_score import Score
+
+
+def pydash_dictionary(brief: bool) -> OrderedDict:
+    """The translation dictionary of SpreadsheetTranslator before compiling it."""
+    p = py_()
+    d = OrderedDict()
+    d['Identifier'] = p.get('_id')
+    d['Type'] = p.get('@type')
+    d['Subtype'] = p.get('type')
+    if not brief:
+        d['Label ID'] = p.get('labelId')
+        d['Giver ID'] = p.get('gid')
+        d['Platform ID'] = p.get('pid')
+        d['Refurbisher ID'] = p.get('rid')
+        d['Serial Number'] = p.get('serialNumber')
+    d['Price'] = p.get('pricing.total.standard')
+    d['Price 2 years warranty'] = p.get('pricing.total.warranty2')
+    d['Model'] = p.get('model')
+    d['Manufacturer'] = p.get('manufacturer')
+    if not brief:
+        d['State'] = p.get('events').head().pick('@type', 'label').join(' ')
+        d['Registered in'] = p.get('_created')
+    d['Processor'] = p.get('processorModel')
+    d['RAM (GB)'] = p.get('totalRamSize').floor()
+    d['HDD (MB)'] = p.get('totalHardDriveSize').floor()
+    d['Condition Score'] = p.get('condition.general.score')
+    d['Condition'] = p.get('condition.general.range')
+    if not brief:
+        d['Appearance'] = p.get('condition.appearance.general')
+        d['Appearance Score'] = p.get('condition.appearance.score')
+        d['Functionality'] = p.get('condition.functionality.general')
+        d['Functionality Score'] = p.get('condition.functionality.score')
+        d['Labelling'] = p.get('condition.labelling')
+        d['Bios'] = p.get('condition.bios.general')
+        d['Processor Score'] = p.get('condition.components.processors')
+        d['RAM Score'] = p.get('condition.components.ram')
+        d['HDD Score'] = p.get('condition.components.hardDrives')
+        d['Refurbisher percentage'] = p.get('pricing.refurbisher.standard.percentage')
+        d['Refurbisher amount'] = p.get('pricing.refurbisher.standard.amount')
+        d['Retailer percentage'] = p.get('pricing.retailer.standard.percentage')
+        d['Retailer amount'] = p.get('pricing.retailer.standard.amount')
+        d['Platform percentage'] = p.get('pricing.platform.standard.percentage')
+        d['Platform amount'] = p.get('pricing.platform.standard.amount')
+        d['Refurbisher percentage 2 years warranty'] = p.get('pricing.refurbisher.warranty2.percentage')
+        d['Refurbisher amount 2 years warranty'] = p.get('pricing.refurbisher.warranty2.amount')
+        d['Retailer percentage 2 years warranty'] = p.get('pricing.retailer.warranty2.percentage')
+        d['Retailer amount 2 years warranty'] = p.get('pricing.retailer.warranty2.amount')
+        d['Platform percentage 2 years warranty'] = p.get('pricing.platform.warranty2.percentage')
+        d['Platform amount 2 years warranty'] = p.get('pricing.platform.warranty2.amount')
+    return d
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', default=5, type=int, help='Repeat each measure this number of times.')
+    parser.add_argument('--copies', default=100, type=int, help='Translate this number of copies of each device.')
+    args = parser.parse_args()
+    bench = Score()
+    bench.setUp()
+    try:
+        bench.populate()
+        with bench.app.test_request_context('/{}/devices'.format(bench.db1), headers=[bench.auth_header]):
+            bench.app.auth.set_database_from_url()
+            print('{:<10}{:<22}{:>12}{:>14}'.format('type', '', 'total (ms)', 'rows/s'))
+            for brief in False, True:
+                translator = SpreadsheetTranslator(brief)
+                devices = list(translator.prefetched(DeviceDomain.get(NON_COMPONENTS))) * args.copies
+                dictionary = pydash_dictionary(brief)
+
+                def pydash():
+                    rows = [map_values(dictionary, lambda get: get(device)) for device in devices]
+                    for row in rows:
+                        for key, value in row.items():
+                            if type(value) is str and next(ILLEGAL_CHARACTERS_RE.finditer(value), None):
+                                row[key] = '**'
+                    return rows
+
+                def compiled():
+                    rows = [Translator.translate_one(translator, device) for device in devices]
+                    for row in rows:
+                        for key, value in row.items():
+                            if type(value) is str and len(value.translate(ILLEGAL_CHARACTERS)) != len(value):
+                                row[key] = '**'
+                    return rows
+
+                field_names = translator.field_names([NON_COMPONENTS])
+
+                def whole_rows():
+                    return [translator.row(field_names, translator.translate_one(device)) for device in devices]
+
+                assert pydash() == compiled()
+                _type = 'brief' if brief else 'detailed'
+                for name, f in ('pydash', pydash), ('compiled', compiled), ('whole rows', whole_rows):
+                    seconds = best_of(f, args.repeat)
+                    print('{:<10}{:<22}{:>12.2f}{:>14.0f}'.format(_type, name, seconds * 1000, len(devices) / seconds))
+    finally:
+        bench.tearDown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Compares registering the URL rules of the resources once per database (the previous
+DeviceHub._add_resource_url_rules) with registering them once with the <database:db> converter,
+measuring the start-up of DeviceHub, the number of URL rules and the latency of matching URLs
+as the number of databases grows.
+
+It does not need MongoDB, although it uses the settings of the tests.
+"""
+from argparse import ArgumentParser
+from contextlib import contextmanager
+
+from werkzeug.exceptions import NotFound
+
+from ereuse_devicehub.flaskapp import DeviceHub
+from ereuse_devicehub.tests import TestBase
+from ereuse_devicehub.tests.benchmarks import best_of
+
+PATHS = 'devices', 'devices/1234', 'events/devices/snapshot', 'lots', 'places/5a1b2c3d4e5f6a7b8c9d0e1f'
+
+
+class PerDatabaseDeviceHub(DeviceHub):
+    """DeviceHub registering the URL rules of the resources once for each database."""
+
+    def _add_resource_url_rules(self, resource, settings):
+        @contextmanager
+        def prefixed_db(db):
+            real_url_prefix = self.config['URL_PREFIX']
+            if real_url_prefix:
+                self.config['URL_PREFIX'] += '/{}'.format(db)
+            else:
+                self.config['URL_PREFIX'] = db
+            yield
+            self.config['URL_PREFIX'] = real_url_prefix
+
+        if settings.get('use_default_database', False):
+            super(DeviceHub, self)._add_resource_url_rules(resource, settings)
+        else:
+            for db in self.config['DATABASES']:
+                with prefixed_db(db):
+                    super(DeviceHub, self)._add_resource_url_rules(resource, settings)
+
+
+def settings(databases: int) -> dict:
+    from ereuse_devicehub import default_settings
+    TestBase.set_settings(default_settings)
+    s = dict(vars(default_settings))
+    s['DATABASES'] = tuple('db{}'.format(i) for i in range(databases))
+    for db in s['DATABASES']:
+        s['{}_DBNAME'.format(db.upper())] = 'bench_{}'.format(db)
+    return s
+
+
+def match(app: DeviceHub, urls: list, number: int):
+    """Matches every URL *number* times, as Flask does when it gets a request."""
+    adapter = app.url_map.bind('localhost')
+    with app.app_context():
+        for _ in range(number):
+            for url in urls:
+                try:
+                    adapter.match(url, method='GET')
+                except NotFound:
+                    raise AssertionError('{} does not match'.format(url))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', default=3, type=int, help='Repeat each measure this number of times.')
+    parser.add_argument('--number', default=100, type=int, help='Match each URL this number of times.')
+    parser.add_argument('--databases', default=[1, 10, 40, 100], type=int, nargs='+',
+                        help='The numbers of databases to measure.')
+    args = parser.parse_args()
+    print('{:>9}{:>10}{:>15}{:>15}{:>17}{:>17}'.format('databases', 'app', 'rules', 'start-up (ms)',
+                                                       'match (us/url)', 'last db (us/url)'))
+    for databases in args.databases:
+        s = settings(databases)
+        urls = ['/{}/{}'.format(db, path) for db in s['DATABASES'] for path in PATHS]
+        last_db_urls = ['/{}/{}'.format(s['DATABASES'][-1], path) for path in PATHS]
+        for name, cls in ('old', PerDatabaseDeviceHub), ('new', DeviceHub):
+            apps = []
+            start_up = best_of(lambda: apps.append(cls(settings=s)), args.repeat)
+            app = apps[-1]
+            rules = len(list(app.url_map.iter_rules()))
+            all_urls = best_of(lambda: match(app, urls, args.number), args.repeat) / (args.number * len(urls))
+            last = best_of(lambda: match(app, last_db_urls, args.number), args.repeat) / (args.number * len(PATHS))
+            print('{:>9}{:>10}{:>15}{:>15.2f}{:>17.2f}{:>17.2f}'.format(databases, name, rules, start_up * 1000,
+                                                                      all_urls * 10 ** 6, last * 10 ** 6))
+
+
+if __name__ == '__main__':
+    main()
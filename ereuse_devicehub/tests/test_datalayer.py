@@ -3,7 +3,10 @@ from unittest import TestCase
 from assertpy import assert_that
 from bson import ObjectId
 
-from ereuse_devicehub.data_layer import mongo_encode, MongoEncoder
+from ereuse_devicehub.data_layer import CollectionStats, mongo_encode, MongoEncoder, start_collection_stats
+from ereuse_devicehub.resources.account.domain import AccountDomain
+from ereuse_devicehub.resources.device.component.domain import ComponentDomain
+from ereuse_devicehub.resources.device.domain import DeviceDomain
 from ereuse_devicehub.tests import TestBase
 
 
@@ -27,6 +30,20 @@ class TestMongoEncoder(TestCase):
         assert_that(result[2]['b']).is_type_of(list)
         assert_that(result[2]['b']).is_equal_to([4])
 
+    def test_mongo_encoder_copy_on_write(self):
+        """Documents without sets are not copied, and the ones with sets are copied without changing them."""
+        encoder = MongoEncoder()
+        query = {'_id': {'$in': ['a', 'b']}, 'list': [{'foo': 'bar'}]}
+        assert_that(encoder.encode_to_mongo(query)).is_same_as(query)
+
+        document = {'a': {'b': [{'c': {1}}, {'d': 2}]}, 'e': {'f': 3}}
+        result = encoder.encode_to_mongo(document)
+        assert_that(result).is_equal_to({'a': {'b': [{'c': [1]}, {'d': 2}]}, 'e': {'f': 3}})
+        assert_that(document['a']['b'][0]['c']).is_type_of(set)
+        # Containers without sets are shared
+        assert_that(result['e']).is_same_as(document['e'])
+        assert_that(result['a']['b'][1]).is_same_as(document['a']['b'][1])
+
     def test_objectid(self):
         _id = ObjectId('AAAAAAAAAAAAAAAAAAAAAAAA')
         result = MongoEncoder().encode_to_mongo(_id)
@@ -45,3 +62,50 @@ class TestDataLayer(TestBase):
 
             d = {'list': [{'set': {1, 2, 3}}, 2, 3, 4]}
             dummy(d)
+
+    def test_mongo_encode_positions(self):
+        """Arguments are encoded by their position or keyword, even when they have the same value."""
+        with self.app.app_context():
+            @mongo_encode('b', 'c')
+            def dummy(a, b, c=None):
+                assert_that(a['set']).is_type_of(set)
+                assert_that(b['set']).is_type_of(list)
+                if c is not None:
+                    assert_that(c['set']).is_type_of(list)
+
+            d = {'set': {1}}
+            dummy(d, d)
+            dummy(d, d, d)
+            dummy(d, b=d, c=d)
+
+    def test_collection(self):
+        """Collections are cached by database until the database settings change, counting them if set."""
+        self.app.config['COLLECTION_STATS'] = True
+        with self.app.test_request_context('/{}/devices'.format(self.db1)):
+            self.app.auth.set_database_from_url()
+            start_collection_stats()
+            devices = DeviceDomain.collection
+            assert_that(devices.name).is_equal_to('devices')
+            assert_that(devices.database.name).is_equal_to(self.app.config['DHT1_DBNAME'])
+            assert_that(DeviceDomain.collection).is_same_as(devices)
+            assert_that(ComponentDomain.collection).is_same_as(devices)
+            assert_that(self.app.data.collection('devices')).is_same_as(devices)
+            assert_that(CollectionStats.current()).has_resolutions(4)
+            # Resources using the default database get it regardless the database of the request
+            assert_that(AccountDomain.collection.database.name).is_equal_to(self.app.config['MONGO_DBNAME'])
+            self.app.config['DHT1_DBNAME'] = self.app.config['DHT1_DBNAME']
+            assert_that(DeviceDomain.collection).is_not_same_as(devices).is_equal_to(devices)
+            # Settings changed through update (like Eve's load_config does) and setdefault also count
+            devices = DeviceDomain.collection
+            self.app.config.update(DHT1_DBNAME=self.app.config['DHT1_DBNAME'])
+            assert_that(DeviceDomain.collection).is_not_same_as(devices)
+            devices = DeviceDomain.collection
+            self.app.config.setdefault('DHT3_DBNAME', 'dht3')
+            assert_that(DeviceDomain.collection).is_not_same_as(devices)
+            del self.app.config['DHT3_DBNAME']
+            # DATABASES can only change by setting it again
+            self.app.config['DATABASES'] = list(self.app.config['DATABASES'])
+            assert_that(self.app.config['DATABASES']).is_instance_of(tuple)
+        with self.app.test_request_context('/{}/devices'.format(self.db2)):
+            self.app.auth.set_database_from_url()
+            assert_that(DeviceDomain.collection.database.name).is_equal_to(self.app.config['DHT2_DBNAME'])
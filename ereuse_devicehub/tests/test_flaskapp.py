@@ -0,0 +1,41 @@
+from assertpy import assert_that
+from flask import current_app
+from werkzeug.exceptions import NotFound
+
+from ereuse_devicehub.resources.manufacturers import ManufacturerDomain
+from ereuse_devicehub.tests import TestStandard
+
+
+class TestFlaskApp(TestStandard):
+    def test_lazy_initialization(self):
+        """Tests that R, GeoIP and the manufacturers are initialized on first use or when warming up."""
+        assert_that(self.app.startup_times).contains_key('eve', 'app', 'workers')
+        assert_that(vars(self.app)).does_not_contain_key('score', 'price', 'geoip', 'grd_submitter_caller')
+        assert_that(self.app.manufacturers_loaded).is_false()
+        # Getting the manufacturers loads them
+        manufacturers, _ = self._get('/manufacturers', self.token)
+        assert_that(manufacturers['_items']).is_not_empty()
+        assert_that(self.app.manufacturers_loaded).is_true()
+        assert_that(self.app.startup_times).contains_key('manufacturers')
+        self.app.warm_up()
+        assert_that(vars(self.app)).contains_key('score', 'price', 'geoip')
+        assert_that(self.app.startup_times).contains_key('score', 'price', 'geoip')
+        with self.app.app_context():
+            assert_that(ManufacturerDomain.count()).is_greater_than(0)
+
+    def test_database_url_rules(self):
+        """Tests that the URL rules of the resources are registered once for all the databases."""
+        rules = [rule.rule for rule in self.app.url_map.iter_rules() if rule.endpoint == 'devices|resource']
+        assert_that(rules).is_equal_to(['/<database:db>/devices'])
+        self.get_200(self.DEVICES, db=self.db2)
+        _, status = self._get('/not-a-database/devices', self.token)
+        assert_that(status).is_equal_to(404)
+
+    def test_database_url_without_app_context(self):
+        """Flask matches the URL when creating the request context, before there is an app context."""
+        assert_that(current_app).is_false()
+        request = self.app.test_request_context('/{}/devices'.format(self.db1)).request
+        assert_that(request.routing_exception).is_none()
+        assert_that(request.view_args).is_equal_to({'db': self.db1})
+        request = self.app.test_request_context('/not-a-database/devices').request
+        assert_that(request.routing_exception).is_instance_of(NotFound)
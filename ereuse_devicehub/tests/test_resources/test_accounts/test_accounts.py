@@ -1,8 +1,12 @@
 import copy
 
 from assertpy import assert_that
+from flask import g
 
 from ereuse_devicehub.exceptions import WrongCredentials
+from ereuse_devicehub.resources.account.cache import AuthStats
+from ereuse_devicehub.resources.account.domain import AccountDomain
+from ereuse_devicehub.resources.account.hooks import invalidate_cached_account
 from ereuse_devicehub.security.perms import ACCESS
 from ereuse_devicehub.tests import TestStandard
 
@@ -50,3 +54,28 @@ class TestDevice(TestStandard):
         # No credentials at all
         _, status = self._post('/login', {})
         self.assert_error(response, status, WrongCredentials)
+
+    def test_account_cache(self):
+        """Tests that authenticating gets the account from the cache, which is invalidated when it changes."""
+        cache = self.app.account_cache
+        cache.clear()
+        self.get_200(self.DEVICES)
+        assert_that(cache.accounts).contains_key(self.account['token'])
+
+        def lookup() -> AuthStats:
+            with self.app.test_request_context('/{}/devices'.format(self.db1), headers=[self.auth_header]):
+                g.dh_auth_stats = stats = AuthStats()
+                assert_that(AccountDomain.actual).has_email(self.account['email'])
+                return stats
+
+        assert_that(lookup()).has_lookups(1).has_hits(1)
+        # Changing the account invalidates it
+        with self.app.app_context():
+            invalidate_cached_account({'name': 'foo'}, self.account)
+        assert_that(cache.accounts).does_not_contain_key(self.account['token'])
+        assert_that(lookup()).has_lookups(1).has_hits(0)
+        assert_that(lookup()).has_hits(1)
+        # And so expiring
+        cache.ttl = 0
+        cache.set(cache.get(self.account['token']))
+        assert_that(lookup()).has_hits(0)
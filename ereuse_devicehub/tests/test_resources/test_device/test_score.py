@@ -0,0 +1,107 @@
+import copy
+import json
+import os
+import shutil
+import tempfile
+
+import numpy
+from assertpy import assert_that
+from eve.exceptions import ConfigException
+
+from ereuse_devicehub.resources.device.computer.settings import Computer
+from ereuse_devicehub.resources.device.domain import DeviceDomain
+from ereuse_devicehub.resources.device.score_condition import NumpyPrice, NumpyScore, ScorePriceError
+from ereuse_devicehub.scripts.export_score_models import export_score_models
+from ereuse_devicehub.tests import TestStandard
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'test_events',
+                        'test_device_event', 'test_snapshot', 'resources', '2015-12-09')
+TOLERANCE = 0.011
+"""Results are rounded to 2 decimals, so they can differ in the last one."""
+
+
+class TestNumpyScore(TestStandard):
+    def setUp(self, settings_file=None, url_converters=None):
+        super().setUp(settings_file, url_converters)
+        grades = 'A', 'B', 'C', 'D'
+        for i, filename in enumerate(sorted(os.listdir(FIXTURES))):
+            if filename.endswith('.json'):
+                snapshot = self.get_json_from_file(filename, FIXTURES)
+                snapshot['condition'] = {
+                    'appearance': {'general': grades[i % len(grades)]},
+                    'functionality': {'general': grades[(i + 1) % len(grades)]},
+                    'labelling': bool(i % 2),
+                    'bios': {'general': grades[i % len(grades)]}
+                }
+                self.post_201(self.DEVICE_EVENT_SNAPSHOT, snapshot)
+
+    def set_score_models(self, exported: dict = None):
+        """
+        Sets SCORE_MODELS to a JSON with the passed-in parameters or, if None, with the ones exported from
+        the installed R packages.
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = self.app.config['SCORE_MODELS'] = os.path.join(directory, 'score_models.json')
+        if exported is None:
+            export_score_models(path, self.app.config['R_PACKAGES_PATH'])
+        else:
+            with open(path, 'w') as f:
+                json.dump(exported, f)
+
+    def assert_close(self, numpy_result, r_result, path=''):
+        if isinstance(r_result, dict):
+            assert_that(numpy_result, path).is_instance_of(dict)
+            assert_that(set(numpy_result), path).is_equal_to(set(r_result))
+            for key in r_result:
+                self.assert_close(numpy_result[key], r_result[key], '{}.{}'.format(path, key))
+        elif isinstance(r_result, float):
+            assert_that(numpy_result, path).is_close_to(r_result, TOLERANCE)
+        else:
+            assert_that(numpy_result, path).is_equal_to(r_result)
+
+    def test_parity(self):
+        """Tests that the NumPy backend computes the same condition and pricing as R for the fixtures."""
+        self.set_score_models()
+        with self.app.test_request_context('/{}/devices'.format(self.db1), headers=[self.auth_header]):
+            self.app.auth.set_database_from_url()
+            q = {'@type': Computer.type_name, 'condition': {'$exists': True, '$ne': {}}}
+            devices = self.app.score.get_devices(DeviceDomain.get(q))
+            assert_that(devices).is_not_empty()
+            for device in devices:  # Let's remove what the snapshot computed
+                for field in 'general', 'components', 'scoringSoftware':
+                    device['condition'].pop(field, None)
+                device.pop('pricing', None)
+            r_devices, numpy_devices = copy.deepcopy(devices), copy.deepcopy(devices)
+            r_conditions = self.app.score.compute_many(r_devices)
+            numpy_conditions = NumpyScore(self.app).compute_many(numpy_devices)
+            r_pricings = self.app.price.compute_many(r_devices)
+            numpy_pricings = NumpyPrice(self.app).compute_many(numpy_devices)
+        for device, r_condition, numpy_condition, r_pricing, numpy_pricing in \
+                zip(devices, r_conditions, numpy_conditions, r_pricings, numpy_pricings):
+            if isinstance(r_condition, ScorePriceError):
+                assert_that(numpy_condition).is_instance_of(ScorePriceError)
+            else:
+                self.assert_close(numpy_condition, r_condition, device['_id'])
+                self.assert_close(numpy_pricing, r_pricing, device['_id'])
+
+    def test_rate(self):
+        """Tests that the exponential, linear and logarithmic rates are used in their intervals and meet there."""
+        parameters = dict.fromkeys(NumpyScore.PARAMETERS, 1)
+        parameters.update({'cexp': 0, 'clin': 0.242, 'clog': 0.5})
+        self.set_score_models({'score': parameters})
+        score = NumpyScore(self.app)
+        norm = numpy.array([-1, 0, 0.1, 0.242 - 1e-9, 0.242, 0.3, 0.5 - 1e-9, 0.5, 2])
+        rates = [round(float(rate), 3) for rate in score._rate(norm)]
+        assert_that(rates).is_equal_to([1, 1, 1.235, 1.754, 1.754, 2.16, 3.56, 3.57, 4.172])
+
+    def test_score_models_required(self):
+        """The NumPy backend does not compute without all the parameters exported from the R packages."""
+        self.app.config['SCORE_MODELS'] = None
+        with self.assertRaises(ConfigException):
+            NumpyScore(self.app)
+        self.set_score_models({'score': {'cexp': 0}})
+        with self.assertRaises(ConfigException):
+            NumpyScore(self.app)
+        with self.assertRaises(ConfigException):
+            NumpyPrice(self.app)
@@ -0,0 +1,42 @@
+from assertpy import assert_that
+from pydash import omit
+
+from ereuse_devicehub.resources.device.domain import DeviceDomain
+from ereuse_devicehub.tests import TestStandard
+
+
+class TestDomain(TestStandard):
+    def test_bulk_updates(self):
+        """Tests updating several resources at once with update_raw, update_each_raw and update_many_raw_get."""
+        devices_id = self.get_fixtures_computers()
+        with self.app.test_request_context('/{}/devices'.format(self.db1)):
+            self.app.auth.set_database_from_url()
+            assert_that(DeviceDomain.update_raw(devices_id, {'$set': {'public': True}})).is_equal_to(len(devices_id))
+            assert_that(DeviceDomain.update_raw([], {'$set': {'public': True}})).is_equal_to(0)
+            for device in DeviceDomain.get_in('_id', devices_id):
+                assert_that(device).has_public(True)
+
+            operations = {_id: {'$set': {'label': 'label {}'.format(i)}} for i, _id in enumerate(devices_id)}
+            assert_that(DeviceDomain.update_each_raw(operations)).is_equal_to(len(devices_id))
+            for i, _id in enumerate(devices_id):
+                assert_that(DeviceDomain.get_one(_id)).has_label('label {}'.format(i))
+
+            devices = DeviceDomain.update_many_raw_get(devices_id + ['non-existing'], {'$set': {'public': False}},
+                                                       projection={'public': True})
+            assert_that(devices).is_length(len(devices_id))
+            for device in devices:
+                assert_that(device).is_equal_to({'_id': device['_id'], 'public': False})
+            assert_that([device['_id'] for device in devices]).contains_only(*devices_id)
+
+    def test_difference(self):
+        """Computes the difference between lists of devices by etag, keeping the order."""
+        devices_id = self.get_fixtures_computers()
+        with self.app.test_request_context('/{}/devices'.format(self.db1)):
+            self.app.auth.set_database_from_url()
+            devices = DeviceDomain.get_in('_id', devices_id)
+            assert_that(DeviceDomain.difference(devices, devices[1:])).is_equal_to(devices[:1])
+            assert_that(DeviceDomain.difference(devices[::-1], devices[:1])).is_equal_to(devices[:0:-1])
+            assert_that(DeviceDomain.difference(devices, [])).is_equal_to(devices)
+            # Devices without etag get one generated
+            x, y = (omit(device, '_etag', '_id') for device in devices[:2])
+            assert_that(DeviceDomain.difference([x, y], [dict(x)])).is_equal_to([y])
@@ -4,15 +4,23 @@ import os
 import uuid
 from io import BytesIO
 from random import choice
+from unittest.mock import patch
 
 from assertpy import assert_that
 from bson import objectid
+from passlib.handlers.sha2_crypt import sha256_crypt
 from pydash import filter_, map_, pick
 
+from ereuse_devicehub.resources.account.role import Role
 from ereuse_devicehub.resources.device.domain import DeviceDomain
+from ereuse_devicehub.resources.device.score_cache import ScoreCacheDomain
+from ereuse_devicehub.resources.device.score_condition import ScorePriceError
 from ereuse_devicehub.resources.event.device import DeviceEventDomain
 from ereuse_devicehub.resources.event.device.remove.hooks import ComponentIsNotInside
-from ereuse_devicehub.security.perms import ADMIN
+from ereuse_devicehub.resources.event.device.snapshot.domain import SnapshotResponseDomain
+from ereuse_devicehub.resources.job.condition_price.domain import ConditionPriceDomain
+from ereuse_devicehub.resources.job.worker import execute_next_job
+from ereuse_devicehub.security.perms import ACCESS, ADMIN
 from ereuse_devicehub.tests.test_resources.test_events import TestEvent
 from ereuse_devicehub.tests.test_resources.test_group import TestGroupBase
 from ereuse_devicehub.utils import NestedLookup, coerce_type
@@ -48,7 +56,8 @@ class TestSnapshot(TestEvent, TestGroupBase):
         :param input_snapshot: The Snapshot.
         :param num_of_events: How many events should the snapshot create?
         :param do_second_time_snapshot: Try performing the snapshot again. If the snapshot has an UUID the system
-        should return an error, otherwise the snapshot would be saved as a new one, but without creating any event.
+        should return the original response, otherwise the snapshot would be saved as a new one, but without creating
+        any event.
         :return: the id of the snapshot and the id of its device.
         """
         # Creates
@@ -569,13 +578,45 @@ class TestSnapshot(TestEvent, TestGroupBase):
         self.creation(snapshot, self.get_num_events(snapshot))
 
     def test_uuid(self):
-        """Tests the usage of _uuid field, not allowing two equal uuid to be inserted"""
+        """
+        Tests the usage of _uuid field: uploading again a snapshot with the same uuid, like when Workbench
+        retries, gets the original response without executing the snapshot again.
+        """
         snapshot = self.get_fixture(self.SNAPSHOT, self.REAL_DEVICES[0])
         snapshot['_uuid'] = str(uuid.uuid4())  # Just a random uuid
-        # Note we do not perform a second-time snapshot, as it would be illegal with the same 'uuid'
-        self.creation(snapshot, self.get_num_events(snapshot), do_second_time_snapshot=False)
-        # As we are going to see now
-        _, status = self.post('{}/{}'.format(self.DEVICE_EVENT, self.SNAPSHOT), snapshot)
+        # Note we do not perform a second-time snapshot, as it would be a replay with the same 'uuid'
+        snapshot_id, device_id = self.creation(snapshot, self.get_num_events(snapshot), do_second_time_snapshot=False)
+        original = self.get_200(self.EVENTS, item=snapshot_id)
+        num_events = self.get_200(self.EVENTS)['_meta']['total']
+        replay = self.post_201(self.SNAPSHOT_URL, snapshot)
+        assert_that(replay).has__id(snapshot_id).has_device(device_id).has_events(original['events'])
+        # The same uuid written differently is the same snapshot
+        replay = self.post_201(self.SNAPSHOT_URL, dict(snapshot, _uuid=snapshot['_uuid'].upper()))
+        assert_that(replay).has__id(snapshot_id)
+        assert_that(self.get_200(self.EVENTS)['_meta']['total']).is_equal_to(num_events)
+        # Accounts that cannot POST snapshots do not get the saved response
+        for email, token, databases in ('b@b.b', 'TOKENB', {self.db1: ACCESS}), ('c@c.c', 'TOKENC', {self.db1: ADMIN}):
+            self.db.accounts.insert_one({
+                'email': email,
+                'password': sha256_crypt.hash('1234'),
+                'role': Role.ADMIN,
+                'token': token,
+                'databases': databases,
+                'defaultDatabase': self.db1,
+                '@type': 'Account',
+                'active': True
+            })
+        _, status = self.post(self.SNAPSHOT_URL, snapshot, token=self.login('b@b.b', '1234')['token'])
+        assert_that(status).is_equal_to(401)
+        # Other accounts can POST snapshots but the response is only replayed to the account that uploaded it,
+        # so the snapshot is executed, which fails as the uuid is unique
+        _, status = self.post(self.SNAPSHOT_URL, snapshot, token=self.login('c@c.c', '1234')['token'])
+        self.assert422(status)
+        # Without the saved response (ex. it expired) the uuid is still unique
+        with self.app.test_request_context('/{}/devices'.format(self.db1)):
+            self.app.auth.set_database_from_url()
+            SnapshotResponseDomain.delete_response(snapshot['_uuid'])
+        _, status = self.post(self.SNAPSHOT_URL, snapshot)
         self.assert422(status)
 
     def test_8a1(self):
@@ -867,6 +908,88 @@ class TestSnapshot(TestEvent, TestGroupBase):
         # And the same for the pricing
         assert_that(snapshot['pricing']).is_equal_to(device['pricing']).is_equal_to(pricing)
 
+    def test_compute_condition_score_in_background(self):
+        """Tests computing the condition and pricing in a job when there are score workers."""
+        # We execute the jobs ourselves instead of starting the worker processes
+        self.app.config['SCORE_WORKERS'] = 1
+        snapshot = self.get_fixture(self.SNAPSHOT, '9')
+        snapshot = self.post_201(self.SNAPSHOT_URL, data=snapshot)
+        assert_that(snapshot['_job']['@type']).is_equal_to('ConditionPrice')
+        assert_that(self.get_200(self.EVENTS, item=snapshot['_id'])).does_not_contain_key('pricing')
+        # Other workers do not execute the job
+        assert_that(execute_next_job(self.app)).is_false()
+        assert_that(execute_next_job(self.app, ConditionPriceDomain)).is_true()
+        job = self.get_200('jobs', item=snapshot['_job']['_id'])
+        assert_that(job).has_status('done').has_processed(1)
+        snapshot = self.get_200(self.EVENTS, item=snapshot['_id'])
+        device = self.get_200(self.DEVICES, item=snapshot['device'])
+        assert_that(snapshot['condition']).is_equal_to(device['condition']).contains_key('general')
+        assert_that(snapshot['pricing']).is_equal_to(device['pricing']).contains_key('total')
+
+    def test_compute_many_condition_score(self):
+        """Tests computing the condition and pricing of many devices at once, as computing them one by one."""
+        ids = [self.post_201(self.SNAPSHOT_URL, data=self.get_fixture(self.SNAPSHOT, name))['device']
+               for name in ('9', 'high-score')]
+        devices = [self.get_200(self.DEVICES, item=_id) for _id in ids]
+        with self.app.test_request_context('/{}/devices'.format(self.db1), headers=[self.auth_header]):
+            self.app.auth.set_database_from_url()
+            computers = self.app.score.get_devices(DeviceDomain.get_in('_id', ids))
+            computers.sort(key=lambda computer: ids.index(computer['_id']))
+            conditions = self.app.score.compute_many(computers)
+            pricings = self.app.price.compute_many(computers)
+        assert_that(conditions).is_equal_to([device['condition'] for device in devices])
+        assert_that(pricings).is_equal_to([device['pricing'] for device in devices])
+
+    def test_score_cache(self):
+        """Tests that computing again a device that has not changed gets the result from the cache."""
+        device_id = self.post_201(self.SNAPSHOT_URL, data=self.get_fixture(self.SNAPSHOT, '9'))['device']
+        with self.app.test_request_context('/{}/devices'.format(self.db1), headers=[self.auth_header]):
+            self.app.auth.set_database_from_url()
+            computers = self.app.score.get_devices(DeviceDomain.get_in('_id', [device_id]))
+            hits = self.app.score.cache_hits
+            first = copy.deepcopy(self.app.score.compute_many(computers))
+            second = self.app.score.compute_many(computers)
+            assert_that(second).is_equal_to(first)
+            assert_that(self.app.score.cache_hits - hits).is_greater_than_or_equal_to(1)
+            assert_that(ScoreCacheDomain.count({'kind': 'Score'})).is_greater_than(0)
+            # The results of previous computations do not identify the device
+            computers[0]['condition']['general']['score'] += 1
+            computers[0]['pricing'] = {}
+            hits = self.app.score.cache_hits
+            assert_that(self.app.score.compute_many(computers)).is_equal_to(first)
+            assert_that(self.app.score.cache_hits - hits).is_equal_to(1)
+            # Results of other versions are removed
+            self.app.score._cache_invalidated = False
+            self.app.score.version, version = 'x', self.app.score.version
+            try:
+                self.app.score.compute_many(computers)
+            finally:
+                self.app.score.version = version
+            assert_that(ScoreCacheDomain.count({'kind': 'Score', 'version': {'$ne': 'x'}})).is_equal_to(0)
+
+    def test_score_cache_failed_frame(self):
+        """Devices computed alone because their data frame failed in R count once in the cache stats."""
+        device_id = self.post_201(self.SNAPSHOT_URL, data=self.get_fixture(self.SNAPSHOT, '9'))['device']
+        score = self.app.score
+        execute = score._execute
+
+        def execute_alone(data, ids):
+            if len(ids) > 1:
+                raise ScorePriceError('R failed for the data frame')
+            return execute(data, ids)
+
+        with self.app.test_request_context('/{}/devices'.format(self.db1), headers=[self.auth_header]):
+            self.app.auth.set_database_from_url()
+            ScoreCacheDomain.collection.delete_many({})
+            computer = score.get_devices(DeviceDomain.get_in('_id', [device_id]))[0]
+            hits, misses = score.cache_hits, score.cache_misses
+            with patch.object(score, '_execute', execute_alone):
+                conditions = score.compute_many([computer, copy.deepcopy(computer)])
+            assert_that(conditions).is_length(2).does_not_contain(None)
+            assert_that(conditions[0]).is_equal_to(conditions[1]).contains_key('general')
+            assert_that(score.cache_hits).is_equal_to(hits)
+            assert_that(score.cache_misses - misses).is_equal_to(2)
+
     def test_compute_condition_score_higher(self):
         """Higher """
         condition = {
@@ -1026,6 +1149,9 @@ class TestSnapshot(TestEvent, TestGroupBase):
         registered_rams = self.get_200(self.DEVICES,
                                           params={'where': json.dumps({'_id': {'$in': s['components']}, '@type': 'RamModule'})})['_items']
         assert_that(len(registered_rams)).is_equal_to(2)
+        # The computer knows the RAM modules it has without HID
+        computer = self.get_200(self.DEVICES, item=s['device'])
+        assert_that(computer['unsecuredComponents']).contains(*[r['_id'] for r in registered_rams])
         # Now we try to upload another snapshot
         # now with 3 sticks of the same RAM
         # The system should detect
@@ -1089,4 +1215,17 @@ class TestSnapshot(TestEvent, TestGroupBase):
         assert_that(snapshot2_r['components']).is_length(2)
         assert_that(snapshot2_r['components']).does_not_contain_duplicates()
         ram1_id, ram2_id = snapshot2_r['components']
-        assert_that(snapshot1_r['components'][0]).is_equal_to(ram1_id)
\ No newline at end of file
+        assert_that(snapshot1_r['components'][0]).is_equal_to(ram1_id)
+
+    def test_repeated_components(self):
+        """Components repeated in a snapshot are registered once, as when registering them one by one."""
+        snapshot = self.get_fixture(self.SNAPSHOT, 'vaio')
+        num_components = len(snapshot['components'])
+        component = next(c for c in snapshot['components']
+                         if 'serialNumber' in c and 'test' not in c and 'erasure' not in c)
+        snapshot['components'].append(copy.deepcopy(component))
+        snapshot = self.post_201(self.DEVICE_EVENT_SNAPSHOT, snapshot)
+        register = self.get_200(self.EVENTS, item=snapshot['events'][0])
+        assert_that(register['components']).is_length(num_components)
+        device = self.get_200(self.DEVICES, item=snapshot['device'])
+        assert_that(device['components']).is_length(num_components)
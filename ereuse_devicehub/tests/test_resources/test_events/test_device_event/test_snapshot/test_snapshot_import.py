@@ -0,0 +1,108 @@
+import io
+import json
+import zipfile
+
+from assertpy import assert_that
+from bson import ObjectId
+
+from ereuse_devicehub.resources.job.snapshot_import.domain import SnapshotImportItemDomain
+from ereuse_devicehub.resources.job.worker import execute_next_job
+from ereuse_devicehub.tests import TestStandard
+
+
+class TestSnapshotImport(TestStandard):
+    IMPORT = 'events/devices_snapshot/import'
+    ITEMS = 'jobs/snapshot-import/items'
+
+    def setUp(self, settings_file=None, url_converters=None):
+        super().setUp(settings_file, url_converters)
+        # We execute the jobs ourselves instead of starting the worker processes
+        self.app.config['JOB_WORKERS'] = 1
+
+    def get_items(self, job_id: str) -> list:
+        params = {'where': json.dumps({'job': job_id}), 'sort': '[("index", 1)]'}
+        return self.get_200(self.ITEMS, params=params)['_items']
+
+    def test_import_ndjson(self):
+        """
+        Imports snapshots as NDJSON, executing them in order and obtaining the result of each one
+        and the stats of the job.
+        """
+        vaio = self.get_fixture(self.SNAPSHOT, 'vaio')
+        vostro = self.get_fixture(self.SNAPSHOT, 'vostro')
+        lines = [json.dumps(vaio), json.dumps(vostro), '', 'not a json', json.dumps(vaio)]
+        job, status = self.post(self.IMPORT, '\n'.join(lines), content_type='application/x-ndjson')
+        self.assert202(status)
+        assert_that(job['@type']).is_equal_to('SnapshotImport')
+        assert_that(job).has_status('running').has_total(4).has_processed(1)
+
+        items = self.get_items(job['_id'])
+        assert_that([item['status'] for item in items]).is_equal_to(['queued', 'queued', 'failed', 'queued'])
+        assert_that([item['name'] for item in items]).is_equal_to(['line 1', 'line 2', 'line 4', 'line 5'])
+        assert_that(items[0]).does_not_contain('snapshot', 'after')
+        # The second vaio waits for the first one
+        assert_that(items[3]['after']).is_equal_to([items[0]['_id']])
+
+        while execute_next_job(self.app):
+            pass
+        items = self.get_items(job['_id'])
+        assert_that([item['status'] for item in items]).is_equal_to(['done', 'done', 'failed', 'done'])
+        assert_that(items[0]['result']['device']).is_equal_to(items[3]['result']['device'])
+        assert_that(items[1]['result']['device']).is_not_equal_to(items[0]['result']['device'])
+        snapshot = self.get_200(self.EVENTS, item=items[0]['result']['_id'])
+        assert_that(snapshot['@type']).is_equal_to('devices:Snapshot')
+
+        job = self.get_200('jobs', item=job['_id'])
+        assert_that(job).has_status('done').has_processed(4)
+        assert_that(job['stats']).has_items(4).has_done(3).has_failed(1)
+        assert_that(job['stats']['latency']).contains_key('mean', 'p50', 'p95', 'max')
+        assert_that(job['stats']['throughput']).is_greater_than(0)
+
+    def test_import_zip(self):
+        """Imports a zip of snapshots, limiting the number of snapshots running at the same time."""
+        data = io.BytesIO()
+        with zipfile.ZipFile(data, 'w') as archive:
+            for name in 'vaio', 'xps13':
+                archive.writestr('{}.json'.format(name), json.dumps(self.get_fixture(self.SNAPSHOT, name)))
+            archive.writestr('readme.txt', 'Not a snapshot')
+        job, status = self.post(self.IMPORT, data.getvalue(), content_type='application/zip')
+        self.assert202(status)
+        assert_that(job).has_total(2).has_processed(0)
+
+        self.app.config['SNAPSHOT_IMPORT_PARALLELISM'] = 0
+        assert_that(execute_next_job(self.app)).is_false()
+        self.app.config['SNAPSHOT_IMPORT_PARALLELISM'] = 1
+        while execute_next_job(self.app):
+            pass
+        items = self.get_items(job['_id'])
+        assert_that([item['name'] for item in items]).is_equal_to(['vaio.json', 'xps13.json'])
+        assert_that([item['status'] for item in items]).is_equal_to(['done', 'done'])
+        assert_that(self.get_200('jobs', item=job['_id'])).has_status('done')
+
+    def test_import_shared_components(self):
+        """Snapshots of different devices that share a component wait for each other."""
+        vaio = self.get_fixture(self.SNAPSHOT, 'vaio')
+        vostro = self.get_fixture(self.SNAPSHOT, 'vostro')
+        hard_drive = next(c for c in vaio['components'] if c['@type'] == 'HardDrive' and 'serialNumber' in c)
+        vostro['components'] = [c for c in vostro['components'] if c['@type'] != 'HardDrive'] + [hard_drive]
+        lines = [json.dumps(vaio), json.dumps(vostro)]
+        job, status = self.post(self.IMPORT, '\n'.join(lines), content_type='application/x-ndjson')
+        self.assert202(status)
+        items = self.get_items(job['_id'])
+        assert_that(items[1]['after']).is_equal_to([items[0]['_id']])
+        # Although two snapshots can run at the same time, the vostro waits for the vaio
+        with self.app.app_context(), self.app.auth.database(self.db1):
+            assert_that(SnapshotImportItemDomain.claim(2)).has__id(ObjectId(items[0]['_id']))
+            assert_that(SnapshotImportItemDomain.claim(2)).is_none()
+
+    def test_import_errors(self):
+        """Uploads that are not NDJSON or zip, or that do not have snapshots, are rejected."""
+        _, status = self.post(self.IMPORT, {'@type': 'devices:Snapshot'})
+        self.assertEqual(status, 415)
+        _, status = self.post(self.IMPORT, '\n\n', content_type='application/x-ndjson')
+        self.assert400(status)
+        _, status = self.post(self.IMPORT, 'foo', content_type='application/zip')
+        self.assert400(status)
+        self.app.config['JOB_WORKERS'] = 0
+        _, status = self.post(self.IMPORT, json.dumps({}), content_type='application/x-ndjson')
+        self.assertEqual(status, 501)
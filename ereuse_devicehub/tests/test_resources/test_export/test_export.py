@@ -1,3 +1,6 @@
+import copy
+import csv
+import io
 from urllib.parse import urlencode
 
 import pyexcel
@@ -6,6 +9,9 @@ from pydash import at, py_
 from pyexcel_webio import _XLSX_MIME, FILE_TYPE_MIME_TABLE
 from werkzeug.datastructures import Headers
 
+from ereuse_devicehub.export.export import ILLEGAL_CHARACTERS, SpreadsheetTranslator, _floor, _state
+from ereuse_devicehub.resources.device.domain import DeviceDomain
+from ereuse_devicehub.resources.submitter.translator import field
 from ereuse_devicehub.tests import TestStandard
 
 
@@ -101,11 +107,89 @@ class TestExport(TestStandard):
         assert_that(book_dict).contains_only('Devices')
         assert all('3' not in n for n in book_dict['Devices'][0])
 
+    def test_export_stream(self):
+        """Streams the export of all devices, as xlsx and csv, and checks it is like the non-streamed one."""
+        self.get_fixtures_computers()
+        for detailed in True, False:
+            rows = self._get_spreadsheet('devices', [], detailed)['Devices']
+            streamed_rows = self._get_spreadsheet('devices', [], detailed, stream=True)['Devices']
+            # The streamed header can have extra columns that are empty for all devices
+            assert_that(streamed_rows[0]).contains(*rows[0])
+            assert_that(streamed_rows).is_length(len(rows))
+            positions = [streamed_rows[0].index(field_name) for field_name in rows[0]]
+            assert_that([[row[i] for i in positions] for row in streamed_rows]).is_equal_to(rows)
+        url = '/{}/export/devices?stream=1'.format(self.db1)
+        headers = Headers()
+        headers.add('Authorization', 'Basic ' + self.token)
+        headers.add('Accept', FILE_TYPE_MIME_TABLE['csv'])
+        response = self.test_client.get(url, headers=headers)
+        self.assert200(response.status_code)
+        csv_rows = list(csv.reader(io.StringIO(response.data.decode())))
+        assert_that(csv_rows[0]).is_equal_to(streamed_rows[0])
+        assert_that([row[0] for row in csv_rows]).is_equal_to([str(row[0]) for row in streamed_rows])
+        headers.set('Accept', FILE_TYPE_MIME_TABLE['ods'])
+        response = self.test_client.get(url, headers=headers)
+        assert_that(response.status_code).is_equal_to(406)
+        # Streaming is only for csv and xlsx; stream=0 does not stream
+        response = self.test_client.get('/{}/export/devices?stream=0'.format(self.db1), headers=headers)
+        self.assert200(response.status_code)
+
+    def test_prefetched(self):
+        """Prefetching devices in batches gets the same components and Update events as device by device."""
+        computers_id = self.get_fixtures_computers()
+        update = {'@type': 'devices:Update', 'devices': computers_id[0:2], 'margin': 'foo'}
+        self.post_201(self.DEVICE_EVENT_UPDATE, update)
+        with self.app.test_request_context('/{}/devices'.format(self.db1), headers=[self.auth_header]):
+            self.app.auth.set_database_from_url()
+            translator = SpreadsheetTranslator(brief=False)
+            translator.PREFETCH_SIZE = 3  # So we have more than one batch
+            devices = DeviceDomain.get_in('_id', computers_id)
+            components = [DeviceDomain.get_full_components(device['components']) for device in devices]
+            prefetched = []
+            for device in translator.prefetched(copy.deepcopy(devices)):
+                prefetched.append(device)
+                # The Update events of the batch of the device are prefetched and translated from there
+                updates = translator.updates[device['_id']]
+                if device['_id'] in computers_id[0:2]:
+                    assert_that(updates).extracting('margin').is_equal_to(['foo'])
+                    assert_that(translator.translate_one(device)).contains_entry({'Margin': 'foo'})
+                else:
+                    assert_that(updates).is_empty()
+                    assert_that(translator.translate_one(device)).does_not_contain_key('Margin')
+            assert_that([device['components'] for device in prefetched]).is_equal_to(components)
+            # Updates of the last batch
+            assert_that(translator.updates).contains_only(prefetched[-1]['_id'])
+            first = next(device for device in prefetched if device['_id'] == computers_id[0])
+            translator.updates = {}  # Gets the updates from the database
+            assert_that(translator.translate_one(first)).contains_entry({'Margin': 'foo'})
+
+    def test_compiled_accessors(self):
+        """The compiled accessors of the translators get the same values as the pydash chains they replace."""
+        resources = [
+            {'pricing': {'total': {'standard': 3.5}}, 'model': 'm', 'totalRamSize': 1.9,
+             'events': [{'label': 'l', '@type': 'devices:Ready', '_id': 'x'}]},
+            {'pricing': 'foo', 'totalRamSize': True, 'events': []},
+            {'totalRamSize': 4, 'totalHardDriveSize': 'bar', 'events': [{'@type': 'devices:Allocate', 'label': None}]},
+            {'pricing': None}
+        ]
+        for resource in resources:
+            for path in 'pricing.total.standard', 'pricing.total', 'model', 'foo.bar':
+                assert_that(field(path)(resource)).is_equal_to(py_().get(path)(resource))
+            for path in 'totalRamSize', 'totalHardDriveSize':
+                assert_that(_floor(path)(resource)).is_equal_to(py_().get(path).floor()(resource))
+            pick = py_().get('events').head().pick('@type', 'label').join(' ')
+            assert_that(_state(resource)).is_equal_to(pick(resource))
+        assert_that(ILLEGAL_CHARACTERS).does_not_contain_key(ord('\n'))
+        assert_that(len('a\x03b'.translate(ILLEGAL_CHARACTERS))).is_equal_to(2)
+
     def _get_spreadsheet(self, resource_name: str, ids: list, detailed: bool = True,
-                         xlsx: bool = True, max_of_type=None) -> dict:
+                         xlsx: bool = True, max_of_type=None, stream: bool = False) -> dict:
         """Helper method to request the spreadsheet to DeviceHub and return a dict"""
         _type = 'detailed' if detailed else 'brief'
-        url = '/{}/export/{}?{}'.format(self.db1, resource_name, urlencode({'ids': ids, 'type': _type, 'max-of-type': max_of_type}, True))
+        params = {'ids': ids, 'type': _type, 'max-of-type': max_of_type}
+        if stream:
+            params['stream'] = 1
+        url = '/{}/export/{}?{}'.format(self.db1, resource_name, urlencode(params, True))
         headers = Headers()
         headers.add('Authorization', 'Basic ' + self.token)
         headers.add('Accept', _XLSX_MIME if xlsx else FILE_TYPE_MIME_TABLE['ods'])
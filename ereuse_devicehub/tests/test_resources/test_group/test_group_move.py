@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+from assertpy import assert_that
+from bson import ObjectId
+
+from ereuse_devicehub.resources.job.worker import execute_next_job
+from ereuse_devicehub.tests.test_resources.test_group import TestGroupBase
+
+
+class TestGroupMove(TestGroupBase):
+    def setUp(self, settings_file=None, url_converters=None):
+        super().setUp(settings_file, url_converters)
+        # We execute the jobs ourselves instead of starting the worker processes
+        self.app.config['JOB_WORKERS'] = 1
+
+    def test_move_devices_async(self):
+        """Moves devices in a lot through a job, checking the job and the devices before and after executing it."""
+        devices_id = self.get_fixtures_computers()
+        lot = self.get_fixture(self.LOTS, 'lot')
+        lot_id = self.post_201(self.LOTS, lot)['_id']
+        patch = {'@type': 'Lot', 'children': {'devices': devices_id}}
+        response, status = self.patch(self.LOTS, patch, headers=[('Prefer', 'respond-async')], item=lot_id)
+        self.assert202(status)
+        assert_that(response).contains('_job')
+        job_id = response['_job']['_id']
+        job = self.get_200('jobs', item=job_id)
+        assert_that(job).has_status('queued').has_affected(devices_id)
+
+        # The lot is updated but not yet its devices, which are in migration
+        lot = self.get_200(self.LOTS, item=lot_id)
+        assert_that(lot['children']['devices']).is_equal_to(devices_id)
+        device = self.get_200(self.DEVICES, item=devices_id[0])
+        assert_that(device).has__migrating(job_id)
+        self.is_not_grandpa_or_above(lot_id, self.LOTS, devices_id[0], self.DEVICES)
+
+        assert_that(execute_next_job(self.app)).is_true()
+        job = self.get_200('jobs', item=job_id)
+        assert_that(job).has_status('done').has_errors([])
+        assert_that(job['total']).is_greater_than_or_equal_to(len(devices_id))
+        assert_that(job['processed']).is_greater_than_or_equal_to(len(devices_id))
+        for device_id in devices_id:
+            self.is_parent(lot_id, self.LOTS, device_id, self.DEVICES)
+        device = self.get_200(self.DEVICES, item=devices_id[0])
+        assert_that(device).does_not_contain('_migrating')
+        self.assert_last_log_entry(lot_id, 'Lot', added={'devices': devices_id})
+        # There are no more jobs
+        assert_that(execute_next_job(self.app)).is_false()
+
+    def test_move_reclaim_and_serialize(self):
+        """
+        Moves the same devices twice through jobs, checking that the second job waits for the first
+        and that the first job is executed again when its worker dies.
+        """
+        devices_id = self.get_fixtures_computers()
+        lot_id = self.post_201(self.LOTS, self.get_fixture(self.LOTS, 'lot'))['_id']
+        patch = {'@type': 'Lot', 'children': {'devices': devices_id}}
+        first = self.patch(self.LOTS, patch, headers=[('Prefer', 'respond-async')], item=lot_id)[0]['_job']['_id']
+        patch = {'@type': 'Lot', 'children': {'devices': []}}
+        second = self.patch(self.LOTS, patch, headers=[('Prefer', 'respond-async')], item=lot_id)[0]['_job']['_id']
+        # A worker claims the first job and is alive
+        jobs = self.connection[self.db1].jobs
+        jobs.update_one({'_id': ObjectId(first)}, {'$set': {'status': 'running', 'heartbeat': datetime.utcnow(),
+                                                  'attempts': 1}})
+        # The second job moves the same devices so it waits
+        assert_that(execute_next_job(self.app)).is_false()
+        assert_that(self.get_200('jobs', item=second)).has_status('queued')
+        # The worker dies, so its lease expires and another worker executes the job
+        dead = datetime.utcnow() - timedelta(seconds=self.app.config['JOB_LEASE'] + 1)
+        jobs.update_one({'_id': ObjectId(first)}, {'$set': {'heartbeat': dead}})
+        assert_that(execute_next_job(self.app)).is_true()
+        assert_that(self.get_200('jobs', item=first)).has_status('done').has_attempts(2)
+        assert_that(execute_next_job(self.app)).is_true()
+        assert_that(self.get_200('jobs', item=second)).has_status('done').has_attempts(1)
+        for device_id in devices_id:
+            self.is_not_parent(lot_id, self.LOTS, device_id, self.DEVICES)
+
+    def test_move_devices_sync_by_default(self):
+        """Without asking for it, children are moved in the request."""
+        devices_id = self.get_fixtures_computers()
+        lot = self.get_fixture(self.LOTS, 'lot')
+        lot_id = self.post_201(self.LOTS, lot)['_id']
+        patch = {'@type': 'Lot', 'children': {'devices': devices_id}}
+        response = self.patch_200(self.LOTS, patch, item=lot_id)
+        assert_that(response).does_not_contain('_job')
+        for device_id in devices_id:
+            self.is_parent(lot_id, self.LOTS, device_id, self.DEVICES)
@@ -0,0 +1,208 @@
+from unittest.mock import patch
+
+from assertpy import assert_that
+from passlib.handlers.sha2_crypt import sha256_crypt
+from pydash import difference_with, pluck, union_by
+from pymongo.errors import OperationFailure
+
+from ereuse_devicehub.resources.account.role import Role
+from ereuse_devicehub.resources.device.component.domain import ComponentDomain
+from ereuse_devicehub.resources.device.schema import Device
+from ereuse_devicehub.resources.event.device import DeviceEventDomain
+from ereuse_devicehub.resources.group.domain import GroupDomain
+from ereuse_devicehub.security.perms import ACCESS, EDIT, READ
+from ereuse_devicehub.tests.test_resources.test_group import TestGroupBase
+
+
+def _update_db_one_by_one(cls, parent_id, resources, ancestors_new, update_query, child_domain, parent_perms=None,
+                          parent_accounts_remove=None):
+    """
+    The former implementation of GroupDomain._update_db, which updates the resources one by one.
+
+    It materializes *ancestorIds* as descendants are obtained through them.
+    """
+    new_children = []
+    for resource in resources:
+        try:
+            eq = {'ancestors.@type': ancestors_new['@type'], 'ancestors._id': parent_id}
+            full_child, *_ = child_domain.update_raw_get(resource, update_query, extra_query=eq, upsert=True)
+        except OperationFailure as e:
+            if e.code == 16836:
+                new_query = {'$push': {'ancestors': {'$each': [ancestors_new], '$position': 0}}}
+                if parent_perms is not None:
+                    new_query['$set'] = {'perms': parent_perms}
+                full_child, *_ = child_domain.update_raw_get(resource, new_query)
+            else:
+                raise e
+        cls.update_ancestor_ids(child_domain, [full_child])
+        new_children.append(full_child)
+        components = full_child.get('components', [])
+        if components:
+            _update_db_one_by_one(cls, parent_id, components, ancestors_new, update_query, ComponentDomain,
+                                  parent_perms, parent_accounts_remove)
+    if parent_accounts_remove:
+        cls._remove_perms(new_children, parent_accounts_remove, child_domain)
+    if parent_perms:
+        events_id = [event['_id'] for child in new_children for event in child.get('events', [])]
+        cls.add_perms_to_events(events_id, parent_perms)
+    return new_children
+
+
+def _inherit_perms_one_by_one(cls, resource_id, new_modified_perms, accounts_to_remove):
+    """The former implementation of GroupDomain._inherit_perms, which updates the descendants one by one."""
+    for resource_name, domain in cls.children_resources.items():
+        for descendant in cls.get_descendants(domain, resource_id):
+            f = lambda a, b: a['account'] == b
+            perms = difference_with(descendant['perms'], accounts_to_remove, comparator=f)
+            perms = union_by(new_modified_perms, perms, iteratee=lambda x: x['account'])
+            q = {'$set': {'perms': perms}}
+            if resource_name not in Device.resource_names:
+                descendant_shared_with = set(descendant.get('sharedWith', set()))
+                descendant_shared_with = cls.remove_shared_with(descendant['@type'], descendant['_id'],
+                                                                descendant_shared_with, set(accounts_to_remove))
+                q['$set']['sharedWith'] = descendant_shared_with
+            else:
+                cls._remove_perms_in_event(accounts_to_remove, descendant['_id'])
+                events_id = pluck(descendant['events'], '_id')
+                _add_perms_to_events_one_by_one(events_id, perms)
+            domain.update_one_raw(descendant['_id'], q)
+
+
+def _add_perms_to_events_one_by_one(events_id, perms):
+    """The former implementation of GroupDomain.add_perms_to_events, which updates the events one by one."""
+    for event in DeviceEventDomain.get_in('_id', events_id):
+        _perms = union_by(event['perms'], perms, iteratee=lambda x: x['account'])
+        DeviceEventDomain.update_one_raw(event['_id'], {'$set': {'perms': _perms}})
+
+
+class TestInheritance(TestGroupBase):
+    """Differential tests between the bulk inheritance engine and the former one-by-one implementation."""
+
+    def setUp(self, settings_file=None, url_converters=None):
+        super().setUp(settings_file, url_converters)
+        self.db.accounts.insert_one(
+            {
+                'email': 'b@b.b',
+                'password': sha256_crypt.hash('1234'),
+                'role': Role.ADMIN,
+                'token': 'TOKENB',
+                'databases': {self.app.config['DATABASES'][1]: ACCESS},
+                'defaultDatabase': self.app.config['DATABASES'][1],
+                '@type': 'Account',
+                'active': True
+            }
+        )
+        self.account2 = self.login('b@b.b', '1234')
+
+    def test_bulk_inheritance_equals_one_by_one(self):
+        """Both engines generate the same *ancestors* and *perms* in devices, components, groups and events."""
+        bulk = self.move_groups()
+        self.reset_database()
+        with patch.object(GroupDomain, '_update_db', classmethod(_update_db_one_by_one)):
+            one_by_one = self.move_groups()
+        assert_that(bulk).is_equal_to(one_by_one)
+
+    def test_bulk_perms_equals_one_by_one(self):
+        """Propagating permissions in bulk generates the same *perms* than propagating them one by one."""
+        bulk = self.move_groups()
+        self.reset_database()
+        with patch.object(GroupDomain, '_inherit_perms', classmethod(_inherit_perms_one_by_one)), \
+                patch.object(GroupDomain, 'add_perms_to_events', staticmethod(_add_perms_to_events_one_by_one)):
+            one_by_one = self.move_groups()
+        assert_that(bulk).is_equal_to(one_by_one)
+
+    def test_bulk_inheritance_in_batches(self):
+        """Splitting the children, and the events whose perms we update, in several bulks does not change the result."""
+        bulk = self.move_groups()
+        self.reset_database()
+        with patch.object(GroupDomain, 'BULK_SIZE', 1):
+            small_bulks = self.move_groups()
+        assert_that(bulk).is_equal_to(small_bulks)
+
+    def test_ancestor_ids(self):
+        """After moving groups, *ancestorIds* of every resource is the flattened version of its *ancestors*."""
+        self.move_groups()
+        db = self.connection[self.app.config['DHT1_DBNAME']]
+        for collection in 'devices', 'lots', 'packages', 'places':
+            for resource in db[collection].find():
+                ancestor_ids = GroupDomain.ancestor_ids(resource.get('ancestors', []))
+                assert_that(resource.get('ancestorIds', [])).is_equal_to(ancestor_ids)
+
+    def reset_database(self):
+        """
+        Empties the collections of the database where we move groups, so we can move them again in the
+        same test with the other engine and get the same ids. Accounts, in their own database, are kept.
+        """
+        db = self.connection[self.app.config['DHT1_DBNAME']]
+        for collection in db.collection_names(include_system_collections=False):
+            db[collection].delete_many({})
+
+    def move_groups(self) -> dict:
+        """
+        Creates a hierarchy of places, lots, packages and devices, moves them and shares them, and then returns
+        a normalized version of the *ancestors* and *perms* of every resource.
+        """
+        devices_id = self.get_fixtures_computers()
+        perms = [{'account': self.account2['_id'], 'perm': READ}]
+
+        package1 = self.get_fixture(self.PACKAGES, 'package')
+        package1['label'] = 'package1'
+        package1['children'] = {'devices': devices_id[2:3]}
+        package1_id = self.post_201(self.PACKAGES, package1)['_id']
+        package2 = self.get_fixture(self.PACKAGES, 'package')
+        package2['label'] = 'package2'
+        package2_id = self.post_201(self.PACKAGES, package2)['_id']
+
+        lot1 = self.get_fixture(self.LOTS, 'lot')
+        lot1['label'] = 'lot1'
+        lot1['children'] = {'devices': devices_id[:2], 'packages': [package1_id]}
+        lot1['perms'] = perms
+        lot1_id = self.post_201(self.LOTS, lot1)['_id']
+
+        place1 = self.get_fixture(self.PLACES, 'place')
+        place1['label'] = 'place1'
+        place1['children'] = {'lots': [lot1_id], 'packages': [package1_id]}
+        place1_id = self.post_201(self.PLACES, place1)['_id']
+
+        # Remove a device from the lot and move package1 inside package2
+        lot_patch = {'@type': 'Lot', 'children': {'devices': devices_id[:1], 'packages': [package1_id]}}
+        self.patch_200(self.LOTS, item=lot1_id, data=lot_patch)
+        package_patch = {'@type': 'Package', 'children': {'packages': [package1_id], 'devices': devices_id[3:]}}
+        self.patch_200(self.PACKAGES, item=package2_id, data=package_patch)
+        place_patch = {'@type': 'Place', 'children': {'lots': [lot1_id], 'packages': [package2_id]}}
+        self.patch_200(self.PLACES, item=place1_id, data=place_patch)
+        # Share the place, which overrides the perms of the lot, and share a package with more perms
+        self.patch_200(self.PLACES, item=place1_id, data={'@type': 'Place', 'perms': perms})
+        package_perms = [{'account': self.account2['_id'], 'perm': EDIT}]
+        self.patch_200(self.PACKAGES, item=package1_id, data={'@type': 'Package', 'perms': package_perms})
+        # Stop sharing the lot
+        self.patch_200(self.LOTS, item=lot1_id, data={'@type': 'Lot', 'perms': []})
+        return self.normalized_state()
+
+    def normalized_state(self) -> dict:
+        """
+        Gets the *ancestors* and *perms* of all resources, replacing the random ids of groups by their labels
+        and the ids of the accounts by their emails.
+        """
+        accounts = {str(self.account['_id']): 'a@a.a', str(self.account2['_id']): 'b@b.b'}
+        db = self.connection[self.app.config['DHT1_DBNAME']]
+        groups = {}
+        for collection in 'lots', 'packages', 'places':
+            groups.update({g['_id']: g['label'] for g in db[collection].find({}, {'label': True})})
+
+        def normalize(resource: dict) -> dict:
+            ancestors = []
+            for ancestor in resource.get('ancestors', []):
+                ancestors.append({
+                    key: groups.get(value, value) if key == '_id' else sorted(groups.get(i, i) for i in value)
+                    for key, value in ancestor.items() if key != '@type'
+                })
+                ancestors[-1]['@type'] = ancestor['@type']
+            perms = sorted((accounts[str(p['account'])], p['perm']) for p in resource.get('perms', []))
+            return {'ancestors': ancestors, 'perms': perms}
+
+        state = {'devices': {d['_id']: normalize(d) for d in db.devices.find()}}
+        for collection in 'lots', 'packages', 'places':
+            state[collection] = {groups[g['_id']]: normalize(g) for g in db[collection].find()}
+        state['events'] = [normalize(e)['perms'] for e in db.events.find().sort('_created')]
+        return state
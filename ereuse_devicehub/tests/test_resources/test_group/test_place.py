@@ -1,5 +1,9 @@
 import copy
 
+from assertpy import assert_that
+from pydash import pluck
+
+from ereuse_devicehub.resources.group.physical.place.domain import PlaceDomain
 from ereuse_devicehub.tests.test_resources.test_group import TestGroupBase
 
 
@@ -44,3 +48,27 @@ class TestPlace(TestGroupBase):
         self.delete_and_check('{}/{}'.format(self.PLACES, place['_id']))
         for computer_id in computers_id:
             self.child_does_not_have_parent(place['_id'], self.PLACES, computer_id, self.DEVICES)
+
+    def test_get_all_descendants(self):
+        """Obtains the descendants of all types at once, grouped by resource."""
+        computers_id = self.get_fixtures_computers()
+        components_id = [_id for computer_id in computers_id
+                         for _id in self.get_200(self.DEVICES, item=computer_id)['components']]
+        lot = self.get_fixture(self.LOTS, 'lot')
+        lot['children'] = {'devices': computers_id[:2]}
+        lot_id = self.post_201(self.LOTS, lot)['_id']
+        self.place['children'] = {'lots': [lot_id], 'devices': computers_id[2:]}
+        place_id = self.post_201(self.PLACES, self.place)['_id']
+        with self.app.test_request_context('/{}/devices'.format(self.db1), headers=[self.auth_header]):
+            self.app.auth.set_database_from_url()
+            descendants = PlaceDomain.get_all_descendants(place_id)
+            # Devices contain the components too
+            assert_that(sorted(pluck(descendants['devices'], '_id'))).is_equal_to(sorted(computers_id + components_id))
+            assert_that(sorted(pluck(descendants['components'], '_id'))).is_equal_to(sorted(components_id))
+            assert_that(pluck(descendants['lots'], '_id')).is_equal_to([lot_id])
+            for resource_name in set(PlaceDomain.children_resources) - {'devices', 'components', 'lots'}:
+                assert_that(descendants[resource_name]).is_empty()
+            # With a projection we only get the projected fields and @type
+            descendants = PlaceDomain.get_all_descendants(place_id, projection={'_id': True})
+            for descendant in descendants['devices'] + descendants['lots']:
+                assert_that(descendant).is_length(2).contains_key('_id', '@type')
@@ -0,0 +1,77 @@
+from assertpy import assert_that
+from flask import g
+
+from ereuse_devicehub.resources.device.component.domain import ComponentDomain
+from ereuse_devicehub.resources.device.domain import DeviceDomain
+from ereuse_devicehub.resources.domain import ResourceNotFound
+from ereuse_devicehub.resources.identity_map import IdentityMap
+from ereuse_devicehub.tests import TestStandard
+
+
+class TestIdentityMap(TestStandard):
+    def test_identity_map(self):
+        """Gets resources from the identity map, invalidating them when they are written."""
+        devices_id = self.get_fixtures_computers()
+        with self.app.test_request_context('/{}/devices'.format(self.db1)):
+            self.app.auth.set_database_from_url()
+            g.dh_identity_map = identity_map = IdentityMap()
+            device = DeviceDomain.get_one(devices_id[0])
+            assert_that(identity_map).has_misses(1).has_hits(0)
+            device['hid'] = 'changed'
+            device = DeviceDomain.get_one({'_id': devices_id[0]})
+            assert_that(identity_map).has_misses(1).has_hits(1)
+            # We got a copy, so the change did not affect the identity map
+            assert_that(device['hid']).is_not_equal_to('changed')
+            # Filters by other fields do not use the map, even when they have one field
+            assert_that(DeviceDomain.get_one({'hid': device['hid']})).has__id(devices_id[0])
+            assert_that(identity_map).has_misses(1).has_hits(1)
+            # Components do not get computers although they share collection
+            with self.assertRaises(ResourceNotFound):
+                ComponentDomain.get_one(devices_id[0])
+
+            # Only the devices that are not in the map are read
+            devices = DeviceDomain.get_in('_id', devices_id[:2])
+            assert_that(identity_map).has_misses(2).has_hits(2)
+            assert_that([d['_id'] for d in devices]).contains_only(*devices_id[:2])
+            DeviceDomain.get_in('_id', devices_id[:2])
+            assert_that(identity_map).has_misses(2).has_hits(4)
+
+            # Writes invalidate the resources
+            DeviceDomain.update_one_raw(devices_id[0], {'$set': {'hid': 'foo'}})
+            assert_that(DeviceDomain.get_one(devices_id[0])).has_hid('foo')
+            assert_that(identity_map).has_misses(3)
+            DeviceDomain.update_many_raw({'_id': {'$in': devices_id}}, {'$set': {'hid': 'bar'}})
+            for device in DeviceDomain.get_in('_id', devices_id):
+                assert_that(device).has_hid('bar')
+            # Updates that return the new document update the map
+            DeviceDomain.update_one_raw_get(devices_id[1], {'$set': {'hid': 'baz'}})
+            assert_that(DeviceDomain.get_one(devices_id[1])).has_hid('baz')
+            assert_that(identity_map).has_misses(3 + len(devices_id))
+
+    def test_identity_map_snapshot(self):
+        """Snapshots work the same with the identity map, reusing resources."""
+        self.app.config['IDENTITY_MAP'] = True
+        devices_id = self.get_fixtures_computers()
+        # Snapshotting again the same computer does not duplicate it
+        vaio = self.get_fixture(self.SNAPSHOT, 'vaio')
+        snapshot = self.post_201('{}/{}'.format(self.DEVICE_EVENT, self.SNAPSHOT), vaio)
+        assert_that(devices_id).contains(snapshot['device'])
+        device = self.get_200(self.DEVICES, item=snapshot['device'])
+        assert_that([event['_id'] for event in device['events']]).contains(snapshot['_id'])
+
+    def test_projection(self):
+        """Reads with projections only get the projected fields and do not use the identity map."""
+        devices_id = self.get_fixtures_computers()
+        with self.app.test_request_context('/{}/devices'.format(self.db1)):
+            self.app.auth.set_database_from_url()
+            g.dh_identity_map = identity_map = IdentityMap()
+            projection = {'@type': True}
+            assert_that(DeviceDomain.get_one(devices_id[0], projection)).is_length(2).contains_key('_id', '@type')
+            device = DeviceDomain.get_one({'_id': devices_id[0]}, projection)
+            assert_that(device).is_length(2).contains_key('_id', '@type')
+            for device in DeviceDomain.get_in('_id', devices_id, projection=projection):
+                assert_that(device).is_length(2).contains_key('_id', '@type')
+            assert_that(identity_map).has_hits(0).has_misses(0)
+            # Components do not get computers with projections either
+            with self.assertRaises(ResourceNotFound):
+                ComponentDomain.get_one(devices_id[0], projection)
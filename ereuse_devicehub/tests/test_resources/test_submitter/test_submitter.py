@@ -10,9 +10,10 @@ class TestSubmitter(TestStandard):
     """
 
     def _test_creation(self):
-        assert_that(hasattr(self.app, 'grd_submitter_caller')).is_true()
+        assert_that(vars(self.app)).contains_key('grd_submitter_caller')  # hasattr would create it
         assert_that(hasattr(self.app, 'submit_events_to_grd')).is_true()
-        assert_that(self.app.grd_submitter_caller.token).is_not_none()
+        # The process of the submitter logs in by itself, so creating the caller does not wait for a token
+        assert_that(self.app.grd_submitter_caller.process.is_alive()).is_true()
 
     @staticmethod
     def mock_submit(submitter_class, token, app, mock_post):
@@ -0,0 +1,23 @@
+from assertpy import assert_that
+from flask import json
+
+from ereuse_devicehub.resources.device.domain import DeviceDomain
+from ereuse_devicehub.rest import get_resource, get_resources
+from ereuse_devicehub.tests import TestStandard
+
+
+class TestRest(TestStandard):
+    def test_get_resources(self):
+        """Tests getting resources in-process gets the same as GETting them."""
+        computer_id = self.get_fixtures_computers()[0]
+        computer = self.get_200(self.DEVICES, item=computer_id)
+        where = json.dumps({'_id': {'$in': computer['components']}})
+        components = self.get_200(self.DEVICES, params={'where': where})['_items']
+        with self.app.test_request_context('/{}/devices'.format(self.db1), headers=[self.auth_header]):
+            self.app.auth.set_database_from_url()
+            resources = get_resources(DeviceDomain.resource_name, {'_id': {'$in': computer['components']}},
+                                      {'tests': 1}, {'events': 0})
+            assert_that([r['_id'] for r in resources]).contains_only(*[c['_id'] for c in components])
+            assert_that([r for r in resources if 'events' in r]).is_empty()
+            resource = get_resource(DeviceDomain.resource_name, computer_id, {'components': 1})
+            assert_that([c['_id'] for c in resource['components']]).is_equal_to(computer['components'])
@@ -1,6 +1,8 @@
 from os import path
 from urllib.parse import urlparse
 
+from werkzeug.routing import BaseConverter, ValidationError
+
 
 class UrlParse:
     @staticmethod
@@ -12,3 +14,20 @@ class UrlParse:
         if base_url[-1] == '/':
             base_url = base_url[:-1]
         return path.split(urlparse(base_url).path)[1]
+
+
+class DatabaseConverter(BaseConverter):
+    """
+    Matches a database of the DATABASES setting, like 'db1' in '/db1/devices'.
+
+    DeviceHub registers the URL rules of the resources once with this converter as prefix, instead of once
+    per database. Segments that are not a database do not match, getting a 404 as if the rule did not exist.
+
+    Flask matches the URL before pushing the app context, so the databases are not read from ``current_app``
+    but from the ``databases`` attribute that DeviceHub sets in its URL map.
+    """
+
+    def to_python(self, value: str) -> str:
+        if value not in self.map.databases:
+            raise ValidationError()
+        return value
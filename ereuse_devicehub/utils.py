@@ -58,7 +58,57 @@ def get_json_from_file(filename: str, directory: str = None, parse_json=True, mo
 
 
 class DeviceHubConfig(Config):
-    """Configuration class for DeviceHub. We only extend it to add our settings when eve loads its settings."""
+    """
+    Configuration class for DeviceHub. We extend it to add our settings when eve loads its settings, and to
+    count the changes of the database settings in :attr:`database_version`.
+
+    Every way of changing a setting goes through :meth:`__setitem__` or :meth:`_changed`, and DATABASES
+    is kept as a tuple, so it cannot be changed in place without us knowing.
+    """
+    DATABASE_SETTINGS = '_DBNAME', '_HOST', '_PORT', '_URI', '_USERNAME', '_PASSWORD', '_REPLICA_SET', \
+                        '_AUTH_SOURCE', '_READ_PREFERENCE', '_WRITE_CONCERN'
+    """The suffixes of the settings of a database, like MONGO_DBNAME or DB1_HOST."""
+
+    def __init__(self, *args, **kwargs):
+        self.database_version = 0
+        """Increases every time a database setting is set, so caches of database objects know to invalidate."""
+        super().__init__(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        self._changed(key)
+        if key == 'DATABASES' and isinstance(value, list):
+            value = tuple(value)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._changed(key)
+        super().__delitem__(key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        self._changed(key)
+        return super().pop(key, *default)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._changed(key)
+        return key, value
+
+    def clear(self):
+        self.database_version += 1
+        super().clear()
+
+    def _changed(self, key):
+        if key == 'DATABASES' or type(key) is str and key.endswith(self.DATABASE_SETTINGS):
+            self.database_version += 1
 
     def from_object(self, obj):
         super().from_object(obj)  # 1. Load settings as normal
@@ -75,6 +75,7 @@ setup(
         'toolz>=0.8,<1.0',
         'Flask-Mail',
         'rpy2',
+        'numpy>=1.13,<2',
         'ereuse-utils [naming]',
         'lxml'
     ],